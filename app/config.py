@@ -8,35 +8,139 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+STORAGE_PROFILES = ("auto", "default", "sqlite", "postgres")
+FSM_STORAGES = ("database", "memory")
+RUN_MODES = ("polling", "webhook")
+
 
 @dataclass(frozen=True)
 class Settings:
     bot_token: str
     database_url: str
+    database_replica_url: str
+    database_shards: str
+    read_your_writes_seconds: int
     log_level: str
     reminder_poll_seconds: int
+    reminder_send_rate: int
+    reminder_send_concurrency: int
+    reminder_lease_seconds: int
+    cache_max_users: int
+    cache_ttl_seconds: int
+    storage_profile: str
+    db_pool_size: int
+    db_max_overflow: int
+    db_pool_recycle_seconds: int
+    sqlite_readers: int
+    run_mode: str
+    webhook_url: str
+    webhook_path: str
+    webhook_secret: str
+    webhook_host: str
+    webhook_port: int
+    fsm_storage: str
+    fsm_flush_seconds: int
+    fsm_idle_ttl_seconds: int
+    fsm_max_entries: int
+    metrics_path: str
+    metrics_host: str
+    metrics_port: int
+    query_budget_statements: int
+    query_budget_sessions: int
+    query_budget_repeats: int
+    write_batch_ms: int
+    write_batch_max: int
+    write_batch_queue: int
+    archive_after_days: int
+    update_concurrency: int
+    update_queue_size: int
+    update_chat_queue_size: int
+    update_chat_wait_seconds: int
+
+
+def _read_int(name: str, default: int, minimum: int) -> int:
+    raw_value = os.getenv(name, str(default)).strip()
+    try:
+        value = int(raw_value)
+    except ValueError:
+        value = default
+
+    return max(minimum, value)
 
 
-@lru_cache(maxsize=1)
-def get_settings() -> Settings:
+@lru_cache(maxsize=2)
+def get_settings(require_bot_token: bool = True) -> Settings:
     bot_token = os.getenv("BOT_TOKEN", "").strip()
-    if not bot_token:
+    if not bot_token and require_bot_token:
         raise RuntimeError("BOT_TOKEN is not set. Put it in .env before running the bot.")
 
     database_url = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/gym_portfolio.db").strip()
     log_level = os.getenv("LOG_LEVEL", "INFO").strip().upper()
 
-    raw_poll_seconds = os.getenv("REMINDER_POLL_SECONDS", "30").strip()
-    try:
-        reminder_poll_seconds = int(raw_poll_seconds)
-    except ValueError:
-        reminder_poll_seconds = 30
+    storage_profile = os.getenv("STORAGE_PROFILE", "auto").strip().lower()
+    if storage_profile not in STORAGE_PROFILES:
+        storage_profile = "auto"
+
+    run_mode = os.getenv("RUN_MODE", "polling").strip().lower()
+    if run_mode not in RUN_MODES:
+        run_mode = "polling"
+
+    webhook_url = os.getenv("WEBHOOK_URL", "").strip()
+    webhook_secret = os.getenv("WEBHOOK_SECRET", "").strip()
+    if run_mode == "webhook" and require_bot_token and not (webhook_url and webhook_secret):
+        raise RuntimeError("RUN_MODE=webhook needs WEBHOOK_URL and WEBHOOK_SECRET in .env.")
+
+    fsm_storage = os.getenv("FSM_STORAGE", "database").strip().lower()
+    if fsm_storage not in FSM_STORAGES:
+        fsm_storage = "database"
 
-    reminder_poll_seconds = max(10, reminder_poll_seconds)
+    webhook_path = "/" + os.getenv("WEBHOOK_PATH", "/telegram/webhook").strip().lstrip("/")
+    metrics_path = "/" + os.getenv("METRICS_PATH", "/metrics").strip().lstrip("/")
+    metrics_port = _read_int("METRICS_PORT", 0, minimum=0)
+    webhook_port = _read_int("PORT", 8080, minimum=1)
+    if run_mode == "webhook" and metrics_port == webhook_port:
+        raise RuntimeError("METRICS_PORT must differ from PORT, which serves the public webhook.")
 
     return Settings(
         bot_token=bot_token,
         database_url=database_url,
+        database_replica_url=os.getenv("DATABASE_REPLICA_URL", "").strip(),
+        database_shards=os.getenv("DATABASE_SHARDS", "").strip(),
+        read_your_writes_seconds=_read_int("READ_YOUR_WRITES_SECONDS", 10, minimum=0),
         log_level=log_level,
-        reminder_poll_seconds=reminder_poll_seconds,
+        reminder_poll_seconds=_read_int("REMINDER_POLL_SECONDS", 30, minimum=10),
+        reminder_send_rate=_read_int("REMINDER_SEND_RATE", 25, minimum=1),
+        reminder_send_concurrency=_read_int("REMINDER_SEND_CONCURRENCY", 20, minimum=1),
+        reminder_lease_seconds=_read_int("REMINDER_LEASE_SECONDS", 30, minimum=6),
+        cache_max_users=_read_int("CACHE_MAX_USERS", 10000, minimum=0),
+        cache_ttl_seconds=_read_int("CACHE_TTL_SECONDS", 60, minimum=1),
+        storage_profile=storage_profile,
+        db_pool_size=_read_int("DB_POOL_SIZE", 10, minimum=1),
+        db_max_overflow=_read_int("DB_MAX_OVERFLOW", 10, minimum=0),
+        db_pool_recycle_seconds=_read_int("DB_POOL_RECYCLE_SECONDS", 1800, minimum=60),
+        sqlite_readers=_read_int("SQLITE_READERS", 4, minimum=1),
+        run_mode=run_mode,
+        webhook_url=webhook_url,
+        webhook_path=webhook_path,
+        webhook_secret=webhook_secret,
+        webhook_host=os.getenv("WEBHOOK_HOST", "0.0.0.0").strip(),
+        webhook_port=webhook_port,
+        fsm_storage=fsm_storage,
+        fsm_flush_seconds=_read_int("FSM_FLUSH_SECONDS", 2, minimum=1),
+        fsm_idle_ttl_seconds=_read_int("FSM_IDLE_TTL_SECONDS", 3600, minimum=60),
+        fsm_max_entries=_read_int("FSM_MAX_ENTRIES", 100_000, minimum=1),
+        metrics_path=metrics_path,
+        metrics_host=os.getenv("METRICS_HOST", "127.0.0.1").strip(),
+        metrics_port=metrics_port,
+        query_budget_statements=_read_int("QUERY_BUDGET_STATEMENTS", 8, minimum=1),
+        query_budget_sessions=_read_int("QUERY_BUDGET_SESSIONS", 2, minimum=1),
+        query_budget_repeats=_read_int("QUERY_BUDGET_REPEATS", 3, minimum=1),
+        write_batch_ms=_read_int("WRITE_BATCH_MS", 0, minimum=0),
+        write_batch_max=_read_int("WRITE_BATCH_MAX", 64, minimum=1),
+        write_batch_queue=_read_int("WRITE_BATCH_QUEUE", 1000, minimum=1),
+        archive_after_days=_read_int("ARCHIVE_AFTER_DAYS", 365, minimum=30),
+        update_concurrency=_read_int("UPDATE_CONCURRENCY", 20, minimum=1),
+        update_queue_size=_read_int("UPDATE_QUEUE_SIZE", 1000, minimum=1),
+        update_chat_queue_size=_read_int("UPDATE_CHAT_QUEUE_SIZE", 20, minimum=1),
+        update_chat_wait_seconds=_read_int("UPDATE_CHAT_WAIT_SECONDS", 10, minimum=1),
     )
@@ -1,8 +1,47 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
 from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.schema import CreateColumn
 
 from app.db.base import Base
 
+# Indexes replaced by wider ones; dropped from databases created by earlier versions.
+OBSOLETE_INDEXES = (
+    "ix_workout_entries_telegram_id",
+    "ix_workout_entries_user_exercise",
+    "ix_exercise_records_user_best_weight",
+)
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    # create_all() never alters existing tables, so columns added to a model after the
+    # first deploy are appended here together with their indexes.
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing = [column for column in table.columns if column.name not in existing]
+        for column in missing:
+            if not column.nullable and column.server_default is None:
+                raise RuntimeError(f"Cannot add NOT NULL column {table.name}.{column.name} automatically.")
+            column_ddl = CreateColumn(column).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {column_ddl}"))
+
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def _drop_obsolete_indexes(conn: Connection) -> None:
+    preparer = conn.dialect.identifier_preparer
+    for name in OBSOLETE_INDEXES:
+        conn.execute(text(f"DROP INDEX IF EXISTS {preparer.quote(name)}"))
+
 
 async def init_db(engine: AsyncEngine) -> None:
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_drop_obsolete_indexes)
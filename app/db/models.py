@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import date, datetime, time, timezone
 from typing import Optional
 
-from sqlalchemy import BigInteger, Date, DateTime, Float, ForeignKey, Index, Integer, String, Time
+from sqlalchemy import BigInteger, Date, DateTime, Float, ForeignKey, Index, Integer, String, Text, Time, desc
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.db.base import Base
@@ -20,6 +20,12 @@ class UserProfile(Base):
     timezone_offset_min: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
     reminder_time: Mapped[Optional[time]] = mapped_column(Time, nullable=True)
     last_reminder_local_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
+    next_reminder_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True, index=True)
+    reminder_failures: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    reminder_claimed_by: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
+    reminder_claimed_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    # Set by writes when a replica is configured; until then every instance reads the user from the primary.
+    primary_reads_until: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=utc_now)
 
     workouts: Mapped[list["WorkoutEntry"]] = relationship(
@@ -30,14 +36,17 @@ class UserProfile(Base):
 
 class WorkoutEntry(Base):
     __tablename__ = "workout_entries"
-    __table_args__ = (Index("ix_workout_entries_user_performed", "telegram_id", "performed_at"),)
+    __table_args__ = (
+        Index("ix_workout_entries_user_performed", "telegram_id", "performed_at"),
+        # Per-exercise record recompute reads one exercise in time order.
+        Index("ix_workout_entries_user_exercise_performed", "telegram_id", "exercise", "performed_at"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     telegram_id: Mapped[int] = mapped_column(
         BigInteger,
         ForeignKey("user_profiles.telegram_id", ondelete="CASCADE"),
         nullable=False,
-        index=True,
     )
     exercise: Mapped[str] = mapped_column(String(120), nullable=False)
     sets: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -49,3 +58,117 @@ class WorkoutEntry(Base):
     performed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False, default=utc_now)
 
     user: Mapped[UserProfile] = relationship(back_populates="workouts")
+
+
+class ArchivedWorkoutEntry(Base):
+    """Workout entries moved out of the hot table by ``python -m app.maintenance archive``."""
+
+    __tablename__ = "workout_entries_archive"
+    __table_args__ = (
+        Index("ix_workout_entries_archive_user_performed", "telegram_id", "performed_at"),
+        Index(
+            "ix_workout_entries_archive_user_exercise_performed",
+            "telegram_id",
+            "exercise",
+            "performed_at",
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    telegram_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("user_profiles.telegram_id", ondelete="CASCADE"),
+        nullable=False,
+    )
+    exercise: Mapped[str] = mapped_column(String(120), nullable=False)
+    sets: Mapped[int] = mapped_column(Integer, nullable=False)
+    reps: Mapped[int] = mapped_column(Integer, nullable=False)
+    weight_kg: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    volume_kg: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+    template: Mapped[Optional[str]] = mapped_column(String(40), nullable=True)
+    notes: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    performed_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class ExerciseRecord(Base):
+    __tablename__ = "exercise_records"
+    __table_args__ = (
+        # Matches the /prs ordering (heaviest first, then by name), so it needs no sort.
+        Index("ix_exercise_records_user_weight_exercise", "telegram_id", desc("best_weight_kg"), "exercise"),
+    )
+
+    telegram_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("user_profiles.telegram_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    exercise: Mapped[str] = mapped_column(String(120), primary_key=True)
+    best_weight_kg: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    best_weight_reps: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    best_weight_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    best_set_volume_kg: Mapped[Optional[float]] = mapped_column(Float, nullable=True)
+    best_set_volume_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    best_reps: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    best_reps_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+
+    telegram_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("user_profiles.telegram_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    entries: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    total_reps: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    total_volume_kg: Mapped[float] = mapped_column(Float, nullable=False, default=0.0, server_default="0")
+
+
+class DailyExerciseRollup(Base):
+    __tablename__ = "daily_exercise_rollups"
+
+    telegram_id: Mapped[int] = mapped_column(
+        BigInteger,
+        ForeignKey("user_profiles.telegram_id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    exercise: Mapped[str] = mapped_column(String(120), primary_key=True)
+    entries: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+class WorkerLease(Base):
+    __tablename__ = "worker_leases"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    owner_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+
+
+class FsmRecord(Base):
+    __tablename__ = "fsm_states"
+
+    key: Mapped[str] = mapped_column(String(255), primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    data: Mapped[str] = mapped_column(Text, nullable=False, default="{}", server_default="{}")
+    # State of a flow that expired while idle, kept until the user has been told about it.
+    expired_state: Mapped[Optional[str]] = mapped_column(String(255), nullable=True)
+    # Bumped on every write; processes only overwrite the version they read.
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=1, server_default="1")
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=utc_now,
+        index=True,
+    )
+
+
+class UserShard(Base):
+    """Directory of users pinned to a shard other than the one their id hashes to."""
+
+    __tablename__ = "user_shards"
+
+    telegram_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    shard: Mapped[str] = mapped_column(String(64), nullable=False)
@@ -1,9 +1,85 @@
 from __future__ import annotations
 
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
-from sqlalchemy.engine import make_url
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import CompoundSelect, Select
+
+from app.config import Settings
+
+# Set in session.info to let a session's reads go to the replica engine.
+USE_REPLICA = "use_replica"
+# Set in session.info to keep every statement of a session, reads included, on the writer.
+USE_WRITER = "use_writer"
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    name: str = "default"
+    pool_size: int = 10
+    max_overflow: int = 10
+    pool_recycle_seconds: int = 1800
+    sqlite_readers: int = 4
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_bytes: int = 256 * 1024 * 1024
+    sqlite_cache_kib: int = 64 * 1024
+
+
+@dataclass
+class Database:
+    engine: AsyncEngine
+    read_engine: AsyncEngine
+    session_factory: async_sessionmaker[AsyncSession]
+    replica_engine: AsyncEngine | None = None
+
+    async def dispose(self) -> None:
+        if self.replica_engine is not None:
+            await self.replica_engine.dispose()
+        if self.read_engine is not self.engine:
+            await self.read_engine.dispose()
+        await self.engine.dispose()
+
+
+class RoutingSession(Session):
+    """Sends reads to the reader engine and everything else to the writer engine.
+
+    Once a session has written it stays on the writer, so it always reads its own writes.
+    Read-modify-write code sets ``info[USE_WRITER]`` before its first read, so the read and
+    the write share one transaction on one connection. Reads go to the replica, which may lag
+    behind, only while ``info[USE_REPLICA]`` is set.
+    """
+
+    def __init__(
+        self,
+        *args: Any,
+        writer: Engine,
+        reader: Engine,
+        replica: Engine | None = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.writer = writer
+        self.reader = reader
+        self.replica = replica
+
+    def get_bind(self, mapper: Any = None, *, clause: Any = None, **kw: Any) -> Engine:
+        if self.info.get(USE_WRITER):
+            return self.writer
+
+        is_read = isinstance(clause, (Select, CompoundSelect)) and clause._for_update_arg is None
+        if is_read and not self._flushing:
+            if self.replica is not None and self.info.get(USE_REPLICA):
+                return self.replica
+            return self.reader
+
+        if clause is not None or self._flushing:
+            self.info[USE_WRITER] = True
+        return self.writer
 
 
 def _ensure_sqlite_parent_dir(database_url: str) -> None:
@@ -22,11 +98,126 @@ def _ensure_sqlite_parent_dir(database_url: str) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
 
 
-def create_engine_and_session_factory(
+def resolve_profile_name(name: str, database_url: str) -> str:
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if name == "auto":
+        name = {"sqlite": "sqlite", "postgresql": "postgres"}.get(backend, "default")
+
+    if name == "sqlite" and (backend != "sqlite" or url.database in (None, "", ":memory:")):
+        return "default"
+    if name == "postgres" and backend != "postgresql":
+        return "default"
+    return name
+
+
+def _apply_sqlite_pragmas(engine: AsyncEngine, profile: StorageProfile, read_only: bool) -> None:
+    pragmas = [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={profile.sqlite_busy_timeout_ms}",
+        f"PRAGMA mmap_size={profile.sqlite_mmap_bytes}",
+        f"PRAGMA cache_size=-{profile.sqlite_cache_kib}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection: Any, _: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def storage_profile_from_settings(settings: Settings) -> StorageProfile:
+    return StorageProfile(
+        name=settings.storage_profile,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_recycle_seconds=settings.db_pool_recycle_seconds,
+        sqlite_readers=settings.sqlite_readers,
+    )
+
+
+def _create_engine(database_url: str, profile_name: str, profile: StorageProfile) -> AsyncEngine:
+    if profile_name == "postgres":
+        return create_async_engine(
+            database_url,
+            pool_size=profile.pool_size,
+            max_overflow=profile.max_overflow,
+            pool_recycle=profile.pool_recycle_seconds,
+            pool_pre_ping=False,
+        )
+    return create_async_engine(database_url, pool_pre_ping=True)
+
+
+def _create_replica_engine(replica_url: str, profile: StorageProfile) -> AsyncEngine:
+    profile_name = resolve_profile_name(profile.name, replica_url)
+    if profile_name == "sqlite":
+        replica = create_async_engine(replica_url, pool_size=profile.sqlite_readers, max_overflow=0)
+        _apply_sqlite_pragmas(replica, profile, read_only=True)
+        return replica
+    return _create_engine(replica_url, profile_name, profile)
+
+
+def create_database(
     database_url: str,
-) -> tuple[AsyncEngine, async_sessionmaker[AsyncSession]]:
+    profile: StorageProfile | None = None,
+    replica_url: str | None = None,
+) -> Database:
     _ensure_sqlite_parent_dir(database_url)
+    profile = profile or StorageProfile()
+    profile_name = resolve_profile_name(profile.name, database_url)
+    replica = _create_replica_engine(replica_url, profile) if replica_url else None
+
+    if profile_name == "sqlite":
+        # SQLite allows one writer at a time: give writes a single dedicated connection
+        # and let WAL readers proceed in parallel from their own pool.
+        writer = create_async_engine(database_url, pool_size=1, max_overflow=0)
+        reader = create_async_engine(database_url, pool_size=profile.sqlite_readers, max_overflow=0)
+        _apply_sqlite_pragmas(writer, profile, read_only=False)
+        _apply_sqlite_pragmas(reader, profile, read_only=True)
+
+        session_factory = async_sessionmaker(
+            writer,
+            expire_on_commit=False,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            writer=writer.sync_engine,
+            reader=reader.sync_engine,
+            replica=None if replica is None else replica.sync_engine,
+        )
+        return Database(
+            engine=writer,
+            read_engine=reader,
+            session_factory=session_factory,
+            replica_engine=replica,
+        )
+
+    engine = _create_engine(database_url, profile_name, profile)
+    if replica is None:
+        session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+    else:
+        session_factory = async_sessionmaker(
+            engine,
+            expire_on_commit=False,
+            class_=AsyncSession,
+            sync_session_class=RoutingSession,
+            writer=engine.sync_engine,
+            reader=engine.sync_engine,
+            replica=replica.sync_engine,
+        )
+    return Database(
+        engine=engine,
+        read_engine=engine,
+        session_factory=session_factory,
+        replica_engine=replica,
+    )
 
-    engine = create_async_engine(database_url, pool_pre_ping=True)
-    session_factory = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
-    return engine, session_factory
+
+def create_engine_and_session_factory(
+    database_url: str,
+) -> tuple[AsyncEngine, async_sessionmaker[AsyncSession]]:
+    database = create_database(database_url)
+    return database.engine, database.session_factory
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+from collections.abc import Iterable
+import hashlib
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.bootstrap import init_db
+from app.db.models import UserShard
+from app.db.session import Database, StorageProfile, create_database
+from app.db.upsert import dialect_insert
+
+DEFAULT_SHARD = "main"
+
+
+def _score(shard: str, telegram_id: int) -> int:
+    digest = hashlib.blake2b(f"{shard}:{telegram_id}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "big")
+
+
+def parse_shard_urls(raw: str) -> dict[str, str]:
+    """Parse ``name=url,name=url``; entries without a name are called ``shard1``, ``shard2``..."""
+    shards: dict[str, str] = {}
+    for index, item in enumerate((part.strip() for part in raw.split(",")), start=1):
+        if not item:
+            continue
+        name, separator, url = item.partition("=")
+        if not separator or ":" in name or "/" in name:
+            name, url = f"shard{index}", item
+        name = name.strip()
+        if name == DEFAULT_SHARD or name in shards:
+            raise ValueError(f"Duplicate shard name {name!r}")
+        shards[name] = url.strip()
+    return shards
+
+
+class ShardRouter:
+    """Maps each user to a shard by rendezvous hashing over the shard names.
+
+    Adding a shard only moves the users whose highest score is on the new shard.
+    ``overrides`` pins individual users elsewhere; it mirrors the ``user_shards`` table.
+    """
+
+    def __init__(
+        self,
+        factories: dict[str, async_sessionmaker[AsyncSession]],
+        overrides: dict[int, str] | None = None,
+    ) -> None:
+        if not factories:
+            raise ValueError("ShardRouter needs at least one shard")
+
+        self.factories = dict(factories)
+        self.names = tuple(self.factories)
+        self.default = self.names[0]
+        self._overrides = dict(overrides or {})
+
+    @classmethod
+    def single(cls, factory: async_sessionmaker[AsyncSession]) -> ShardRouter:
+        return cls({DEFAULT_SHARD: factory})
+
+    def placement(self, telegram_id: int) -> str:
+        """The shard the user hashes to, ignoring overrides."""
+        if len(self.names) == 1:
+            return self.default
+        return max(self.names, key=lambda name: (_score(name, telegram_id), name))
+
+    def shard_for(self, telegram_id: int | None) -> str:
+        if telegram_id is None:
+            return self.default
+        return self._overrides.get(telegram_id) or self.placement(telegram_id)
+
+    def factory_for(self, telegram_id: int | None) -> async_sessionmaker[AsyncSession]:
+        return self.factories[self.shard_for(telegram_id)]
+
+    def group(self, telegram_ids: Iterable[int]) -> dict[str, list[int]]:
+        groups: dict[str, list[int]] = {}
+        for telegram_id in telegram_ids:
+            groups.setdefault(self.shard_for(telegram_id), []).append(telegram_id)
+        return groups
+
+    def set_override(self, telegram_id: int, shard: str | None) -> None:
+        if shard is not None and shard not in self.factories:
+            raise ValueError(f"Unknown shard {shard!r}")
+        if shard is None or shard == self.placement(telegram_id):
+            self._overrides.pop(telegram_id, None)
+        else:
+            self._overrides[telegram_id] = shard
+
+
+async def load_overrides(session_factory: async_sessionmaker[AsyncSession]) -> dict[int, str]:
+    async with session_factory() as session:
+        rows = await session.execute(select(UserShard.telegram_id, UserShard.shard))
+        return {telegram_id: shard for telegram_id, shard in rows}
+
+
+async def save_override(
+    session_factory: async_sessionmaker[AsyncSession],
+    router: ShardRouter,
+    telegram_id: int,
+    shard: str,
+) -> None:
+    """Record ``shard`` as the user's home, in the table and in ``router``."""
+    router.set_override(telegram_id, shard)
+    async with session_factory() as session:
+        if router.placement(telegram_id) == shard:
+            await session.execute(delete(UserShard).where(UserShard.telegram_id == telegram_id))
+        else:
+            table = UserShard.__table__
+            stmt = dialect_insert(session, table).values(telegram_id=telegram_id, shard=shard)
+            stmt = stmt.on_conflict_do_update(index_elements=[table.c.telegram_id], set_={"shard": shard})
+            await session.execute(stmt)
+        await session.commit()
+
+
+async def connect_shards(
+    main: Database,
+    shard_urls: dict[str, str],
+    profile: StorageProfile | None = None,
+) -> tuple[ShardRouter, dict[str, Database]]:
+    """Open the extra shards next to ``main`` and load the directory, which lives on ``main``."""
+    databases = {name: create_database(url, profile) for name, url in shard_urls.items()}
+    for database in databases.values():
+        await init_db(database.engine)
+
+    factories = {DEFAULT_SHARD: main.session_factory}
+    factories.update((name, database.session_factory) for name, database in databases.items())
+    overrides = await load_overrides(main.session_factory)
+    return ShardRouter(factories, overrides), databases
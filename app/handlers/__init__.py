@@ -1,6 +1,7 @@
 from aiogram import Dispatcher
 
 from app.handlers.common import router as common_router
+from app.handlers.expired import router as expired_router
 from app.handlers.history import router as history_router
 from app.handlers.reminders import router as reminders_router
 from app.handlers.stats import router as stats_router
@@ -13,3 +14,4 @@ def setup_routers(dispatcher: Dispatcher) -> None:
     dispatcher.include_router(history_router)
     dispatcher.include_router(stats_router)
     dispatcher.include_router(reminders_router)
+    dispatcher.include_router(expired_router)
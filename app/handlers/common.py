@@ -4,6 +4,7 @@ from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.keyboards.main import main_menu_keyboard
 from app.services.workout_service import WorkoutService
@@ -24,7 +25,7 @@ HELP_TEXT = (
     "/history - Last workout logs\n"
     "/stats - Weekly summary\n"
     "/prs - Personal records by weight\n"
-    "/export - Download CSV\n"
+    "/export - Download CSV (/export gz for gzip)\n"
     "/reminder - Setup daily reminder\n"
     "/reminder_off - Disable reminder\n"
     "/cancel - Cancel current flow"
@@ -32,11 +33,12 @@ HELP_TEXT = (
 
 
 @router.message(Command("start"))
-async def cmd_start(message: Message, workout_service: WorkoutService) -> None:
+async def cmd_start(message: Message, workout_service: WorkoutService, session: AsyncSession) -> None:
     if message.from_user is None:
         return
 
-    await workout_service.ensure_profile(message.from_user.id)
+    await workout_service.ensure_profile(message.from_user.id, session=session)
+    await workout_service.commit(session)
     await message.answer(WELCOME_TEXT, reply_markup=main_menu_keyboard())
 
 
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from aiogram import Router
+from aiogram.filters import StateFilter
+from aiogram.fsm.context import FSMContext
+from aiogram.types import CallbackQuery, Message
+
+from app.keyboards.main import main_menu_keyboard
+from app.services.fsm_storage import ExpiringMemoryStorage, SqlStorage
+from app.states.reminder import ReminderSetup
+from app.states.workout import AddWorkout
+
+# Included last: it only sees updates no other handler matched.
+router = Router(name="expired")
+
+
+def _restart_command(expired_state: str) -> str:
+    if expired_state in ReminderSetup:
+        return "/reminder"
+    if expired_state in AddWorkout:
+        return "/add"
+    return "/start"
+
+
+async def flow_expired(_: object, state: FSMContext) -> bool | dict[str, str]:
+    storage = state.storage
+    if not isinstance(storage, (ExpiringMemoryStorage, SqlStorage)):
+        return False
+
+    expired_state = await storage.pop_expired(state.key)
+    if expired_state is None:
+        return False
+    return {"restart_command": _restart_command(expired_state)}
+
+
+@router.message(StateFilter(None), flow_expired)
+async def expired_message(message: Message, restart_command: str) -> None:
+    await message.answer(
+        f"This flow expired after being idle. Run {restart_command} again.",
+        reply_markup=main_menu_keyboard(),
+    )
+
+
+@router.callback_query(StateFilter(None), flow_expired)
+async def expired_callback(callback: CallbackQuery, restart_command: str) -> None:
+    await callback.answer(f"This flow expired. Run {restart_command} again.", show_alert=True)
@@ -4,6 +4,7 @@ from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.exceptions import TelegramBadRequest
 from aiogram.types import CallbackQuery, Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.keyboards.main import history_actions_keyboard
 from app.services.workout_service import WorkoutService
@@ -26,27 +27,33 @@ def _history_text(items: list) -> str:
     return "\n".join(lines)
 
 
-async def _send_history(message: Message, workout_service: WorkoutService) -> None:
+async def _send_history(message: Message, workout_service: WorkoutService, session: AsyncSession) -> None:
     if message.from_user is None:
         return
 
-    rows = await workout_service.recent_workouts(message.from_user.id, limit=10)
+    rows = await workout_service.recent_workouts(message.from_user.id, limit=10, session=session)
+    await workout_service.commit(session)
     await message.answer(_history_text(rows), reply_markup=history_actions_keyboard())
 
 
 @router.message(Command("history"))
 @router.message(F.text == "📜 History")
-async def cmd_history(message: Message, workout_service: WorkoutService) -> None:
-    await _send_history(message, workout_service)
+async def cmd_history(message: Message, workout_service: WorkoutService, session: AsyncSession) -> None:
+    await _send_history(message, workout_service, session)
 
 
 @router.callback_query(F.data == "history:refresh")
-async def callback_history_refresh(callback: CallbackQuery, workout_service: WorkoutService) -> None:
+async def callback_history_refresh(
+    callback: CallbackQuery,
+    workout_service: WorkoutService,
+    session: AsyncSession,
+) -> None:
     if callback.from_user is None or callback.message is None:
         await callback.answer()
         return
 
-    rows = await workout_service.recent_workouts(callback.from_user.id, limit=10)
+    rows = await workout_service.recent_workouts(callback.from_user.id, limit=10, session=session)
+    await workout_service.commit(session)
     try:
         await callback.message.edit_text(_history_text(rows), reply_markup=history_actions_keyboard())
     except TelegramBadRequest as exc:
@@ -56,13 +63,19 @@ async def callback_history_refresh(callback: CallbackQuery, workout_service: Wor
 
 
 @router.callback_query(F.data == "history:delete_last")
-async def callback_history_delete_last(callback: CallbackQuery, workout_service: WorkoutService) -> None:
+async def callback_history_delete_last(
+    callback: CallbackQuery,
+    workout_service: WorkoutService,
+    session: AsyncSession,
+) -> None:
     if callback.from_user is None or callback.message is None:
         await callback.answer()
         return
 
-    deleted = await workout_service.delete_last_workout(callback.from_user.id)
-    rows = await workout_service.recent_workouts(callback.from_user.id, limit=10)
+    # Delete and re-read in one transaction, then commit before talking to Telegram.
+    deleted = await workout_service.delete_last_workout(callback.from_user.id, session=session)
+    rows = await workout_service.recent_workouts(callback.from_user.id, limit=10, session=session)
+    await workout_service.commit(session)
 
     try:
         await callback.message.edit_text(_history_text(rows), reply_markup=history_actions_keyboard())
@@ -4,6 +4,7 @@ from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.workout_service import WorkoutService
 from app.states.reminder import ReminderSetup
@@ -39,6 +40,7 @@ async def process_time(
     message: Message,
     state: FSMContext,
     workout_service: WorkoutService,
+    session: AsyncSession,
 ) -> None:
     if message.from_user is None:
         await state.clear()
@@ -56,7 +58,9 @@ async def process_time(
         telegram_id=message.from_user.id,
         offset_minutes=offset_minutes,
         reminder_time=parsed_time,
+        session=session,
     )
+    await workout_service.commit(session)
     await state.clear()
 
     await message.answer(
@@ -67,11 +71,12 @@ async def process_time(
 
 
 @router.message(Command("reminder_off"))
-async def cmd_reminder_off(message: Message, workout_service: WorkoutService) -> None:
+async def cmd_reminder_off(message: Message, workout_service: WorkoutService, session: AsyncSession) -> None:
     if message.from_user is None:
         return
 
-    disabled = await workout_service.disable_reminder(message.from_user.id)
+    disabled = await workout_service.disable_reminder(message.from_user.id, session=session)
+    await workout_service.commit(session)
     if disabled:
         await message.answer("Reminder disabled.")
         return
@@ -3,10 +3,12 @@ from __future__ import annotations
 from datetime import datetime, timezone
 
 from aiogram import F, Router
-from aiogram.filters import Command
-from aiogram.types import BufferedInputFile, Message
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.services.workout_service import WorkoutService
+from app.utils.files import FileObjectInputFile
 from app.utils.formatters import format_volume
 
 router = Router(name="stats")
@@ -14,11 +16,12 @@ router = Router(name="stats")
 
 @router.message(Command("stats"))
 @router.message(F.text == "📊 Weekly Stats")
-async def cmd_stats(message: Message, workout_service: WorkoutService) -> None:
+async def cmd_stats(message: Message, workout_service: WorkoutService, session: AsyncSession) -> None:
     if message.from_user is None:
         return
 
-    stats = await workout_service.weekly_stats(message.from_user.id)
+    stats = await workout_service.weekly_stats(message.from_user.id, session=session)
+    await workout_service.commit(session)
     if stats.workouts == 0:
         await message.answer("No workouts in the last 7 days.")
         return
@@ -35,35 +38,51 @@ async def cmd_stats(message: Message, workout_service: WorkoutService) -> None:
 
 @router.message(Command("prs"))
 @router.message(F.text == "🏆 PRs")
-async def cmd_prs(message: Message, workout_service: WorkoutService) -> None:
+async def cmd_prs(message: Message, workout_service: WorkoutService, session: AsyncSession) -> None:
     if message.from_user is None:
         return
 
-    records = await workout_service.personal_records(message.from_user.id)
+    records = await workout_service.personal_records(message.from_user.id, session=session)
+    await workout_service.commit(session)
     if not records:
         await message.answer("No weighted workouts yet, so no PR table available.")
         return
 
     lines = ["<b>Personal records (max weight)</b>"]
     for record in records:
-        lines.append(f"• {record.exercise}: {record.best_weight_kg:.1f} kg")
+        line = f"• {record.exercise}: {record.best_weight_kg:.1f} kg"
+        if record.best_weight_reps:
+            line += f" x {record.best_weight_reps}"
+        if record.achieved_at is not None:
+            line += f" ({record.achieved_at:%Y-%m-%d})"
+        lines.append(line)
 
     await message.answer("\n".join(lines))
 
 
 @router.message(Command("export"))
 @router.message(F.text == "📤 Export CSV")
-async def cmd_export(message: Message, workout_service: WorkoutService) -> None:
+async def cmd_export(
+    message: Message,
+    workout_service: WorkoutService,
+    session: AsyncSession,
+    command: CommandObject | None = None,
+) -> None:
     if message.from_user is None:
         return
 
-    csv_bytes = await workout_service.export_csv_bytes(message.from_user.id)
-    if csv_bytes is None:
+    compress = command is not None and (command.args or "").strip().lower() in {"gz", "gzip"}
+    export = await workout_service.export_csv_file(message.from_user.id, compress=compress, session=session)
+    await workout_service.commit(session)
+    if export is None:
         await message.answer("No data to export yet.")
         return
 
     date_part = datetime.now(timezone.utc).strftime("%Y%m%d")
     filename = f"workouts_{message.from_user.id}_{date_part}.csv"
-    document = BufferedInputFile(csv_bytes, filename=filename)
+    if export.compressed:
+        filename += ".gz"
 
-    await message.answer_document(document, caption="Your workout export is ready.")
+    with export:
+        document = FileObjectInputFile(export.file, filename=filename)
+        await message.answer_document(document, caption="Your workout export is ready.")
@@ -144,6 +144,7 @@ async def process_notes(
         await message.answer("Workout flow got inconsistent. Please run /add again.")
         return
 
+    # A single write: no shared session, so the insert can join a group commit.
     workout = await workout_service.create_workout(
         telegram_id=message.from_user.id,
         exercise=exercise,
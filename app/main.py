@@ -1,19 +1,29 @@
 from __future__ import annotations
 
 import asyncio
+import inspect
 import logging
 
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.base import BaseStorage
 
+from app import metrics
 from app.config import get_settings
 from app.db.bootstrap import init_db
-from app.db.session import create_engine_and_session_factory
+from app.db.session import create_database, storage_profile_from_settings
+from app.db.shards import connect_shards, parse_shard_urls
 from app.handlers import setup_routers
+from app.query_budget import QueryBudget, setup_dispatcher_query_budget
+from app.scheduling import UpdateScheduler, setup_dispatcher_scheduling
+from app.services.cache import UserCache
+from app.services.fsm_storage import ExpiringMemoryStorage, SqlStorage
+from app.services.leader import LeaderLease
 from app.services.reminder_worker import ReminderWorker
 from app.services.workout_service import WorkoutService
+from app.unit_of_work import setup_dispatcher_unit_of_work
+from app.webhook import run_webhook
 
 
 async def _on_startup(reminder_worker: ReminderWorker, **_: object) -> None:
@@ -24,38 +34,160 @@ async def _on_shutdown(reminder_worker: ReminderWorker, **_: object) -> None:
     await reminder_worker.stop()
 
 
+def build_dispatcher(
+    workout_service: WorkoutService,
+    reminder_worker: ReminderWorker,
+    storage: BaseStorage | None = None,
+    query_budget: QueryBudget | None = None,
+    scheduler: UpdateScheduler | None = None,
+) -> Dispatcher:
+    dispatcher = Dispatcher(storage=storage or ExpiringMemoryStorage())
+    dispatcher["workout_service"] = workout_service
+    dispatcher["reminder_worker"] = reminder_worker
+
+    setup_routers(dispatcher)
+    setup_dispatcher_scheduling(dispatcher, scheduler or UpdateScheduler())
+    metrics.setup_dispatcher_metrics(dispatcher)
+    setup_dispatcher_query_budget(dispatcher, query_budget or QueryBudget())
+    setup_dispatcher_unit_of_work(dispatcher)
+    dispatcher.startup.register(_on_startup)
+    dispatcher.shutdown.register(_on_shutdown)
+    return dispatcher
+
+
+def _check_polling_backpressure() -> None:
+    # Older aiogram releases pass unknown start_polling arguments to handlers as workflow data,
+    # so the limit would be ignored silently and polling would fetch without bound.
+    if "tasks_concurrency_limit" not in inspect.signature(Dispatcher.start_polling).parameters:
+        raise RuntimeError("Polling needs an aiogram release with tasks_concurrency_limit; see requirements.txt.")
+
+
 async def run() -> None:
     settings = get_settings()
+    if settings.run_mode == "polling":
+        _check_polling_backpressure()
     logging.basicConfig(
         level=getattr(logging, settings.log_level, logging.INFO),
         format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     )
 
-    engine, session_factory = create_engine_and_session_factory(settings.database_url)
-    await init_db(engine)
+    profile = storage_profile_from_settings(settings)
+    database = create_database(
+        settings.database_url,
+        profile,
+        replica_url=settings.database_replica_url or None,
+    )
+    metrics.instrument_engine(database.engine, "writer")
+    if database.read_engine is not database.engine:
+        metrics.instrument_engine(database.read_engine, "reader")
+    if database.replica_engine is not None:
+        metrics.instrument_engine(database.replica_engine, "replica")
+    await init_db(database.engine)
+    shard_urls = parse_shard_urls(settings.database_shards)
+    shards, shard_databases = await connect_shards(database, shard_urls, profile)
+    for name, shard_database in shard_databases.items():
+        metrics.instrument_engine(shard_database.engine, name)
 
     bot = Bot(
         token=settings.bot_token,
         default=DefaultBotProperties(parse_mode=ParseMode.HTML),
     )
-    dispatcher = Dispatcher(storage=MemoryStorage())
-
-    workout_service = WorkoutService(session_factory)
-    reminder_worker = ReminderWorker(bot, workout_service, poll_seconds=settings.reminder_poll_seconds)
-
-    dispatcher["workout_service"] = workout_service
-    dispatcher["reminder_worker"] = reminder_worker
+    bot.session.middleware(metrics.BotApiMetricsMiddleware())
+
+    cache = None
+    if settings.cache_max_users > 0:
+        cache = UserCache(max_users=settings.cache_max_users, ttl_seconds=settings.cache_ttl_seconds)
+        metrics.CACHE_HITS.set_function(lambda: cache.stats().hits)
+        metrics.CACHE_MISSES.set_function(lambda: cache.stats().misses)
+        metrics.CACHE_USERS.set_function(lambda: cache.stats().users)
+
+    workout_service = WorkoutService(
+        shards,
+        cache=cache,
+        read_your_writes_seconds=settings.read_your_writes_seconds,
+    )
+    if settings.write_batch_ms > 0:
+        workout_service.enable_group_commit(
+            max_batch=settings.write_batch_max,
+            max_latency_seconds=settings.write_batch_ms / 1000,
+            max_queue=settings.write_batch_queue,
+        )
+    await workout_service.backfill_reminder_schedule()
+    await workout_service.backfill_personal_records()
+    await workout_service.backfill_daily_rollups()
+    reminder_worker = ReminderWorker(
+        bot,
+        workout_service,
+        poll_seconds=settings.reminder_poll_seconds,
+        send_rate=settings.reminder_send_rate,
+        send_concurrency=settings.reminder_send_concurrency,
+        lease=LeaderLease(
+            database.session_factory,
+            "reminder-worker",
+            ttl_seconds=settings.reminder_lease_seconds,
+        ),
+    )
 
-    setup_routers(dispatcher)
-    dispatcher.startup.register(_on_startup)
-    dispatcher.shutdown.register(_on_shutdown)
+    storage: BaseStorage
+    if settings.fsm_storage == "database":
+        storage = SqlStorage(
+            database.session_factory,
+            flush_seconds=settings.fsm_flush_seconds,
+            idle_ttl_seconds=settings.fsm_idle_ttl_seconds,
+        )
+    else:
+        memory_storage = ExpiringMemoryStorage(
+            ttl_seconds=settings.fsm_idle_ttl_seconds,
+            max_entries=settings.fsm_max_entries,
+        )
+        metrics.FSM_LIVE_CONVERSATIONS.set_function(lambda: memory_storage.stats().live_conversations)
+        storage = memory_storage
+
+    query_budget = QueryBudget(
+        statements=settings.query_budget_statements,
+        sessions=settings.query_budget_sessions,
+        repeats=settings.query_budget_repeats,
+    )
+    dispatcher = build_dispatcher(
+        workout_service,
+        reminder_worker,
+        storage=storage,
+        query_budget=query_budget,
+        scheduler=UpdateScheduler(
+            concurrency=settings.update_concurrency,
+            max_pending=settings.update_queue_size,
+            max_per_chat=settings.update_chat_queue_size,
+            overflow_wait_seconds=settings.update_chat_wait_seconds,
+        ),
+    )
 
+    metrics_runner = None
     try:
-        await bot.delete_webhook(drop_pending_updates=True)
-        await dispatcher.start_polling(bot, allowed_updates=dispatcher.resolve_used_update_types())
+        if settings.metrics_port > 0:
+            metrics_runner = await metrics.start_metrics_server(
+                settings.metrics_host,
+                settings.metrics_port,
+                settings.metrics_path,
+            )
+        if settings.run_mode == "webhook":
+            await run_webhook(bot, dispatcher, settings)
+        else:
+            await bot.delete_webhook(drop_pending_updates=True)
+            # Polling stops fetching while the scheduler's queue is full.
+            await dispatcher.start_polling(
+                bot,
+                allowed_updates=dispatcher.resolve_used_update_types(),
+                tasks_concurrency_limit=settings.update_queue_size,
+            )
     finally:
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
+        await workout_service.close()
+        await storage.close()
         await bot.session.close()
-        await engine.dispose()
+        for shard_database in shard_databases.values():
+            await shard_database.dispose()
+        await database.dispose()
 
 
 if __name__ == "__main__":
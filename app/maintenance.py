@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+import logging
+
+from app.config import get_settings
+from app.db.bootstrap import init_db
+from app.db.models import utc_now
+from app.db.session import Database, create_database, storage_profile_from_settings
+from app.db.shards import ShardRouter, connect_shards, parse_shard_urls
+from app.services.sharding import move_user, rebalance
+from app.services.workout_service import WorkoutService
+
+
+@dataclass(frozen=True)
+class Context:
+    database: Database
+    shards: ShardRouter
+    workout_service: WorkoutService
+
+
+async def _rebuild_records(context: Context, _: argparse.Namespace) -> str:
+    written = await context.workout_service.backfill_personal_records(force=True)
+    return f"Rebuilt {written} personal record rows."
+
+
+async def _rebuild_rollups(context: Context, _: argparse.Namespace) -> str:
+    written = await context.workout_service.backfill_daily_rollups(force=True)
+    return f"Rebuilt {written} daily rollup rows."
+
+
+async def _move_user(context: Context, args: argparse.Namespace) -> str:
+    result = await move_user(context.shards, context.database.session_factory, args.telegram_id, args.shard)
+    return f"Moved user {result.telegram_id} from {result.source} to {result.target} ({result.rows} rows)."
+
+
+async def _rebalance(context: Context, args: argparse.Namespace) -> str:
+    moves = await rebalance(context.shards, context.database.session_factory, dry_run=args.dry_run)
+    verb = "Would move" if args.dry_run else "Moved"
+    counts = Counter((move.source, move.target) for move in moves)
+    lines = [f"{verb} {len(moves)} users."]
+    lines.extend(f"  {source} -> {target}: {count}" for (source, target), count in sorted(counts.items()))
+    return "\n".join(lines)
+
+
+async def _archive(context: Context, args: argparse.Namespace) -> str:
+    days = args.days or get_settings(require_bot_token=False).archive_after_days
+    moved = await context.workout_service.archive_workouts(utc_now() - timedelta(days=days))
+    return f"Archived {moved} workout entries older than {days} days."
+
+
+COMMANDS = {
+    "rebuild-records": _rebuild_records,
+    "rebuild-rollups": _rebuild_rollups,
+    "move-user": _move_user,
+    "rebalance": _rebalance,
+    "archive": _archive,
+}
+
+
+def _parse_args(argv: list[str] | None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m app.maintenance", description="Database maintenance tasks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild-records", help="Rebuild exercise_records from workout_entries.")
+    subparsers.add_parser("rebuild-rollups", help="Rebuild daily rollups from workout_entries.")
+    move = subparsers.add_parser("move-user", help="Move one user's data to another shard.")
+    move.add_argument("telegram_id", type=int)
+    move.add_argument("shard")
+    balance = subparsers.add_parser("rebalance", help="Move users onto the shards they hash to.")
+    balance.add_argument("--dry-run", action="store_true")
+    archive = subparsers.add_parser("archive", help="Move old workout entries to the archive table.")
+    archive.add_argument("--days", type=int, help="Age in days (default: ARCHIVE_AFTER_DAYS).")
+    return parser.parse_args(argv)
+
+
+async def run(argv: list[str] | None = None) -> None:
+    args = _parse_args(argv)
+    settings = get_settings(require_bot_token=False)
+    logging.basicConfig(
+        level=getattr(logging, settings.log_level, logging.INFO),
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+
+    profile = storage_profile_from_settings(settings)
+    database = create_database(settings.database_url, profile)
+    shard_databases: dict[str, Database] = {}
+    try:
+        await init_db(database.engine)
+        shard_urls = parse_shard_urls(settings.database_shards)
+        shards, shard_databases = await connect_shards(database, shard_urls, profile)
+        context = Context(database=database, shards=shards, workout_service=WorkoutService(shards))
+        print(await COMMANDS[args.command](context, args))
+    finally:
+        for shard_database in shard_databases.values():
+            await shard_database.dispose()
+        await database.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,347 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable, Iterable
+import math
+import time
+from typing import Any
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.methods import Response, TelegramMethod
+from aiogram.methods.base import TelegramType
+from aiogram.types import TelegramObject
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def _key(self, labels: dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> list[str]: ...
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._function: Callable[[], float] | None = None
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read a running total kept elsewhere at scrape time (unlabelled counters only)."""
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[LabelValues, float] = {}
+        self._function: Callable[[], float] | None = None
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from ``function`` at scrape time (unlabelled gauges only)."""
+        self._function = function
+
+    def value(self, **labels: str) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> list[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._counts: dict[LabelValues, list[int]] = {}
+        self._sums: dict[LabelValues, float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        counts = self._counts.setdefault(key, [0] * len(self.buckets))
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+                break
+        self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self) -> list[str]:
+        lines = []
+        for key, counts in sorted(self._counts.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    """A minimal Prometheus text-format registry; metrics are process-local."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HANDLER_SECONDS: Histogram = REGISTRY.register(
+    Histogram("bot_handler_seconds", "Handler latency.", ("router", "handler", "event"))
+)
+HANDLER_ERRORS: Counter = REGISTRY.register(
+    Counter("bot_handler_errors_total", "Handlers that raised.", ("router", "handler", "event"))
+)
+DB_STATEMENT_SECONDS: Histogram = REGISTRY.register(
+    Histogram("db_statement_seconds", "SQL statement duration.", ("engine", "operation"))
+)
+DB_ERRORS: Counter = REGISTRY.register(
+    Counter("db_statement_errors_total", "SQL statements that failed.", ("engine", "operation"))
+)
+BOT_API_SECONDS: Histogram = REGISTRY.register(
+    Histogram("bot_api_request_seconds", "Bot API call latency.", ("method",))
+)
+BOT_API_ERRORS: Counter = REGISTRY.register(
+    Counter("bot_api_errors_total", "Bot API calls that failed.", ("method", "error"))
+)
+REMINDERS_DUE: Gauge = REGISTRY.register(
+    Gauge("reminder_due_users", "Users claimed as due in the last reminder tick.")
+)
+REMINDER_SEND_LAG_SECONDS: Histogram = REGISTRY.register(
+    Histogram(
+        "reminder_send_lag_seconds",
+        "Delay between the scheduled reminder minute and the send.",
+        buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 900.0, 3600.0),
+    )
+)
+REMINDER_TICK_SECONDS: Histogram = REGISTRY.register(
+    Histogram(
+        "reminder_tick_seconds",
+        "Reminder tick duration.",
+        buckets=DEFAULT_BUCKETS + (30.0, 60.0, 300.0),
+    )
+)
+REMINDER_DELIVERIES: Counter = REGISTRY.register(
+    Counter("reminder_deliveries_total", "Reminder delivery outcomes.", ("outcome",))
+)
+CACHE_HITS: Counter = REGISTRY.register(Counter("read_cache_hits_total", "Read cache hits."))
+CACHE_MISSES: Counter = REGISTRY.register(Counter("read_cache_misses_total", "Read cache misses."))
+CACHE_USERS: Gauge = REGISTRY.register(Gauge("read_cache_users", "Users currently in the read cache."))
+FSM_LIVE_CONVERSATIONS: Gauge = REGISTRY.register(
+    Gauge("fsm_live_conversations", "Conversations with an active FSM state.")
+)
+DB_WRITE_BATCH_SIZE: Histogram = REGISTRY.register(
+    Histogram(
+        "db_write_batch_size",
+        "Writes committed together by group commit.",
+        buckets=(1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 64.0, 128.0, 256.0),
+    )
+)
+QUERY_BUDGET_EXCEEDED: Counter = REGISTRY.register(
+    Counter(
+        "db_query_budget_exceeded_total",
+        "Handler runs over the per-update SQL budget.",
+        ("handler", "reason"),
+    )
+)
+
+UPDATE_QUEUE_DEPTH: Gauge = REGISTRY.register(
+    Gauge("update_queue_depth", "Updates waiting for their chat's turn or a free handler slot.")
+)
+UPDATE_WAIT_SECONDS: Histogram = REGISTRY.register(
+    Histogram("update_queue_wait_seconds", "Time an update waited before its handlers ran.")
+)
+UPDATES_DROPPED: Counter = REGISTRY.register(
+    Counter("updates_dropped_total", "Updates dropped because their chat already had too many pending.")
+)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: times the matched handler, labelled by router and handler name."""
+
+    def __init__(self, event_name: str) -> None:
+        self._event_name = event_name
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        router = data.get("event_router")
+        handler_object = data.get("handler")
+        labels = {
+            "router": getattr(router, "name", "") or "",
+            "handler": getattr(getattr(handler_object, "callback", None), "__name__", "unknown"),
+            "event": self._event_name,
+        }
+
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(**labels)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, **labels)
+
+
+class BotApiMetricsMiddleware(BaseRequestMiddleware):
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        api_method = method.__api_method__
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as exc:
+            BOT_API_ERRORS.inc(method=api_method, error=type(exc).__name__)
+            raise
+        finally:
+            BOT_API_SECONDS.observe(time.perf_counter() - started, method=api_method)
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return keyword if keyword in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH") else "OTHER"
+
+
+def instrument_engine(engine: AsyncEngine, name: str) -> None:
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn: Any, cursor: Any, statement: str, *_: Any) -> None:
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn: Any, cursor: Any, statement: str, *_: Any) -> None:
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        DB_STATEMENT_SECONDS.observe(elapsed, engine=name, operation=_operation(statement))
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context: Any) -> None:
+        stack = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        DB_ERRORS.inc(engine=name, operation=_operation(context.statement or ""))
+
+
+def setup_dispatcher_metrics(dispatcher: Dispatcher) -> None:
+    for event_name in ("message", "callback_query"):
+        dispatcher.observers[event_name].middleware(HandlerMetricsMiddleware(event_name))
+
+
+async def metrics_handler(_: web.Request) -> web.Response:
+    return web.Response(body=REGISTRY.render().encode("utf-8"), headers={"Content-Type": CONTENT_TYPE})
+
+
+def create_metrics_app(path: str = "/metrics") -> web.Application:
+    app = web.Application()
+    app.router.add_get(path, metrics_handler)
+    return app
+
+
+async def start_metrics_server(host: str, port: int, path: str = "/metrics") -> web.AppRunner:
+    # Metrics get their own listener so they are never reachable through the public webhook port.
+    runner = web.AppRunner(create_metrics_app(path))
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    return runner
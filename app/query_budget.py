@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from collections import Counter
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+import logging
+from typing import Any
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.metrics import QUERY_BUDGET_EXCEEDED
+
+logger = logging.getLogger(__name__)
+
+_SESSION_MARK = "query_stats"
+
+
+@dataclass(frozen=True)
+class QueryBudget:
+    statements: int = 8
+    sessions: int = 2
+    repeats: int = 3
+
+
+@dataclass
+class QueryStats:
+    statements: int = 0
+    sessions: int = 0
+    by_statement: Counter[str] = field(default_factory=Counter)
+    active: bool = True
+
+    def repeated(self, limit: int) -> list[tuple[str, int]]:
+        """Statements run more than ``limit`` times, most frequent first (likely N+1)."""
+        return [(statement, count) for statement, count in self.by_statement.most_common() if count > limit]
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _active_stats() -> QueryStats | None:
+    stats = _current.get()
+    return stats if stats is not None and stats.active else None
+
+
+def _on_statement(conn: Any, cursor: Any, statement: str, *_: Any) -> None:
+    stats = _active_stats()
+    if stats is not None:
+        stats.statements += 1
+        stats.by_statement[statement] += 1
+
+
+def _on_session_begin(session: Session, *_: Any) -> None:
+    stats = _active_stats()
+    # after_begin fires once per connection, so a routed session is still counted once.
+    if stats is not None and session.info.get(_SESSION_MARK) is not stats:
+        session.info[_SESSION_MARK] = stats
+        stats.sessions += 1
+
+
+def install() -> None:
+    """Register the engine and session listeners; safe to call more than once."""
+    if not event.contains(Engine, "before_cursor_execute", _on_statement):
+        event.listen(Engine, "before_cursor_execute", _on_statement)
+    if not event.contains(Session, "after_begin", _on_session_begin):
+        event.listen(Session, "after_begin", _on_session_begin)
+
+
+@contextmanager
+def track() -> Iterator[QueryStats]:
+    """Count statements and sessions issued in the current context (and tasks started from it)."""
+    install()
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        # Tasks spawned inside still see this object through their copied context.
+        stats.active = False
+        _current.reset(token)
+
+
+def _shorten(statement: str, limit: int = 200) -> str:
+    flat = " ".join(statement.split())
+    return flat if len(flat) <= limit else flat[: limit - 3] + "..."
+
+
+class QueryBudgetMiddleware(BaseMiddleware):
+    """Inner middleware: warns about handlers that exceed the per-update query budget."""
+
+    def __init__(self, budget: QueryBudget) -> None:
+        self._budget = budget
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        with track() as stats:
+            result = await handler(event, data)
+
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        self._check(name, stats)
+        return result
+
+    def _check(self, handler_name: str, stats: QueryStats) -> None:
+        if stats.statements > self._budget.statements:
+            QUERY_BUDGET_EXCEEDED.inc(handler=handler_name, reason="statements")
+            logger.warning(
+                "Handler %s issued %s SQL statements (budget %s)",
+                handler_name,
+                stats.statements,
+                self._budget.statements,
+            )
+        if stats.sessions > self._budget.sessions:
+            QUERY_BUDGET_EXCEEDED.inc(handler=handler_name, reason="sessions")
+            logger.warning(
+                "Handler %s opened %s DB sessions (budget %s)",
+                handler_name,
+                stats.sessions,
+                self._budget.sessions,
+            )
+        for statement, count in stats.repeated(self._budget.repeats):
+            QUERY_BUDGET_EXCEEDED.inc(handler=handler_name, reason="repeats")
+            logger.warning("Possible N+1 in handler %s: %s× %s", handler_name, count, _shorten(statement))
+
+
+def setup_dispatcher_query_budget(dispatcher: Dispatcher, budget: QueryBudget) -> None:
+    install()
+    for event_name in ("message", "callback_query"):
+        dispatcher.observers[event_name].middleware(QueryBudgetMiddleware(budget))
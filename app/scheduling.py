@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+import logging
+import time
+from typing import Any
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.exceptions import TelegramAPIError
+from aiogram.fsm.context import FSMContext
+from aiogram.types import TelegramObject
+
+from app.metrics import UPDATE_QUEUE_DEPTH, UPDATE_WAIT_SECONDS, UPDATES_DROPPED
+
+SLOW_DOWN_TEXT = "Too many messages at once. Please wait for my replies, then send the rest again."
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _ChatQueue:
+    room: asyncio.Semaphore
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    members: int = 0
+    warned: bool = False
+
+
+class UpdateScheduler:
+    """Runs each chat's updates one at a time, in arrival order, and at most ``concurrency`` at once.
+
+    At most ``max_pending`` updates are admitted, running or waiting. Further updates wait to be
+    admitted, so a burst queues up in front of the handlers instead of inside the DB pool.
+    A single chat may hold at most ``max_per_chat`` admitted updates, so one flooding chat
+    cannot take the whole queue from everyone else. Its further updates wait for room in their
+    chat, in order; one that waited ``overflow_wait_seconds`` may be dropped, if the caller allows.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 20,
+        max_pending: int = 1000,
+        max_per_chat: int = 20,
+        overflow_wait_seconds: float = 10.0,
+    ) -> None:
+        if concurrency < 1 or max_pending < 1 or max_per_chat < 1:
+            raise ValueError("concurrency, max_pending and max_per_chat must be at least 1")
+
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.max_per_chat = max_per_chat
+        self.overflow_wait_seconds = overflow_wait_seconds
+        self._admission = asyncio.Semaphore(max_pending)
+        self._slots = asyncio.Semaphore(concurrency)
+        self._chats: dict[int, _ChatQueue] = {}
+        self._waiting = 0
+
+    @property
+    def waiting(self) -> int:
+        """Updates that have arrived but are not running yet."""
+        return self._waiting
+
+    async def wait_for_space(self) -> None:
+        """Return once the queue has room for another update."""
+        async with self._admission:
+            pass
+
+    @asynccontextmanager
+    async def turn(
+        self,
+        chat_id: int | None,
+        may_drop: Callable[[], Awaitable[bool]] | None = None,
+    ) -> AsyncIterator[bool]:
+        """Wait for room in the chat, admission, the chat's previous updates and a free slot.
+
+        Yields True once the update may run. Yields False, having taken nothing, when the chat
+        stayed full for ``overflow_wait_seconds`` and ``may_drop`` agreed to drop the update.
+        """
+        started = time.perf_counter()
+        queue = self._join(chat_id)
+        self._waiting += 1
+        running = False
+        try:
+            if not await self._wait_for_room(queue, may_drop):
+                yield False
+                return
+
+            try:
+                # asyncio.Lock wakes waiters first come, first served, which keeps the chat's order.
+                async with self._admission, queue.lock, self._slots:
+                    self._waiting -= 1
+                    running = True
+                    UPDATE_WAIT_SECONDS.observe(time.perf_counter() - started)
+                    yield True
+            finally:
+                queue.room.release()
+        finally:
+            if not running:
+                self._waiting -= 1
+            self._leave(chat_id, queue)
+
+    def warn_once(self, chat_id: int | None) -> bool:
+        """True the first time it is asked about a chat's current backlog."""
+        queue = self._chats.get(chat_id) if chat_id is not None else None
+        if queue is None or queue.warned:
+            return False
+        queue.warned = True
+        return True
+
+    async def _wait_for_room(
+        self,
+        queue: _ChatQueue,
+        may_drop: Callable[[], Awaitable[bool]] | None,
+    ) -> bool:
+        if not queue.room.locked():
+            await queue.room.acquire()
+            return True
+
+        # The semaphore wakes waiters in arrival order, so the acquire is kept, not restarted,
+        # while the caller decides: an update that is not dropped keeps its place.
+        acquire = asyncio.ensure_future(queue.room.acquire())
+        try:
+            while True:
+                done, _ = await asyncio.wait({acquire}, timeout=self.overflow_wait_seconds)
+                if done:
+                    return True
+                if may_drop is not None and await may_drop() and not acquire.done():
+                    acquire.cancel()
+                    return False
+        except BaseException:
+            if acquire.done() and not acquire.cancelled() and acquire.exception() is None:
+                queue.room.release()
+            acquire.cancel()
+            raise
+
+    def _join(self, chat_id: int | None) -> _ChatQueue:
+        if chat_id is None:
+            return _ChatQueue(room=asyncio.Semaphore(self.max_per_chat))
+        queue = self._chats.get(chat_id)
+        if queue is None:
+            queue = self._chats[chat_id] = _ChatQueue(room=asyncio.Semaphore(self.max_per_chat))
+        queue.members += 1
+        return queue
+
+    def _leave(self, chat_id: int | None, queue: _ChatQueue) -> None:
+        if chat_id is None:
+            return
+        queue.members -= 1
+        if queue.members == 0:
+            del self._chats[chat_id]
+
+
+class SchedulingMiddleware(BaseMiddleware):
+    """Outer update middleware: hands every update to the scheduler before any handler runs."""
+
+    def __init__(self, scheduler: UpdateScheduler) -> None:
+        self._scheduler = scheduler
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        chat_id = chat.id if chat is not None else user.id if user is not None else None
+        state: FSMContext | None = data.get("state")
+
+        async def may_drop() -> bool:
+            # Never inside a flow: losing one of its answers would break the conversation.
+            return state is None or await state.get_state() is None
+
+        async with self._scheduler.turn(chat_id, may_drop) as admitted:
+            if admitted:
+                return await handler(event, data)
+
+            UPDATES_DROPPED.inc()
+            bot: Bot | None = data.get("bot")
+            if chat_id is not None and bot is not None and self._scheduler.warn_once(chat_id):
+                try:
+                    await bot.send_message(chat_id, SLOW_DOWN_TEXT)
+                except TelegramAPIError:
+                    logger.warning("Could not tell chat=%s to slow down", chat_id, exc_info=True)
+            return None
+
+
+def setup_dispatcher_scheduling(dispatcher: Dispatcher, scheduler: UpdateScheduler) -> None:
+    # Registered after aiogram's own outer middlewares, so event_chat and state are already resolved.
+    dispatcher.update.outer_middleware(SchedulingMiddleware(scheduler))
+    dispatcher["update_scheduler"] = scheduler
+    UPDATE_QUEUE_DEPTH.set_function(lambda: scheduler.waiting)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from collections.abc import Callable
+from datetime import datetime
+
+from sqlalchemy import CompoundSelect, Select, Table, delete, insert, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import ArchivedWorkoutEntry, WorkoutEntry
+
+HOT_TABLE: Table = WorkoutEntry.__table__
+COLD_TABLE: Table = ArchivedWorkoutEntry.__table__
+ARCHIVE_BATCH_ROWS = 1000
+
+# Archived rows get their own ids, so everything but the id is carried over.
+_CARRIED_COLUMNS = [column.name for column in COLD_TABLE.c if column.name != "id"]
+
+
+def workout_history(build: Callable[[Table], Select]) -> CompoundSelect:
+    """Run ``build`` against the hot and the archive table and UNION ALL the results.
+
+    Filters belong inside ``build`` so each side can use its own indexes.
+    """
+    return union_all(build(HOT_TABLE), build(COLD_TABLE))
+
+
+async def archive_batch(
+    session: AsyncSession,
+    cutoff: datetime,
+    after_id: int = 0,
+    limit: int = ARCHIVE_BATCH_ROWS,
+) -> list[tuple[int, int]]:
+    """Move up to ``limit`` entries performed before ``cutoff`` to the archive.
+
+    Entries are taken in id order starting after ``after_id``, so a caller can resume from
+    the last id instead of rescanning recent rows. Returns ``(id, telegram_id)`` for each
+    moved entry. Rollups and records are left alone: they already account for these entries.
+    """
+    rows = (
+        await session.execute(
+            select(HOT_TABLE.c.id, HOT_TABLE.c.telegram_id)
+            .where(HOT_TABLE.c.id > after_id, HOT_TABLE.c.performed_at < cutoff)
+            .order_by(HOT_TABLE.c.id)
+            .limit(limit)
+        )
+    ).all()
+    if not rows:
+        return []
+
+    entry_ids = [entry_id for entry_id, _ in rows]
+    await session.execute(
+        insert(COLD_TABLE).from_select(
+            _CARRIED_COLUMNS,
+            select(*(HOT_TABLE.c[name] for name in _CARRIED_COLUMNS))
+            .where(HOT_TABLE.c.id.in_(entry_ids))
+            .order_by(HOT_TABLE.c.id),
+        )
+    )
+    await session.execute(delete(HOT_TABLE).where(HOT_TABLE.c.id.in_(entry_ids)))
+    return [(entry_id, telegram_id) for entry_id, telegram_id in rows]
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass, field
+import time
+from typing import Any
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    users: int
+    entries: int
+
+
+@dataclass
+class _UserBucket:
+    generation: int = 0
+    entries: dict[Hashable, tuple[float, Any]] = field(default_factory=dict)
+
+
+class UserCache:
+    """Bounded per-user read-through cache with LRU eviction over users and a per-entry TTL.
+
+    Writers bump the user's generation on invalidation; a reader that started before the
+    bump passes its generation to ``set`` and its (now stale) result is discarded.
+
+    Invalidating a user who is not cached does not take an LRU slot: the generation goes to a
+    separate bounded map. Generations dropped from it, or from evicted users, raise a floor that
+    uncached users fall back to, so a stale read can still never be cached.
+    """
+
+    def __init__(
+        self,
+        max_users: int,
+        ttl_seconds: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._max_users = max_users
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._buckets: OrderedDict[int, _UserBucket] = OrderedDict()
+        self._cold_generations: OrderedDict[int, int] = OrderedDict()
+        self._generation_floor = 0
+        self._last_generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def generation(self, telegram_id: int) -> int:
+        bucket = self._buckets.get(telegram_id)
+        if bucket is not None:
+            return bucket.generation
+        return self._cold_generations.get(telegram_id, self._generation_floor)
+
+    def get(self, telegram_id: int, key: Hashable) -> tuple[bool, Any]:
+        bucket = self._buckets.get(telegram_id)
+        if bucket is not None:
+            cached = bucket.entries.get(key)
+            if cached is not None:
+                expires_at, value = cached
+                if expires_at > self._clock():
+                    self._buckets.move_to_end(telegram_id)
+                    self._hits += 1
+                    return True, value
+                del bucket.entries[key]
+
+        self._misses += 1
+        return False, None
+
+    def set(self, telegram_id: int, key: Hashable, value: Any, generation: int | None = None) -> None:
+        bucket = self._buckets.get(telegram_id)
+        if bucket is None:
+            current = self.generation(telegram_id)
+            if generation is not None and generation != current:
+                return
+            self._cold_generations.pop(telegram_id, None)
+            bucket = _UserBucket(generation=current)
+            self._buckets[telegram_id] = bucket
+            self._evict()
+        elif generation is not None and generation != bucket.generation:
+            return
+
+        bucket.entries[key] = (self._clock() + self._ttl_seconds, value)
+        self._buckets.move_to_end(telegram_id)
+
+    def invalidate(self, telegram_id: int) -> None:
+        self._last_generation += 1
+        bucket = self._buckets.get(telegram_id)
+        if bucket is not None:
+            bucket.generation = self._last_generation
+            bucket.entries.clear()
+            return
+
+        self._cold_generations[telegram_id] = self._last_generation
+        self._cold_generations.move_to_end(telegram_id)
+        while len(self._cold_generations) > self._max_users:
+            _, dropped = self._cold_generations.popitem(last=False)
+            self._generation_floor = max(self._generation_floor, dropped)
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            users=len(self._buckets),
+            entries=sum(len(bucket.entries) for bucket in self._buckets.values()),
+        )
+
+    def _evict(self) -> None:
+        while len(self._buckets) > self._max_users:
+            _, bucket = self._buckets.popitem(last=False)
+            self._generation_floor = max(self._generation_floor, bucket.generation)
+            self._evictions += 1
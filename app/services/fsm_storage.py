@@ -0,0 +1,443 @@
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+import json
+import logging
+import time
+from typing import Any, Mapping
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import FsmRecord, utc_now
+from app.db.upsert import dialect_insert
+
+
+@dataclass
+class _Record:
+    state: str | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+    touched_at: float = 0.0
+    # Version of the fsm_states row this record was read from; None when there was no row.
+    version: int | None = None
+    # State of the flow that expired before this record was read (SqlStorage only).
+    expired_state: str | None = None
+
+
+@dataclass(frozen=True)
+class FsmStats:
+    live_conversations: int
+    entries: int
+    tombstones: int
+    expired: int
+    evicted: int
+
+
+class SqlStorage(BaseStorage):
+    """FSM storage kept in the ``fsm_states`` table, shared by every process of the bot.
+
+    A key's row is read once and then served from a per-process cache of up to ``max_cached``
+    records. Changes are written behind, all changed keys together every ``flush_seconds``.
+    Writes are compare-and-swap on the row's version: a process whose copy another process has
+    since replaced drops its change (and logs it) instead of overwriting the newer step, and
+    reads the row again on next use. Keys whose flow has finished are deleted. A flow idle for
+    ``idle_ttl_seconds`` expires: its row keeps only the expired state, for ``pop_expired``,
+    until the user is told or ``tombstone_seconds`` pass.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        flush_seconds: float = 2.0,
+        idle_ttl_seconds: float = 3600.0,
+        sweep_seconds: float = 60.0,
+        max_cached: int = 10_000,
+        tombstone_seconds: float = 86_400.0,
+    ) -> None:
+        self._session_factory = session_factory
+        self._flush_seconds = flush_seconds
+        self._idle_ttl_seconds = idle_ttl_seconds
+        self._tombstone_seconds = tombstone_seconds
+        self._sweep_seconds = sweep_seconds
+        self._max_cached = max_cached
+        self._key_builder = DefaultKeyBuilder(
+            with_bot_id=True,
+            with_business_connection_id=True,
+            with_destiny=True,
+        )
+        self._records: OrderedDict[str, _Record] = OrderedDict()
+        self._dirty: set[str] = set()
+        self._flushing: set[str] = set()
+        self._flush_lock = asyncio.Lock()
+        self._last_sweep = time.monotonic()
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._logger = logging.getLogger(__name__)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = await self._record(key)
+        record.state = state.state if isinstance(state, State) else state
+        record.expired_state = None
+        self._mark_dirty(key)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._record(key)).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+
+        record = await self._record(key)
+        record.data = data.copy()
+        record.expired_state = None
+        self._mark_dirty(key)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return (await self._record(key)).data.copy()
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> dict[str, Any]:
+        # Changes the cached record in place instead of the base class's get_data + set_data copies.
+        record = await self._record(key)
+        record.data = {**record.data, **data}
+        record.expired_state = None
+        self._mark_dirty(key)
+        return record.data.copy()
+
+    async def pop_expired(self, key: StorageKey) -> str | None:
+        """Return the state of a flow that expired while idle, once."""
+        record = await self._record(key)
+        expired_state = record.expired_state
+        if expired_state is not None:
+            record.expired_state = None
+            self._mark_dirty(key)
+        return expired_state
+
+    async def flush(self) -> None:
+        # One flush at a time, so the timer and close() never race on a version.
+        async with self._flush_lock:
+            await self._flush_dirty()
+
+    async def expire_idle(self) -> int:
+        """Expire flows nobody has touched for ``idle_ttl_seconds``; returns how many."""
+        now = utc_now()
+        cutoff = now - timedelta(seconds=self._idle_ttl_seconds)
+        tombstone_cutoff = now - timedelta(seconds=self._tombstone_seconds)
+        async with self._session_factory() as session:
+            # Flows in a state keep it as a marker; the version bump fails any cached copy's write.
+            marked = await session.execute(
+                update(FsmRecord)
+                .where(FsmRecord.updated_at < cutoff, FsmRecord.state.is_not(None))
+                .values(
+                    expired_state=FsmRecord.state,
+                    state=None,
+                    data="{}",
+                    version=FsmRecord.version + 1,
+                    updated_at=now,
+                )
+                .returning(FsmRecord.key, FsmRecord.expired_state)
+            )
+            marked_rows = marked.all()
+            deleted = await session.execute(
+                delete(FsmRecord)
+                .where(
+                    or_(
+                        and_(FsmRecord.updated_at < cutoff, FsmRecord.expired_state.is_(None)),
+                        FsmRecord.updated_at < tombstone_cutoff,
+                    )
+                )
+                .returning(FsmRecord.key, FsmRecord.expired_state)
+            )
+            deleted_rows = deleted.all()
+            await session.commit()
+
+        self._last_sweep = time.monotonic()
+        for db_key, _ in [*marked_rows, *deleted_rows]:
+            if not self._is_pending(db_key):
+                self._records.pop(db_key, None)
+        # Deleted markers belong to flows counted when they expired.
+        return len(marked_rows) + sum(expired_state is None for _, expired_state in deleted_rows)
+
+    async def close(self) -> None:
+        self._stop_event.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.flush()
+
+    async def _flush_dirty(self) -> None:
+        keys = list(self._dirty)
+        if not keys:
+            return
+
+        self._dirty.clear()
+        self._flushing.update(keys)
+        now = utc_now()
+        conflicts: list[str] = []
+        try:
+            async with self._session_factory() as session:
+                for db_key in keys:
+                    if not await self._write(session, db_key, self._records[db_key], now):
+                        conflicts.append(db_key)
+                await session.commit()
+        except Exception:
+            self._dirty.update(keys)
+            raise
+        finally:
+            self._flushing.difference_update(keys)
+
+        for db_key in conflicts:
+            # The cached copy is stale: drop it, so the next access reads the newer row.
+            self._logger.warning("FSM state %s was changed by another process; dropping this change", db_key)
+            self._dirty.discard(db_key)
+            self._records.pop(db_key, None)
+        self._evict()
+
+    async def _write(self, session: AsyncSession, db_key: str, record: _Record, now: datetime) -> bool:
+        table = FsmRecord.__table__
+        finished = record.state is None and not record.data and record.expired_state is None
+        values = {
+            "state": record.state,
+            "data": json.dumps(record.data),
+            "expired_state": record.expired_state,
+            "updated_at": now,
+        }
+
+        if record.version is None:
+            if finished:
+                return True
+            stmt = (
+                dialect_insert(session, table)
+                .values(key=db_key, version=1, **values)
+                .on_conflict_do_nothing(index_elements=[table.c.key])
+            )
+            new_version: int | None = 1
+        elif finished:
+            stmt = delete(table).where(table.c.key == db_key, table.c.version == record.version)
+            new_version = None
+        else:
+            stmt = (
+                update(table)
+                .where(table.c.key == db_key, table.c.version == record.version)
+                .values(version=record.version + 1, **values)
+            )
+            new_version = record.version + 1
+
+        result = await session.execute(stmt)
+        if result.rowcount != 1:
+            return False
+        record.version = new_version
+        return True
+
+    async def _record(self, key: StorageKey) -> _Record:
+        db_key = self._key_builder.build(key)
+        record = self._records.get(db_key)
+        if record is not None:
+            self._records.move_to_end(db_key)
+            return record
+
+        stmt = select(FsmRecord.state, FsmRecord.data, FsmRecord.expired_state, FsmRecord.version).where(
+            FsmRecord.key == db_key
+        )
+        async with self._session_factory() as session:
+            row = (await session.execute(stmt)).first()
+
+        if db_key in self._records:
+            # Another step for the same key loaded it while this read was in flight.
+            return self._records[db_key]
+
+        if row is None:
+            record = _Record()
+        else:
+            record = _Record(
+                state=row.state,
+                data=json.loads(row.data),
+                version=row.version,
+                expired_state=row.expired_state,
+            )
+        self._records[db_key] = record
+        self._records.move_to_end(db_key)
+        self._evict()
+        return record
+
+    def _is_pending(self, db_key: str) -> bool:
+        return db_key in self._dirty or db_key in self._flushing
+
+    def _mark_dirty(self, key: StorageKey) -> None:
+        self._dirty.add(self._key_builder.build(key))
+        if self._task is None or self._task.done():
+            self._stop_event.clear()
+            self._task = asyncio.create_task(self._run(), name="fsm-flush")
+
+    def _evict(self) -> None:
+        # Only written records can go; pending ones stay until they are flushed, and the most
+        # recently used one is about to be changed by the caller.
+        excess = len(self._records) - self._max_cached
+        if excess <= 0:
+            return
+
+        clean = [db_key for db_key in list(self._records)[:-1] if not self._is_pending(db_key)]
+        for db_key in clean[:excess]:
+            del self._records[db_key]
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self._flush_seconds)
+            except TimeoutError:
+                pass
+
+            try:
+                await self.flush()
+                if time.monotonic() - self._last_sweep >= self._sweep_seconds:
+                    expired = await self.expire_idle()
+                    if expired:
+                        self._logger.info("Expired %s idle FSM flows", expired)
+            except Exception:
+                self._logger.exception("FSM flush failed, will retry")
+
+
+class ExpiringMemoryStorage(BaseStorage):
+    """In-memory FSM storage with an idle TTL and a global LRU cap on entries.
+
+    A background sweeper drops conversations idle for longer than ``ttl_seconds``. The
+    state of every dropped conversation is kept as a small tombstone, so a handler can
+    tell the user that their flow expired instead of silently ignoring the next message.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 3600.0,
+        max_entries: int = 100_000,
+        sweep_seconds: float = 60.0,
+        tombstone_seconds: float = 86_400.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+        self._sweep_seconds = sweep_seconds
+        self._tombstone_seconds = tombstone_seconds
+        self._clock = clock
+        self._records: OrderedDict[StorageKey, _Record] = OrderedDict()
+        self._tombstones: OrderedDict[StorageKey, tuple[float, str]] = OrderedDict()
+        self._expired = 0
+        self._evicted = 0
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        record = self._touch(key, create=True)
+        record.state = state.state if isinstance(state, State) else state
+        self._tombstones.pop(key, None)
+        self._drop_if_empty(key, record)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        record = self._touch(key)
+        return None if record is None else record.state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+
+        record = self._touch(key, create=True)
+        record.data = data.copy()
+        self._tombstones.pop(key, None)
+        self._drop_if_empty(key, record)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        record = self._touch(key)
+        return {} if record is None else record.data.copy()
+
+    async def pop_expired(self, key: StorageKey) -> str | None:
+        """Return the state of a conversation dropped by TTL or eviction, once."""
+        self._touch(key)
+        tombstone = self._tombstones.pop(key, None)
+        return None if tombstone is None else tombstone[1]
+
+    def sweep(self) -> None:
+        now = self._clock()
+        while self._records:
+            key, record = next(iter(self._records.items()))
+            if now - record.touched_at < self._ttl_seconds:
+                break
+            self._drop(key, expired=True)
+
+        while self._tombstones:
+            key, (dropped_at, _) = next(iter(self._tombstones.items()))
+            if now - dropped_at < self._tombstone_seconds:
+                break
+            del self._tombstones[key]
+
+    def stats(self) -> FsmStats:
+        return FsmStats(
+            live_conversations=sum(record.state is not None for record in self._records.values()),
+            entries=len(self._records),
+            tombstones=len(self._tombstones),
+            expired=self._expired,
+            evicted=self._evicted,
+        )
+
+    async def close(self) -> None:
+        self._stop_event.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    def _touch(self, key: StorageKey, create: bool = False) -> _Record | None:
+        now = self._clock()
+        record = self._records.get(key)
+        if record is not None and now - record.touched_at >= self._ttl_seconds:
+            # Expired but not swept yet: behave exactly as if the sweeper had run.
+            self._drop(key, expired=True)
+            record = None
+
+        if record is None:
+            if not create:
+                return None
+            record = _Record()
+            self._records[key] = record
+            self._evict()
+            self._ensure_sweeper()
+
+        record.touched_at = now
+        self._records.move_to_end(key)
+        return record
+
+    def _drop_if_empty(self, key: StorageKey, record: _Record) -> None:
+        if record.state is None and not record.data:
+            del self._records[key]
+
+    def _drop(self, key: StorageKey, expired: bool) -> None:
+        record = self._records.pop(key)
+        if expired:
+            self._expired += 1
+        else:
+            self._evicted += 1
+
+        if record.state is not None:
+            self._tombstones[key] = (self._clock(), record.state)
+            self._tombstones.move_to_end(key)
+            while len(self._tombstones) > self._max_entries:
+                self._tombstones.popitem(last=False)
+
+    def _evict(self) -> None:
+        while len(self._records) > self._max_entries:
+            self._drop(next(iter(self._records)), expired=False)
+
+    def _ensure_sweeper(self) -> None:
+        if self._task is None or self._task.done():
+            self._stop_event.clear()
+            self._task = asyncio.create_task(self._run(), name="fsm-sweeper")
+
+    async def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self._sweep_seconds)
+            except TimeoutError:
+                self.sweep()
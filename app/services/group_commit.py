@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Awaitable, Callable
+import logging
+from typing import Generic, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.metrics import DB_WRITE_BATCH_SIZE
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_STOP = object()
+
+
+class GroupCommit(Generic[T, R]):
+    """Coalesces writes that arrive close together into one transaction.
+
+    The first queued write opens a batch. The batch then collects more writes for up to
+    ``max_latency_seconds``, or until it holds ``max_batch`` writes, and commits them all at
+    once. Each caller gets back what ``apply`` returned for its own write. When the batch
+    fails, its writes are retried one per transaction, so one bad write does not fail the
+    rest. A full queue makes ``submit`` wait.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        apply: Callable[[AsyncSession, T], Awaitable[R]],
+        commit: Callable[[AsyncSession], Awaitable[None]],
+        max_batch: int = 64,
+        max_latency_seconds: float = 0.005,
+        max_queue: int = 1000,
+    ) -> None:
+        if max_batch < 1:
+            raise ValueError("max_batch must be at least 1")
+
+        self._session_factory = session_factory
+        self._apply = apply
+        self._commit = commit
+        self._max_batch = max_batch
+        self._max_latency = max_latency_seconds
+        self._queue: asyncio.Queue[tuple[T, asyncio.Future[R]] | object] = asyncio.Queue(max_queue)
+        self._closed = False
+        self._task: asyncio.Task[None] | None = None
+        self._logger = logging.getLogger(__name__)
+
+    async def submit(self, item: T) -> R:
+        if self._closed:
+            raise RuntimeError("GroupCommit is closed")
+
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="group-commit")
+
+        future: asyncio.Future[R] = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def close(self) -> None:
+        """Stop accepting writes and commit everything already queued."""
+        if self._closed:
+            return
+
+        self._closed = True
+        if self._task is not None:
+            await self._queue.put(_STOP)
+            await self._task
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            batch: list[tuple[T, asyncio.Future[R]]] = []
+            if first is _STOP:
+                stopping = True
+            else:
+                batch.append(first)  # type: ignore[arg-type]
+
+            deadline = loop.time() + self._max_latency
+            while not stopping and len(batch) < self._max_batch:
+                try:
+                    queued = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        queued = await asyncio.wait_for(self._queue.get(), timeout)
+                    except TimeoutError:
+                        break
+
+                if queued is _STOP:
+                    stopping = True
+                else:
+                    batch.append(queued)  # type: ignore[arg-type]
+
+            if stopping:
+                # Writers that were blocked on a full queue may still land behind the marker.
+                while not self._queue.empty():
+                    queued = self._queue.get_nowait()
+                    if queued is not _STOP:
+                        batch.append(queued)  # type: ignore[arg-type]
+
+            for start in range(0, len(batch), self._max_batch):
+                await self._flush(batch[start : start + self._max_batch])
+
+    async def _flush(self, batch: list[tuple[T, asyncio.Future[R]]]) -> None:
+        if not batch:
+            return
+
+        DB_WRITE_BATCH_SIZE.observe(len(batch))
+        try:
+            async with self._session_factory() as session:
+                results = [await self._apply(session, item) for item, _ in batch]
+                await self._commit(session)
+        except Exception as exc:
+            if len(batch) == 1:
+                _resolve(batch[0][1], error=exc)
+                return
+
+            self._logger.warning("Group commit of %s writes failed, retrying one by one: %r", len(batch), exc)
+            for entry in batch:
+                await self._flush([entry])
+            return
+
+        for (_, future), result in zip(batch, results):
+            _resolve(future, result=result)
+
+
+def _resolve(future: asyncio.Future[R], result: R | None = None, error: Exception | None = None) -> None:
+    # The caller may have been cancelled while waiting; its write still happened.
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)  # type: ignore[arg-type]
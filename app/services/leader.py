@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import socket
+import uuid
+
+from sqlalchemy import or_, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import WorkerLease
+from app.db.upsert import dialect_insert
+
+
+def make_owner_id() -> str:
+    return f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+class LeaderLease:
+    """Database-backed lease: at most one owner holds ``name`` until ``expires_at``.
+
+    A heartbeat renews the lease every ``ttl / 3`` seconds. Standbys try to take it over on
+    the same schedule, so a dead leader is replaced within roughly ``ttl * 4 / 3`` seconds.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession],
+        name: str,
+        owner_id: str | None = None,
+        ttl_seconds: float = 30.0,
+    ) -> None:
+        self._session_factory = session_factory
+        self.name = name
+        self.owner_id = owner_id or make_owner_id()
+        self._ttl = timedelta(seconds=ttl_seconds)
+        self._heartbeat_seconds = ttl_seconds / 3
+        self._valid_until: datetime | None = None
+        self._stop_event = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+        self._logger = logging.getLogger(__name__)
+
+    @property
+    def is_leader(self) -> bool:
+        return self._valid_until is not None and datetime.now(timezone.utc) < self._valid_until
+
+    async def try_acquire(self, now_utc: datetime | None = None) -> bool:
+        now = now_utc or datetime.now(timezone.utc)
+        expires_at = now + self._ttl
+
+        async with self._session_factory() as session:
+            leases = WorkerLease.__table__
+            stmt = dialect_insert(session, leases).values(
+                name=self.name,
+                owner_id=self.owner_id,
+                expires_at=expires_at,
+            )
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[leases.c.name],
+                set_={"owner_id": stmt.excluded.owner_id, "expires_at": stmt.excluded.expires_at},
+                where=or_(leases.c.owner_id == self.owner_id, leases.c.expires_at < now),
+            ).returning(leases.c.owner_id)
+            owner = (await session.execute(stmt)).scalar_one_or_none()
+            await session.commit()
+
+        was_leader = self.is_leader
+        # Stop acting as leader a little before the lease really runs out.
+        self._valid_until = now + self._ttl - timedelta(seconds=self._heartbeat_seconds) if owner else None
+        if owner and not was_leader:
+            self._logger.info("Acquired lease %s as %s", self.name, self.owner_id)
+        elif was_leader and not owner:
+            self._logger.warning("Lost lease %s", self.name)
+        return owner is not None
+
+    async def release(self) -> None:
+        self._valid_until = None
+        async with self._session_factory() as session:
+            await session.execute(
+                update(WorkerLease)
+                .where(WorkerLease.name == self.name, WorkerLease.owner_id == self.owner_id)
+                .values(expires_at=datetime.now(timezone.utc))
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+    async def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name=f"lease-{self.name}")
+
+    async def stop(self) -> None:
+        self._stop_event.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self.release()
+
+    async def _heartbeat(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                await self.try_acquire()
+            except Exception:
+                self._valid_until = None
+                self._logger.exception("Lease heartbeat failed for %s", self.name)
+
+            try:
+                await asyncio.wait_for(self._stop_event.wait(), timeout=self._heartbeat_seconds)
+            except TimeoutError:
+                continue
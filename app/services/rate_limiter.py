@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import Callable, Hashable
+
+
+class RateLimiter:
+    """Spaces out calls to stay under a global rate and a per-key (per-chat) rate.
+
+    Slots are handed out in arrival order. ``pause`` shifts the whole schedule back, which is
+    how Telegram's ``retry_after`` flood-control hint is honoured: pending calls resume at the
+    end of the pause still spaced at the configured rate, instead of firing in one burst.
+    """
+
+    def __init__(
+        self,
+        rate_per_second: float,
+        per_key_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if rate_per_second <= 0:
+            raise ValueError("rate_per_second must be positive")
+
+        self._interval = 1.0 / rate_per_second
+        self._per_key_interval = per_key_interval
+        self._clock = clock
+        # Slots live on a timeline that runs ``_shift`` seconds behind the clock; pausing grows it.
+        self._shift = 0.0
+        self._resume_at = 0.0
+        self._next_slot = 0.0
+        self._key_next_slot: dict[Hashable, float] = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, key: Hashable) -> None:
+        async with self._lock:
+            now = self._clock() - self._shift
+            slot = max(now, self._next_slot, self._key_next_slot.get(key, 0.0))
+            self._next_slot = slot + self._interval
+            self._key_next_slot[key] = slot + self._per_key_interval
+            if len(self._key_next_slot) > 10_000:
+                self._prune(now)
+
+        while True:
+            delay = slot + self._shift - self._clock()
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def pause(self, seconds: float) -> None:
+        now = self._clock()
+        resume_at = now + seconds
+        # Concurrent sends often hit the same flood limit; only the part not already covered
+        # by an earlier pause moves the schedule.
+        delay = resume_at - max(now, self._resume_at)
+        if delay <= 0:
+            return
+
+        self._shift += delay
+        self._resume_at = resume_at
+        self._next_slot = max(self._next_slot, resume_at - self._shift)
+
+    def _prune(self, now: float) -> None:
+        self._key_next_slot = {key: slot for key, slot in self._key_next_slot.items() if slot > now}
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import and_, case, delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import ExerciseRecord
+from app.db.upsert import dialect_insert
+from app.services.archive import workout_history
+
+
+@dataclass
+class RecordState:
+    best_weight_kg: float | None = None
+    best_weight_reps: int | None = None
+    best_weight_at: datetime | None = None
+    best_set_volume_kg: float | None = None
+    best_set_volume_at: datetime | None = None
+    best_reps: int = 0
+    best_reps_at: datetime | None = None
+
+    def apply(self, reps: int, weight_kg: float | None, performed_at: datetime) -> None:
+        if weight_kg is not None:
+            if (
+                self.best_weight_kg is None
+                or weight_kg > self.best_weight_kg
+                or (weight_kg == self.best_weight_kg and reps > (self.best_weight_reps or 0))
+            ):
+                self.best_weight_kg = weight_kg
+                self.best_weight_reps = reps
+                self.best_weight_at = performed_at
+
+            set_volume = round(weight_kg * reps, 2)
+            if self.best_set_volume_kg is None or set_volume > self.best_set_volume_kg:
+                self.best_set_volume_kg = set_volume
+                self.best_set_volume_at = performed_at
+
+        if reps > self.best_reps:
+            self.best_reps = reps
+            self.best_reps_at = performed_at
+
+    def as_values(self) -> dict[str, Any]:
+        return {
+            "best_weight_kg": self.best_weight_kg,
+            "best_weight_reps": self.best_weight_reps,
+            "best_weight_at": self.best_weight_at,
+            "best_set_volume_kg": self.best_set_volume_kg,
+            "best_set_volume_at": self.best_set_volume_at,
+            "best_reps": self.best_reps,
+            "best_reps_at": self.best_reps_at,
+        }
+
+
+async def apply_entry_to_records(
+    session: AsyncSession,
+    telegram_id: int,
+    exercise: str,
+    reps: int,
+    weight_kg: float | None,
+    performed_at: datetime,
+) -> None:
+    """Fold a newly logged entry into the user's record row with a single upsert."""
+    state = RecordState()
+    state.apply(reps, weight_kg, performed_at)
+
+    table = ExerciseRecord.__table__
+    stmt = dialect_insert(session, table).values(
+        telegram_id=telegram_id,
+        exercise=exercise,
+        **state.as_values(),
+    )
+    new = stmt.excluded
+    old = table.c
+
+    heavier = and_(
+        new.best_weight_kg.is_not(None),
+        or_(
+            old.best_weight_kg.is_(None),
+            new.best_weight_kg > old.best_weight_kg,
+            and_(new.best_weight_kg == old.best_weight_kg, new.best_weight_reps > old.best_weight_reps),
+        ),
+    )
+    more_volume = and_(
+        new.best_set_volume_kg.is_not(None),
+        or_(old.best_set_volume_kg.is_(None), new.best_set_volume_kg > old.best_set_volume_kg),
+    )
+    more_reps = new.best_reps > old.best_reps
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[old.telegram_id, old.exercise],
+        set_={
+            "best_weight_kg": case((heavier, new.best_weight_kg), else_=old.best_weight_kg),
+            "best_weight_reps": case((heavier, new.best_weight_reps), else_=old.best_weight_reps),
+            "best_weight_at": case((heavier, new.best_weight_at), else_=old.best_weight_at),
+            "best_set_volume_kg": case((more_volume, new.best_set_volume_kg), else_=old.best_set_volume_kg),
+            "best_set_volume_at": case((more_volume, new.best_set_volume_at), else_=old.best_set_volume_at),
+            "best_reps": case((more_reps, new.best_reps), else_=old.best_reps),
+            "best_reps_at": case((more_reps, new.best_reps_at), else_=old.best_reps_at),
+        },
+    )
+    await session.execute(stmt)
+
+
+def holds_record(record: ExerciseRecord, performed_at: datetime) -> bool:
+    # Comparing timestamps is conservative: a tie only costs an extra recompute.
+    held_at = {record.best_weight_at, record.best_set_volume_at, record.best_reps_at}
+    return performed_at in held_at or performed_at.replace(tzinfo=None) in held_at
+
+
+async def recompute_exercise_record(session: AsyncSession, telegram_id: int, exercise: str) -> None:
+    # Archived entries still count: a record set years ago stands until it is beaten.
+    history = workout_history(
+        lambda table: select(table.c.reps, table.c.weight_kg, table.c.performed_at).where(
+            table.c.telegram_id == telegram_id, table.c.exercise == exercise
+        )
+    )
+    result = await session.execute(history.order_by(history.selected_columns.performed_at))
+
+    state = RecordState()
+    seen = False
+    for reps, weight_kg, performed_at in result:
+        state.apply(reps, weight_kg, performed_at)
+        seen = True
+
+    if not seen:
+        await session.execute(
+            delete(ExerciseRecord).where(
+                ExerciseRecord.telegram_id == telegram_id,
+                ExerciseRecord.exercise == exercise,
+            )
+        )
+        return
+
+    record = await session.get(ExerciseRecord, (telegram_id, exercise))
+    if record is None:
+        session.add(ExerciseRecord(telegram_id=telegram_id, exercise=exercise, **state.as_values()))
+        return
+
+    for key, value in state.as_values().items():
+        setattr(record, key, value)
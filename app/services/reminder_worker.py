@@ -1,20 +1,86 @@
 from __future__ import annotations
 
 import asyncio
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from enum import Enum
 import logging
+import time
 
 from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramRetryAfter
 
 from app.keyboards.main import main_menu_keyboard
-from app.services.workout_service import WorkoutService
+from app.metrics import REMINDER_DELIVERIES, REMINDER_SEND_LAG_SECONDS, REMINDER_TICK_SECONDS, REMINDERS_DUE
+from app.services.leader import LeaderLease, make_owner_id
+from app.services.rate_limiter import RateLimiter
+from app.services.workout_service import DueReminder, WorkoutService
+
+REMINDER_TEXT = "⏰ Workout reminder: time to train and log your session."
+
+PERMANENT_FAILURE_MARKERS = (
+    "chat not found",
+    "user not found",
+    "user is deactivated",
+    "bot was blocked",
+    "bot was kicked",
+    "peer_id_invalid",
+)
+
+
+class DeliveryOutcome(Enum):
+    SENT = "sent"
+    TRANSIENT = "transient"
+    PERMANENT = "permanent"
+
+
+@dataclass
+class DeliveryStats:
+    sent: int = 0
+    transient_failures: int = 0
+    permanent_failures: int = 0
+
+    def add(self, other: DeliveryStats) -> None:
+        self.sent += other.sent
+        self.transient_failures += other.transient_failures
+        self.permanent_failures += other.permanent_failures
+
+
+def is_permanent_failure(exc: Exception) -> bool:
+    if isinstance(exc, (TelegramForbiddenError, TelegramNotFound)):
+        return True
+    if isinstance(exc, TelegramBadRequest):
+        message = str(exc).lower()
+        return any(marker in message for marker in PERMANENT_FAILURE_MARKERS)
+    return False
 
 
 class ReminderWorker:
-    def __init__(self, bot: Bot, workout_service: WorkoutService, poll_seconds: int = 30) -> None:
+    def __init__(
+        self,
+        bot: Bot,
+        workout_service: WorkoutService,
+        poll_seconds: int = 30,
+        send_rate: int = 25,
+        send_concurrency: int = 20,
+        batch_size: int = 500,
+        max_attempts: int = 3,
+        max_failures: int = 5,
+        lease: LeaderLease | None = None,
+        claim_seconds: int = 600,
+    ) -> None:
         self._bot = bot
+        self._lease = lease
+        self._owner_id = lease.owner_id if lease is not None else make_owner_id()
+        self._claim_seconds = claim_seconds
         self._workout_service = workout_service
         self._poll_seconds = poll_seconds
+        self._send_concurrency = send_concurrency
+        self._batch_size = batch_size
+        self._max_attempts = max_attempts
+        self._max_failures = max_failures
+        self.stats = DeliveryStats()
+        self._rate_limiter = RateLimiter(rate_per_second=send_rate)
         self._stop_event = asyncio.Event()
         self._task: asyncio.Task[None] | None = None
         self._logger = logging.getLogger(__name__)
@@ -24,35 +90,125 @@ class ReminderWorker:
             return
 
         self._stop_event.clear()
+        if self._lease is not None:
+            await self._lease.start()
         self._task = asyncio.create_task(self._run(), name="reminder-worker")
 
     async def stop(self) -> None:
         self._stop_event.set()
-        if self._task is None:
-            return
+        if self._task is not None:
+            await self._task
+            self._task = None
 
-        await self._task
-        self._task = None
+        if self._lease is not None:
+            await self._lease.stop()
+
+    def _is_leader(self) -> bool:
+        return self._lease is None or self._lease.is_leader
 
     async def _run(self) -> None:
         while not self._stop_event.is_set():
-            now_utc = datetime.now(timezone.utc).replace(second=0, microsecond=0)
-            due_items = await self._workout_service.find_due_reminders(now_utc)
-
-            for due in due_items:
-                try:
-                    await self._bot.send_message(
-                        due.telegram_id,
-                        "⏰ Workout reminder: time to train and log your session.",
-                        reply_markup=main_menu_keyboard(),
-                    )
-                except Exception:
-                    self._logger.exception("Failed to send reminder to user=%s", due.telegram_id)
-                    continue
-
-                await self._workout_service.mark_reminded(due.telegram_id, due.local_date)
+            try:
+                if self._is_leader():
+                    started = time.perf_counter()
+                    await self.run_once(datetime.now(timezone.utc))
+                    REMINDER_TICK_SECONDS.observe(time.perf_counter() - started)
+            except Exception:
+                self._logger.exception("Reminder tick failed")
 
             try:
                 await asyncio.wait_for(self._stop_event.wait(), timeout=self._poll_seconds)
             except TimeoutError:
                 continue
+
+    async def run_once(self, now_utc: datetime) -> DeliveryStats:
+        tick_stats = DeliveryStats()
+        due_count = 0
+
+        # Claim one batch at a time and stop as soon as leadership is lost; whatever is
+        # still claimed becomes claimable again once its claim expires.
+        while self._is_leader():
+            batch = await self._workout_service.claim_due_reminders(
+                now_utc,
+                self._owner_id,
+                limit=self._batch_size,
+                claim_seconds=self._claim_seconds,
+            )
+            if not batch:
+                break
+
+            due_count += len(batch)
+            outcomes = await self._fan_out(batch)
+
+            by_outcome: dict[DeliveryOutcome, list[DueReminder]] = {outcome: [] for outcome in DeliveryOutcome}
+            for due, outcome in zip(batch, outcomes):
+                by_outcome[outcome].append(due)
+
+            sent = by_outcome[DeliveryOutcome.SENT]
+            transient = by_outcome[DeliveryOutcome.TRANSIENT]
+            unreachable = by_outcome[DeliveryOutcome.PERMANENT]
+
+            acked_at = datetime.now(timezone.utc)
+            await self._workout_service.mark_reminded_many(sent, now_utc=acked_at)
+            # Failures are released at the tick time, so this tick does not reclaim them.
+            await self._workout_service.record_reminder_failures(transient, self._max_failures, now_utc=now_utc)
+            await self._workout_service.disable_reminders_many(unreachable)
+
+            tick_stats.add(
+                DeliveryStats(
+                    sent=len(sent),
+                    transient_failures=len(transient),
+                    permanent_failures=len(unreachable),
+                )
+            )
+
+        self.stats.add(tick_stats)
+        REMINDERS_DUE.set(due_count)
+        REMINDER_DELIVERIES.inc(tick_stats.sent, outcome=DeliveryOutcome.SENT.value)
+        REMINDER_DELIVERIES.inc(tick_stats.transient_failures, outcome=DeliveryOutcome.TRANSIENT.value)
+        REMINDER_DELIVERIES.inc(tick_stats.permanent_failures, outcome=DeliveryOutcome.PERMANENT.value)
+        if due_count:
+            self._logger.info(
+                "Reminder tick: due=%s sent=%s transient=%s disabled=%s",
+                due_count,
+                tick_stats.sent,
+                tick_stats.transient_failures,
+                tick_stats.permanent_failures,
+            )
+        return tick_stats
+
+    async def _fan_out(self, batch: list[DueReminder]) -> list[DeliveryOutcome]:
+        semaphore = asyncio.Semaphore(self._send_concurrency)
+
+        async def deliver(due: DueReminder) -> DeliveryOutcome:
+            async with semaphore:
+                return await self._send(due)
+
+        return list(await asyncio.gather(*(deliver(due) for due in batch)))
+
+    async def _send(self, due: DueReminder) -> DeliveryOutcome:
+        for _ in range(self._max_attempts):
+            await self._rate_limiter.acquire(due.telegram_id)
+            try:
+                await self._bot.send_message(
+                    due.telegram_id,
+                    REMINDER_TEXT,
+                    reply_markup=main_menu_keyboard(),
+                )
+            except TelegramRetryAfter as exc:
+                self._logger.warning("Flood control hit, pausing reminders for %ss", exc.retry_after)
+                self._rate_limiter.pause(exc.retry_after)
+                continue
+            except Exception as exc:
+                if is_permanent_failure(exc):
+                    self._logger.info("Disabling reminder for unreachable user=%s: %s", due.telegram_id, exc)
+                    return DeliveryOutcome.PERMANENT
+
+                self._logger.warning("Failed to send reminder to user=%s: %r", due.telegram_id, exc)
+                return DeliveryOutcome.TRANSIENT
+
+            lag = datetime.now(timezone.utc) - due.scheduled_at
+            REMINDER_SEND_LAG_SECONDS.observe(max(lag.total_seconds(), 0.0))
+            return DeliveryOutcome.SENT
+
+        return DeliveryOutcome.TRANSIENT
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Any
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.models import DailyExerciseRollup, DailyRollup
+from app.db.upsert import dialect_insert
+from app.utils.schedule import as_utc
+
+
+def rollup_day(performed_at: datetime) -> date:
+    return as_utc(performed_at).date()
+
+
+@dataclass
+class DayTotals:
+    entries: int = 0
+    total_reps: int = 0
+    total_volume_kg: float = 0.0
+    exercises: Counter[str] = field(default_factory=Counter)
+
+    def apply(self, exercise: str, sets: int, reps: int, volume_kg: float) -> None:
+        self.entries += 1
+        self.total_reps += sets * reps
+        self.total_volume_kg += volume_kg
+        self.exercises[exercise] += 1
+
+    def rows(self, telegram_id: int, day: date) -> tuple[dict[str, Any], list[dict[str, Any]]]:
+        daily = {
+            "telegram_id": telegram_id,
+            "day": day,
+            "entries": self.entries,
+            "total_reps": self.total_reps,
+            "total_volume_kg": round(self.total_volume_kg, 2),
+        }
+        per_exercise = [
+            {"telegram_id": telegram_id, "day": day, "exercise": exercise, "entries": count}
+            for exercise, count in self.exercises.items()
+        ]
+        return daily, per_exercise
+
+
+async def add_entry_to_rollups(
+    session: AsyncSession,
+    telegram_id: int,
+    exercise: str,
+    sets: int,
+    reps: int,
+    volume_kg: float,
+    performed_at: datetime,
+) -> None:
+    day = rollup_day(performed_at)
+
+    daily = DailyRollup.__table__
+    stmt = dialect_insert(session, daily).values(
+        telegram_id=telegram_id,
+        day=day,
+        entries=1,
+        total_reps=sets * reps,
+        total_volume_kg=volume_kg,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[daily.c.telegram_id, daily.c.day],
+        set_={
+            "entries": daily.c.entries + 1,
+            "total_reps": daily.c.total_reps + stmt.excluded.total_reps,
+            "total_volume_kg": daily.c.total_volume_kg + stmt.excluded.total_volume_kg,
+        },
+    )
+    await session.execute(stmt)
+
+    per_exercise = DailyExerciseRollup.__table__
+    stmt = dialect_insert(session, per_exercise).values(
+        telegram_id=telegram_id,
+        day=day,
+        exercise=exercise,
+        entries=1,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[per_exercise.c.telegram_id, per_exercise.c.day, per_exercise.c.exercise],
+        set_={"entries": per_exercise.c.entries + 1},
+    )
+    await session.execute(stmt)
+
+
+async def remove_entry_from_rollups(
+    session: AsyncSession,
+    telegram_id: int,
+    exercise: str,
+    sets: int,
+    reps: int,
+    volume_kg: float,
+    performed_at: datetime,
+) -> None:
+    # Rows that drop to zero are kept; readers only look at rows with entries > 0.
+    day = rollup_day(performed_at)
+
+    await session.execute(
+        update(DailyRollup)
+        .where(DailyRollup.telegram_id == telegram_id, DailyRollup.day == day)
+        .values(
+            entries=DailyRollup.entries - 1,
+            total_reps=DailyRollup.total_reps - sets * reps,
+            total_volume_kg=DailyRollup.total_volume_kg - volume_kg,
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await session.execute(
+        update(DailyExerciseRollup)
+        .where(
+            DailyExerciseRollup.telegram_id == telegram_id,
+            DailyExerciseRollup.day == day,
+            DailyExerciseRollup.exercise == exercise,
+        )
+        .values(entries=DailyExerciseRollup.entries - 1)
+        .execution_options(synchronize_session=False)
+    )
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+import logging
+
+from sqlalchemy import Table, delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import (
+    ArchivedWorkoutEntry,
+    DailyExerciseRollup,
+    DailyRollup,
+    ExerciseRecord,
+    UserProfile,
+    WorkoutEntry,
+)
+from app.db.shards import ShardRouter, save_override
+
+# Parents first; deletes run in reverse.
+USER_TABLES: tuple[Table, ...] = (
+    UserProfile.__table__,
+    WorkoutEntry.__table__,
+    ArchivedWorkoutEntry.__table__,
+    ExerciseRecord.__table__,
+    DailyRollup.__table__,
+    DailyExerciseRollup.__table__,
+)
+# Workout ids are per-database sequences; the target assigns its own.
+RENUMBERED_TABLES = (WorkoutEntry.__table__, ArchivedWorkoutEntry.__table__)
+COPY_CHUNK_ROWS = 500
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MoveResult:
+    telegram_id: int
+    source: str
+    target: str
+    rows: int
+
+
+async def _delete_user(session: AsyncSession, telegram_id: int) -> None:
+    for table in reversed(USER_TABLES):
+        await session.execute(delete(table).where(table.c.telegram_id == telegram_id))
+
+
+async def _purge_elsewhere(router: ShardRouter, telegram_id: int, home: str) -> None:
+    """Delete the user's rows from every shard but ``home``: leftovers of interrupted moves."""
+    for shard, factory in router.factories.items():
+        if shard == home:
+            continue
+        async with factory() as session:
+            await _delete_user(session, telegram_id)
+            await session.commit()
+
+
+async def _copy_user(source: AsyncSession, target: AsyncSession, telegram_id: int) -> int:
+    copied = 0
+    # Leftovers from an interrupted move are replaced, so a move can simply be re-run.
+    await _delete_user(target, telegram_id)
+
+    for table in USER_TABLES:
+        columns = [column for column in table.c if column.name != "id" or table not in RENUMBERED_TABLES]
+        stmt = (
+            select(*columns)
+            .where(table.c.telegram_id == telegram_id)
+            .execution_options(yield_per=COPY_CHUNK_ROWS)
+        )
+        result = await source.stream(stmt)
+        async for chunk in result.mappings().partitions():
+            await target.execute(insert(table), [dict(row) for row in chunk])
+            copied += len(chunk)
+    return copied
+
+
+async def move_user(
+    router: ShardRouter,
+    directory: async_sessionmaker[AsyncSession],
+    telegram_id: int,
+    target: str,
+    source: str | None = None,
+) -> MoveResult:
+    """Copy a user's rows to ``target``, point the directory at it, then delete the other copies.
+
+    Run it while the bot is stopped: running processes keep their own copy of the directory.
+    Re-running an interrupted move finishes it: rows left on any shard but ``target`` are removed.
+    """
+    if target not in router.factories:
+        raise ValueError(f"Unknown shard {target!r}")
+
+    source = source or router.shard_for(telegram_id)
+    rows = 0
+    if source != target:
+        async with router.factories[source]() as source_session, router.factories[target]() as target_session:
+            rows = await _copy_user(source_session, target_session, telegram_id)
+            await target_session.commit()
+
+    # Until the directory is updated the source copy is still the live one.
+    await save_override(directory, router, telegram_id, target)
+    await _purge_elsewhere(router, telegram_id, target)
+
+    logger.info("Moved user=%s from %s to %s (%s rows)", telegram_id, source, target, rows)
+    return MoveResult(telegram_id=telegram_id, source=source, target=target, rows=rows)
+
+
+async def rebalance(
+    router: ShardRouter,
+    directory: async_sessionmaker[AsyncSession],
+    dry_run: bool = False,
+) -> list[MoveResult]:
+    """Move every user that is not on the shard the router now assigns them to.
+
+    A user who already has rows on their home shard is not moved: the copy found elsewhere is
+    left over from an interrupted move and is deleted instead of being copied over the live one.
+    """
+    residents: dict[str, set[int]] = {}
+    for shard, factory in router.factories.items():
+        async with factory() as session:
+            residents[shard] = set(await session.scalars(select(UserProfile.telegram_id)))
+
+    moves: list[MoveResult] = []
+    for shard, telegram_ids in residents.items():
+        for telegram_id in sorted(telegram_ids):
+            target = router.shard_for(telegram_id)
+            if target == shard:
+                continue
+            if telegram_id in residents[target]:
+                if not dry_run:
+                    logger.info("Removing leftover rows of user=%s from %s", telegram_id, shard)
+                    await _purge_elsewhere(router, telegram_id, target)
+                continue
+            if dry_run:
+                moves.append(MoveResult(telegram_id=telegram_id, source=shard, target=target, rows=0))
+            else:
+                moves.append(await move_user(router, directory, telegram_id, target, source=shard))
+    return moves
@@ -1,15 +1,79 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from datetime import date, datetime, time, timedelta, timezone
 import csv
+import gzip
 import io
-from collections import Counter
+import tempfile
+from collections import OrderedDict
+from time import time as wall_clock
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, Hashable, Sequence, TypeVar
 
-from sqlalchemy import desc, func, select
+from sqlalchemy import bindparam, delete, desc, func, insert, or_, select, update
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db.models import UserProfile, WorkoutEntry
+from app.db.models import (
+    DailyExerciseRollup,
+    DailyRollup,
+    ExerciseRecord,
+    UserProfile,
+    WorkoutEntry,
+    utc_now,
+)
+from app.db.session import USE_REPLICA, USE_WRITER
+from app.db.shards import ShardRouter
+from app.db.upsert import dialect_insert
+from app.services.archive import ARCHIVE_BATCH_ROWS, archive_batch, workout_history
+from app.services.cache import CacheStats, UserCache
+from app.services.group_commit import GroupCommit
+from app.services.records import RecordState, apply_entry_to_records, holds_record, recompute_exercise_record
+from app.services.rollups import DayTotals, add_entry_to_rollups, remove_entry_from_rollups, rollup_day
+from app.utils.schedule import as_utc, next_reminder_at, reminder_instant, reminder_local_date
+
+T = TypeVar("T")
+
+EXPORT_COLUMNS = [
+    "performed_at_utc",
+    "exercise",
+    "sets",
+    "reps",
+    "weight_kg",
+    "volume_kg",
+    "template",
+    "notes",
+]
+EXPORT_CHUNK_ROWS = 500
+EXPORT_SPOOL_MAX_BYTES = 1024 * 1024
+
+# session.info keys for work that has to wait until the caller's session commits.
+WRITTEN_USERS = "written_users"
+NEW_PROFILES = "new_profiles"
+
+
+def _has_replica(session: AsyncSession) -> bool:
+    return getattr(session.sync_session, "replica", None) is not None
+
+
+def _export_row(row: Sequence[Any]) -> list[Any]:
+    performed_at, exercise, sets, reps, weight_kg, volume_kg, template, notes, *_ = row
+    return [
+        as_utc(performed_at).isoformat(),
+        exercise,
+        sets,
+        reps,
+        "" if weight_kg is None else weight_kg,
+        volume_kg,
+        template or "",
+        notes or "",
+    ]
+
+
+def _record_row(key: tuple[int, str], state: RecordState) -> dict[str, Any]:
+    telegram_id, exercise = key
+    return {"telegram_id": telegram_id, "exercise": exercise, **state.as_values()}
 
 
 @dataclass(frozen=True)
@@ -26,26 +90,278 @@ class WeeklyStats:
 class PersonalRecord:
     exercise: str
     best_weight_kg: float
+    best_weight_reps: int | None = None
+    achieved_at: datetime | None = None
+    best_set_volume_kg: float | None = None
+    best_reps: int = 0
+
+
+@dataclass
+class ExportFile:
+    file: IO[bytes]
+    rows: int
+    compressed: bool
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> ExportFile:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+
+@dataclass(frozen=True)
+class NewWorkout:
+    telegram_id: int
+    exercise: str
+    sets: int
+    reps: int
+    weight_kg: float | None
+    template: str | None
+    notes: str | None
+    performed_at: datetime
 
 
 @dataclass(frozen=True)
 class DueReminder:
     telegram_id: int
     local_date: date
+    scheduled_at: datetime
+    reminder_time: time
+    offset_minutes: int
+    failures: int = 0
+
+
+def _due_reminder(
+    telegram_id: int,
+    offset_minutes: int,
+    reminder_time: time,
+    scheduled_at: datetime,
+    failures: int,
+) -> DueReminder:
+    return DueReminder(
+        telegram_id=telegram_id,
+        local_date=reminder_local_date(scheduled_at, offset_minutes),
+        scheduled_at=as_utc(scheduled_at),
+        reminder_time=reminder_time,
+        offset_minutes=offset_minutes,
+        failures=failures,
+    )
 
 
 class WorkoutService:
-    def __init__(self, session_factory: async_sessionmaker[AsyncSession]) -> None:
-        self._session_factory = session_factory
+    def __init__(
+        self,
+        session_factory: async_sessionmaker[AsyncSession] | ShardRouter,
+        cache: UserCache | None = None,
+        known_profiles_max: int = 100_000,
+        read_your_writes_seconds: float = 10.0,
+        clock: Callable[[], float] = wall_clock,
+    ) -> None:
+        # A plain session factory is a single shard; every method looks up the user's shard.
+        if isinstance(session_factory, ShardRouter):
+            self._shards = session_factory
+        else:
+            self._shards = ShardRouter.single(session_factory)
+        self._cache = cache
+        self._known_profiles: OrderedDict[int, None] = OrderedDict()
+        self._known_profiles_max = known_profiles_max
+        self._read_your_writes_seconds = read_your_writes_seconds
+        self._clock = clock
+        self._recent_writers: OrderedDict[int, float] = OrderedDict()
+        self._insert_batchers: dict[str, GroupCommit[NewWorkout, WorkoutEntry]] = {}
 
-    async def ensure_profile(self, telegram_id: int) -> None:
-        async with self._session_factory() as session:
-            profile = await session.get(UserProfile, telegram_id)
-            if profile is not None:
-                return
+    def enable_group_commit(
+        self,
+        max_batch: int = 64,
+        max_latency_seconds: float = 0.005,
+        max_queue: int = 1000,
+    ) -> None:
+        """Coalesce ``create_workout`` calls made without a session into shared transactions."""
+        self._insert_batchers = {
+            name: GroupCommit(
+                factory,
+                self._insert_workout,
+                self.commit,
+                max_batch=max_batch,
+                max_latency_seconds=max_latency_seconds,
+                max_queue=max_queue,
+            )
+            for name, factory in self._shards.factories.items()
+        }
 
-            session.add(UserProfile(telegram_id=telegram_id))
-            await session.commit()
+    async def close(self) -> None:
+        await asyncio.gather(*(batcher.close() for batcher in self._insert_batchers.values()))
+
+    def cache_stats(self) -> CacheStats | None:
+        return None if self._cache is None else self._cache.stats()
+
+    def open_session(self, telegram_id: int | None = None) -> AsyncSession:
+        """A session for one unit of work: pass it as ``session=`` and finish with :meth:`commit`."""
+        return self._shards.factory_for(telegram_id)()
+
+    async def commit(self, session: AsyncSession) -> None:
+        written = session.info.pop(WRITTEN_USERS, set())
+        if written and _has_replica(session) and self._read_your_writes_seconds > 0:
+            # Recorded in the same transaction, so every instance sends these users' reads
+            # to the primary until the replica has had time to catch up.
+            until = datetime.fromtimestamp(self._clock() + self._read_your_writes_seconds, timezone.utc)
+            await session.execute(
+                update(UserProfile)
+                .where(UserProfile.telegram_id.in_(written))
+                .values(primary_reads_until=until)
+            )
+        await session.commit()
+        for telegram_id in written:
+            self._invalidate(telegram_id)
+            self._note_write(telegram_id)
+        for telegram_id in session.info.pop(NEW_PROFILES, ()):
+            self._remember_profile(telegram_id)
+
+    @asynccontextmanager
+    async def _session(
+        self,
+        session: AsyncSession | None,
+        telegram_id: int | None = None,
+        factory: async_sessionmaker[AsyncSession] | None = None,
+    ) -> AsyncIterator[AsyncSession]:
+        """A session for a write path; its reads run on the writer, in the same transaction."""
+        async with self._open(session, telegram_id, factory) as active:
+            active.info[USE_WRITER] = True
+            yield active
+
+    @asynccontextmanager
+    async def _open(
+        self,
+        session: AsyncSession | None,
+        telegram_id: int | None = None,
+        factory: async_sessionmaker[AsyncSession] | None = None,
+    ) -> AsyncIterator[AsyncSession]:
+        if session is not None:
+            yield session
+            return
+
+        factory = factory or self._shards.factory_for(telegram_id)
+        async with factory() as own_session:
+            yield own_session
+            await self.commit(own_session)
+
+    @asynccontextmanager
+    async def _read_session(
+        self,
+        session: AsyncSession | None,
+        telegram_id: int | None = None,
+        factory: async_sessionmaker[AsyncSession] | None = None,
+    ) -> AsyncIterator[AsyncSession]:
+        """A session for a read path; reads may go to the replica unless the user wrote recently."""
+        async with self._open(session, telegram_id, factory) as active:
+            previous = active.info.pop(USE_REPLICA, None)
+            try:
+                active.info[USE_REPLICA] = await self._replica_may_serve(active, telegram_id)
+                yield active
+            finally:
+                if previous is None:
+                    active.info.pop(USE_REPLICA, None)
+                else:
+                    active.info[USE_REPLICA] = previous
+
+    async def _replica_may_serve(self, session: AsyncSession, telegram_id: int | None) -> bool:
+        if telegram_id is None:
+            return True
+        if self._wrote_recently(telegram_id):
+            return False
+        if not _has_replica(session):
+            return True
+        # Another instance may have written for this user: its deadline is on the primary.
+        now = datetime.fromtimestamp(self._clock(), timezone.utc)
+        fenced = await session.scalar(
+            select(UserProfile.telegram_id).where(
+                UserProfile.telegram_id == telegram_id,
+                UserProfile.primary_reads_until > now,
+            )
+        )
+        return fenced is None
+
+    def _note_write(self, telegram_id: int) -> None:
+        now = self._clock()
+        self._recent_writers[telegram_id] = now + self._read_your_writes_seconds
+        self._recent_writers.move_to_end(telegram_id)
+        # Every entry gets the same window, so the oldest deadlines are always at the front.
+        while self._recent_writers and next(iter(self._recent_writers.values())) <= now:
+            self._recent_writers.popitem(last=False)
+
+    def _wrote_recently(self, telegram_id: int) -> bool:
+        deadline = self._recent_writers.get(telegram_id)
+        return deadline is not None and deadline > self._clock()
+
+    @staticmethod
+    def _mark_written(session: AsyncSession, telegram_id: int) -> None:
+        session.info.setdefault(WRITTEN_USERS, set()).add(telegram_id)
+
+    @staticmethod
+    def _mark_profile(session: AsyncSession, telegram_id: int) -> None:
+        # Remembered only once the session commits, so a rolled-back insert is never remembered.
+        session.info.setdefault(NEW_PROFILES, set()).add(telegram_id)
+
+    async def _cached(
+        self,
+        telegram_id: int,
+        key: Hashable,
+        loader: Callable[[], Awaitable[T]],
+        session: AsyncSession | None = None,
+    ) -> T:
+        # A session with uncommitted writes for this user must not read or fill the cache.
+        written = session is not None and telegram_id in session.info.get(WRITTEN_USERS, ())
+        if self._cache is None or written:
+            return await loader()
+
+        found, value = self._cache.get(telegram_id, key)
+        if found:
+            return value
+
+        generation = self._cache.generation(telegram_id)
+        value = await loader()
+        self._cache.set(telegram_id, key, value, generation=generation)
+        return value
+
+    def _invalidate(self, telegram_id: int) -> None:
+        if self._cache is not None:
+            self._cache.invalidate(telegram_id)
+
+    def _is_known_profile(self, telegram_id: int) -> bool:
+        if telegram_id not in self._known_profiles:
+            return False
+
+        self._known_profiles.move_to_end(telegram_id)
+        return True
+
+    def _remember_profile(self, telegram_id: int) -> None:
+        self._known_profiles[telegram_id] = None
+        self._known_profiles.move_to_end(telegram_id)
+        while len(self._known_profiles) > self._known_profiles_max:
+            self._known_profiles.popitem(last=False)
+
+    async def _ensure_profile_row(self, session: AsyncSession, telegram_id: int) -> None:
+        if self._is_known_profile(telegram_id):
+            return
+
+        profiles = UserProfile.__table__
+        stmt = (
+            dialect_insert(session, profiles)
+            .values(telegram_id=telegram_id)
+            .on_conflict_do_nothing(index_elements=[profiles.c.telegram_id])
+        )
+        await session.execute(stmt)
+
+    async def ensure_profile(self, telegram_id: int, session: AsyncSession | None = None) -> None:
+        if self._is_known_profile(telegram_id):
+            return
+
+        async with self._session(session, telegram_id) as active:
+            await self._ensure_profile_row(active, telegram_id)
+            self._mark_profile(active, telegram_id)
 
     async def create_workout(
         self,
@@ -56,231 +372,777 @@ class WorkoutService:
         weight_kg: float | None,
         template: str | None,
         notes: str | None,
+        session: AsyncSession | None = None,
     ) -> WorkoutEntry:
-        async with self._session_factory() as session:
-            profile = await session.get(UserProfile, telegram_id)
-            if profile is None:
-                profile = UserProfile(telegram_id=telegram_id)
-                session.add(profile)
+        new = NewWorkout(
+            telegram_id=telegram_id,
+            exercise=exercise,
+            sets=sets,
+            reps=reps,
+            weight_kg=weight_kg,
+            template=template,
+            notes=notes,
+            performed_at=utc_now(),
+        )
+        if session is None and self._insert_batchers:
+            return await self._insert_batchers[self._shards.shard_for(telegram_id)].submit(new)
 
-            volume_kg = 0.0 if weight_kg is None else float(sets * reps) * weight_kg
+        async with self._session(session, telegram_id) as active:
+            return await self._insert_workout(active, new)
 
-            workout = WorkoutEntry(
-                telegram_id=telegram_id,
-                exercise=exercise,
-                sets=sets,
-                reps=reps,
-                weight_kg=weight_kg,
+    async def _insert_workout(self, session: AsyncSession, new: NewWorkout) -> WorkoutEntry:
+        volume_kg = 0.0 if new.weight_kg is None else float(new.sets * new.reps) * new.weight_kg
+        await self._ensure_profile_row(session, new.telegram_id)
+
+        stmt = (
+            insert(WorkoutEntry)
+            .values(
+                telegram_id=new.telegram_id,
+                exercise=new.exercise,
+                sets=new.sets,
+                reps=new.reps,
+                weight_kg=new.weight_kg,
                 volume_kg=round(volume_kg, 2),
-                template=template,
-                notes=notes,
+                template=new.template,
+                notes=new.notes,
+                performed_at=new.performed_at,
             )
-            session.add(workout)
-            await session.commit()
-            await session.refresh(workout)
-            return workout
+            .returning(WorkoutEntry)
+        )
+        workout = (await session.scalars(stmt)).one()
+
+        await apply_entry_to_records(
+            session,
+            new.telegram_id,
+            new.exercise,
+            new.reps,
+            new.weight_kg,
+            new.performed_at,
+        )
+        await add_entry_to_rollups(
+            session,
+            new.telegram_id,
+            new.exercise,
+            new.sets,
+            new.reps,
+            workout.volume_kg,
+            new.performed_at,
+        )
+        self._mark_written(session, new.telegram_id)
+        self._mark_profile(session, new.telegram_id)
+        return workout
 
-    async def recent_workouts(self, telegram_id: int, limit: int = 10) -> list[WorkoutEntry]:
-        async with self._session_factory() as session:
+    async def recent_workouts(
+        self,
+        telegram_id: int,
+        limit: int = 10,
+        session: AsyncSession | None = None,
+    ) -> list[WorkoutEntry]:
+        rows = await self._cached(
+            telegram_id,
+            ("recent_workouts", limit),
+            lambda: self._load_recent_workouts(telegram_id, limit, session),
+            session,
+        )
+        return list(rows)
+
+    async def _load_recent_workouts(
+        self,
+        telegram_id: int,
+        limit: int,
+        session: AsyncSession | None,
+    ) -> list[WorkoutEntry]:
+        async with self._read_session(session, telegram_id) as active:
             stmt = (
                 select(WorkoutEntry)
                 .where(WorkoutEntry.telegram_id == telegram_id)
                 .order_by(desc(WorkoutEntry.performed_at), desc(WorkoutEntry.id))
                 .limit(limit)
             )
-            result = await session.execute(stmt)
+            result = await active.execute(stmt)
             return list(result.scalars().all())
 
-    async def delete_last_workout(self, telegram_id: int) -> bool:
-        async with self._session_factory() as session:
-            stmt = (
-                select(WorkoutEntry)
-                .where(WorkoutEntry.telegram_id == telegram_id)
-                .order_by(desc(WorkoutEntry.performed_at), desc(WorkoutEntry.id))
-                .limit(1)
+    async def delete_last_workout(self, telegram_id: int, session: AsyncSession | None = None) -> bool:
+        latest_id = (
+            select(WorkoutEntry.id)
+            .where(WorkoutEntry.telegram_id == telegram_id)
+            .order_by(desc(WorkoutEntry.performed_at), desc(WorkoutEntry.id))
+            .limit(1)
+            .scalar_subquery()
+        )
+        stmt = (
+            delete(WorkoutEntry)
+            .where(WorkoutEntry.id == latest_id)
+            .returning(
+                WorkoutEntry.exercise,
+                WorkoutEntry.sets,
+                WorkoutEntry.reps,
+                WorkoutEntry.volume_kg,
+                WorkoutEntry.performed_at,
             )
-            result = await session.execute(stmt)
-            latest = result.scalar_one_or_none()
+            .execution_options(synchronize_session=False)
+        )
+
+        async with self._session(session, telegram_id) as active:
+            latest = (await active.execute(stmt)).one_or_none()
             if latest is None:
                 return False
 
-            await session.delete(latest)
-            await session.commit()
-            return True
+            await remove_entry_from_rollups(
+                active,
+                telegram_id,
+                latest.exercise,
+                latest.sets,
+                latest.reps,
+                latest.volume_kg,
+                latest.performed_at,
+            )
+
+            record = await active.get(ExerciseRecord, (telegram_id, latest.exercise))
+            if record is not None and holds_record(record, latest.performed_at):
+                await recompute_exercise_record(active, telegram_id, latest.exercise)
+
+            self._mark_written(active, telegram_id)
+        return True
+
+    async def weekly_stats(
+        self,
+        telegram_id: int,
+        now_utc: datetime | None = None,
+        session: AsyncSession | None = None,
+    ) -> WeeklyStats:
+        if now_utc is not None:
+            return await self._load_weekly_stats(telegram_id, now_utc, session)
+
+        now = datetime.now(timezone.utc)
+        return await self._cached(
+            telegram_id,
+            ("weekly_stats", now.date()),
+            lambda: self._load_weekly_stats(telegram_id, now, session),
+            session,
+        )
 
-    async def weekly_stats(self, telegram_id: int, now_utc: datetime | None = None) -> WeeklyStats:
-        now = now_utc or datetime.now(timezone.utc)
+    async def _load_weekly_stats(
+        self,
+        telegram_id: int,
+        now: datetime,
+        session: AsyncSession | None,
+    ) -> WeeklyStats:
         window_start = (now - timedelta(days=6)).replace(hour=0, minute=0, second=0, microsecond=0)
 
-        async with self._session_factory() as session:
-            stmt = (
-                select(WorkoutEntry)
-                .where(
-                    WorkoutEntry.telegram_id == telegram_id,
-                    WorkoutEntry.performed_at >= window_start,
-                    WorkoutEntry.performed_at <= now,
-                )
-                .order_by(desc(WorkoutEntry.performed_at))
-            )
-            result = await session.execute(stmt)
-            workouts = list(result.scalars().all())
-
-        if not workouts:
-            return WeeklyStats(
-                workouts=0,
-                total_reps=0,
-                total_volume_kg=0.0,
-                top_exercise=None,
-                window_start=window_start,
-                window_end=now,
+        async with self._read_session(session, telegram_id) as active:
+            totals_stmt = select(
+                func.coalesce(func.sum(DailyRollup.entries), 0),
+                func.coalesce(func.sum(DailyRollup.total_reps), 0),
+                func.coalesce(func.sum(DailyRollup.total_volume_kg), 0.0),
+            ).where(
+                DailyRollup.telegram_id == telegram_id,
+                DailyRollup.day >= window_start.date(),
+                DailyRollup.day <= now.date(),
+                DailyRollup.entries > 0,
             )
+            workouts, total_reps, total_volume_kg = (await active.execute(totals_stmt)).one()
 
-        total_reps = sum(item.sets * item.reps for item in workouts)
-        total_volume_kg = round(sum(item.volume_kg for item in workouts), 2)
-
-        exercise_counter = Counter(item.exercise for item in workouts)
-        top_exercise = exercise_counter.most_common(1)[0][0]
+            top_exercise = None
+            if workouts:
+                exercise_total = func.sum(DailyExerciseRollup.entries)
+                top_stmt = (
+                    select(DailyExerciseRollup.exercise)
+                    .where(
+                        DailyExerciseRollup.telegram_id == telegram_id,
+                        DailyExerciseRollup.day >= window_start.date(),
+                        DailyExerciseRollup.day <= now.date(),
+                    )
+                    .group_by(DailyExerciseRollup.exercise)
+                    .having(exercise_total > 0)
+                    .order_by(desc(exercise_total), DailyExerciseRollup.exercise)
+                    .limit(1)
+                )
+                top_exercise = await active.scalar(top_stmt)
 
         return WeeklyStats(
-            workouts=len(workouts),
-            total_reps=total_reps,
-            total_volume_kg=total_volume_kg,
+            workouts=int(workouts),
+            total_reps=int(total_reps),
+            total_volume_kg=round(float(total_volume_kg), 2),
             top_exercise=top_exercise,
             window_start=window_start,
             window_end=now,
         )
 
-    async def personal_records(self, telegram_id: int, limit: int = 7) -> list[PersonalRecord]:
-        async with self._session_factory() as session:
+    async def personal_records(
+        self,
+        telegram_id: int,
+        limit: int = 7,
+        session: AsyncSession | None = None,
+    ) -> list[PersonalRecord]:
+        records = await self._cached(
+            telegram_id,
+            ("personal_records", limit),
+            lambda: self._load_personal_records(telegram_id, limit, session),
+            session,
+        )
+        return list(records)
+
+    async def _load_personal_records(
+        self,
+        telegram_id: int,
+        limit: int,
+        session: AsyncSession | None,
+    ) -> list[PersonalRecord]:
+        async with self._read_session(session, telegram_id) as active:
             stmt = (
-                select(
-                    WorkoutEntry.exercise,
-                    func.max(WorkoutEntry.weight_kg).label("best_weight"),
-                )
+                select(ExerciseRecord)
                 .where(
-                    WorkoutEntry.telegram_id == telegram_id,
-                    WorkoutEntry.weight_kg.is_not(None),
+                    ExerciseRecord.telegram_id == telegram_id,
+                    ExerciseRecord.best_weight_kg.is_not(None),
                 )
-                .group_by(WorkoutEntry.exercise)
-                .order_by(desc("best_weight"), WorkoutEntry.exercise)
+                .order_by(desc(ExerciseRecord.best_weight_kg), ExerciseRecord.exercise)
                 .limit(limit)
             )
-            result = await session.execute(stmt)
-            rows = result.all()
+            result = await active.execute(stmt)
+            rows = list(result.scalars().all())
 
         records: list[PersonalRecord] = []
-        for exercise, best_weight in rows:
-            if best_weight is None:
+        for row in rows:
+            if row.best_weight_kg is None:
                 continue
-            records.append(PersonalRecord(exercise=exercise, best_weight_kg=float(best_weight)))
+            records.append(
+                PersonalRecord(
+                    exercise=row.exercise,
+                    best_weight_kg=float(row.best_weight_kg),
+                    best_weight_reps=row.best_weight_reps,
+                    achieved_at=row.best_weight_at,
+                    best_set_volume_kg=row.best_set_volume_kg,
+                    best_reps=row.best_reps,
+                )
+            )
 
         return records
 
-    async def export_csv_bytes(self, telegram_id: int) -> bytes | None:
-        async with self._session_factory() as session:
-            stmt = (
-                select(WorkoutEntry)
-                .where(WorkoutEntry.telegram_id == telegram_id)
-                .order_by(desc(WorkoutEntry.performed_at), desc(WorkoutEntry.id))
-            )
-            result = await session.execute(stmt)
-            rows = list(result.scalars().all())
+    async def backfill_personal_records(self, force: bool = False) -> int:
+        written = 0
+        for factory in self._shards.factories.values():
+            written += await self._backfill_personal_records(factory, force)
+        return written
 
-        if not rows:
-            return None
+    async def _backfill_personal_records(self, factory: async_sessionmaker[AsyncSession], force: bool) -> int:
+        async with factory() as session:
+            if not force:
+                existing = await session.scalar(select(ExerciseRecord.telegram_id).limit(1))
+                if existing is not None:
+                    return 0
 
-        buffer = io.StringIO()
-        writer = csv.writer(buffer)
-        writer.writerow(
-            [
-                "performed_at_utc",
-                "exercise",
-                "sets",
-                "reps",
-                "weight_kg",
-                "volume_kg",
-                "template",
-                "notes",
-            ]
-        )
+            await session.execute(delete(ExerciseRecord))
 
-        for row in rows:
-            performed_at = row.performed_at
-            if performed_at.tzinfo is None:
-                performed_at = performed_at.replace(tzinfo=timezone.utc)
-
-            writer.writerow(
-                [
-                    performed_at.astimezone(timezone.utc).isoformat(),
-                    row.exercise,
-                    row.sets,
-                    row.reps,
-                    "" if row.weight_kg is None else row.weight_kg,
-                    row.volume_kg,
-                    row.template or "",
-                    row.notes or "",
-                ]
+            history = workout_history(
+                lambda table: select(
+                    table.c.telegram_id,
+                    table.c.exercise,
+                    table.c.reps,
+                    table.c.weight_kg,
+                    table.c.performed_at,
+                )
             )
+            columns = history.selected_columns
+            stmt = history.order_by(
+                columns.telegram_id, columns.exercise, columns.performed_at
+            ).execution_options(yield_per=EXPORT_CHUNK_ROWS)
+            result = await session.stream(stmt)
 
-        return buffer.getvalue().encode("utf-8")
+            pending: list[dict[str, Any]] = []
+            written = 0
+            current_key: tuple[int, str] | None = None
+            state = RecordState()
+            async for telegram_id, exercise, reps, weight_kg, performed_at in result:
+                if (telegram_id, exercise) != current_key:
+                    if current_key is not None:
+                        pending.append(_record_row(current_key, state))
+                    current_key = (telegram_id, exercise)
+                    state = RecordState()
+                state.apply(reps, weight_kg, performed_at)
 
-    async def set_reminder(self, telegram_id: int, offset_minutes: int, reminder_time: time) -> None:
-        async with self._session_factory() as session:
-            profile = await session.get(UserProfile, telegram_id)
-            if profile is None:
-                profile = UserProfile(telegram_id=telegram_id)
-                session.add(profile)
+                if len(pending) >= EXPORT_CHUNK_ROWS:
+                    await session.execute(insert(ExerciseRecord), pending)
+                    written += len(pending)
+                    pending = []
+
+            if current_key is not None:
+                pending.append(_record_row(current_key, state))
+            if pending:
+                await session.execute(insert(ExerciseRecord), pending)
+                written += len(pending)
 
-            profile.timezone_offset_min = offset_minutes
-            profile.reminder_time = reminder_time
-            profile.last_reminder_local_date = None
             await session.commit()
 
-    async def disable_reminder(self, telegram_id: int) -> bool:
-        async with self._session_factory() as session:
-            profile = await session.get(UserProfile, telegram_id)
-            if profile is None or profile.reminder_time is None:
-                return False
+        return written
+
+    async def backfill_daily_rollups(self, force: bool = False) -> int:
+        written = 0
+        for factory in self._shards.factories.values():
+            written += await self._backfill_daily_rollups(factory, force)
+        return written
+
+    async def _backfill_daily_rollups(self, factory: async_sessionmaker[AsyncSession], force: bool) -> int:
+        async with factory() as session:
+            if not force:
+                existing = await session.scalar(select(DailyRollup.telegram_id).limit(1))
+                if existing is not None:
+                    return 0
+
+            await session.execute(delete(DailyExerciseRollup))
+            await session.execute(delete(DailyRollup))
+
+            history = workout_history(
+                lambda table: select(
+                    table.c.telegram_id,
+                    table.c.exercise,
+                    table.c.sets,
+                    table.c.reps,
+                    table.c.volume_kg,
+                    table.c.performed_at,
+                )
+            )
+            columns = history.selected_columns
+            stmt = history.order_by(columns.telegram_id, columns.performed_at).execution_options(
+                yield_per=EXPORT_CHUNK_ROWS
+            )
+            result = await session.stream(stmt)
+
+            daily_rows: list[dict[str, Any]] = []
+            exercise_rows: list[dict[str, Any]] = []
+            written = 0
+
+            async def flush_rows() -> None:
+                nonlocal daily_rows, exercise_rows, written
+                if daily_rows:
+                    await session.execute(insert(DailyRollup), daily_rows)
+                    await session.execute(insert(DailyExerciseRollup), exercise_rows)
+                    written += len(daily_rows)
+                daily_rows, exercise_rows = [], []
+
+            current_key: tuple[int, date] | None = None
+            totals = DayTotals()
+            async for telegram_id, exercise, sets, reps, volume_kg, performed_at in result:
+                key = (telegram_id, rollup_day(performed_at))
+                if key != current_key:
+                    if current_key is not None:
+                        daily, per_exercise = totals.rows(*current_key)
+                        daily_rows.append(daily)
+                        exercise_rows.extend(per_exercise)
+                    current_key = key
+                    totals = DayTotals()
+                totals.apply(exercise, sets, reps, volume_kg)
+
+                if len(daily_rows) >= EXPORT_CHUNK_ROWS:
+                    await flush_rows()
+
+            if current_key is not None:
+                daily, per_exercise = totals.rows(*current_key)
+                daily_rows.append(daily)
+                exercise_rows.extend(per_exercise)
+            await flush_rows()
 
-            profile.reminder_time = None
-            profile.last_reminder_local_date = None
             await session.commit()
-            return True
+
+        return written
+
+    async def archive_workouts(self, older_than: datetime, batch_size: int = ARCHIVE_BATCH_ROWS) -> int:
+        """Move entries performed before ``older_than`` to the archive table, one batch per transaction."""
+        moved = 0
+        for factory in self._shards.factories.values():
+            last_id = 0
+            while True:
+                async with factory() as session:
+                    rows = await archive_batch(session, older_than, after_id=last_id, limit=batch_size)
+                    if not rows:
+                        break
+                    await session.commit()
+                moved += len(rows)
+                last_id = rows[-1][0]
+                for telegram_id in {telegram_id for _, telegram_id in rows}:
+                    self._invalidate(telegram_id)
+        return moved
+
+    async def export_csv_file(
+        self,
+        telegram_id: int,
+        compress: bool = False,
+        session: AsyncSession | None = None,
+    ) -> ExportFile | None:
+        # Exports cover the archive too; the id only keeps same-minute entries in a stable order.
+        history = workout_history(
+            lambda table: select(
+                table.c.performed_at,
+                table.c.exercise,
+                table.c.sets,
+                table.c.reps,
+                table.c.weight_kg,
+                table.c.volume_kg,
+                table.c.template,
+                table.c.notes,
+                table.c.id,
+            ).where(table.c.telegram_id == telegram_id)
+        )
+        columns = history.selected_columns
+        stmt = history.order_by(desc(columns.performed_at), desc(columns.id)).execution_options(
+            yield_per=EXPORT_CHUNK_ROWS
+        )
+
+        spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode="w+b")
+        sink: IO[bytes] = gzip.GzipFile(fileobj=spool, mode="wb") if compress else spool
+        text_sink = io.TextIOWrapper(sink, encoding="utf-8", newline="")
+        writer = csv.writer(text_sink)
+        writer.writerow(EXPORT_COLUMNS)
+
+        rows_written = 0
+        try:
+            async with self._read_session(session, telegram_id) as active:
+                result = await active.stream(stmt)
+                async for chunk in result.partitions():
+                    writer.writerows(_export_row(row) for row in chunk)
+                    rows_written += len(chunk)
+
+            text_sink.flush()
+            text_sink.detach()
+            if compress:
+                sink.close()
+        except BaseException:
+            spool.close()
+            raise
+
+        if rows_written == 0:
+            spool.close()
+            return None
+
+        spool.seek(0)
+        return ExportFile(file=spool, rows=rows_written, compressed=compress)
+
+    async def export_csv_bytes(self, telegram_id: int) -> bytes | None:
+        export = await self.export_csv_file(telegram_id)
+        if export is None:
+            return None
+
+        with export:
+            return export.file.read()
+
+    async def set_reminder(
+        self,
+        telegram_id: int,
+        offset_minutes: int,
+        reminder_time: time,
+        now_utc: datetime | None = None,
+        session: AsyncSession | None = None,
+    ) -> None:
+        now = as_utc(now_utc or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+
+        values = {
+            "timezone_offset_min": offset_minutes,
+            "reminder_time": reminder_time,
+            "last_reminder_local_date": None,
+            "next_reminder_at": next_reminder_at(reminder_time, offset_minutes, not_before=now),
+            "reminder_failures": 0,
+            "reminder_claimed_by": None,
+            "reminder_claimed_until": None,
+        }
+
+        async with self._session(session, telegram_id) as active:
+            profiles = UserProfile.__table__
+            stmt = dialect_insert(active, profiles).values(telegram_id=telegram_id, **values)
+            stmt = stmt.on_conflict_do_update(index_elements=[profiles.c.telegram_id], set_=values)
+            await active.execute(stmt)
+            self._mark_profile(active, telegram_id)
+
+    async def disable_reminder(self, telegram_id: int, session: AsyncSession | None = None) -> bool:
+        stmt = (
+            update(UserProfile)
+            .where(UserProfile.telegram_id == telegram_id, UserProfile.reminder_time.is_not(None))
+            .values(
+                reminder_time=None,
+                last_reminder_local_date=None,
+                next_reminder_at=None,
+                reminder_failures=0,
+                reminder_claimed_by=None,
+                reminder_claimed_until=None,
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        async with self._session(session, telegram_id) as active:
+            result = await active.execute(stmt)
+        return result.rowcount > 0
 
     async def find_due_reminders(self, now_utc: datetime) -> list[DueReminder]:
-        if now_utc.tzinfo is None:
-            now_utc = now_utc.replace(tzinfo=timezone.utc)
+        # Every scheduled-but-unacknowledged reminder up to now is due, so reminders that
+        # fell between ticks or while the process was down are picked up on the next poll.
+        now_utc = as_utc(now_utc)
+        stmt = (
+            select(
+                UserProfile.telegram_id,
+                UserProfile.timezone_offset_min,
+                UserProfile.reminder_time,
+                UserProfile.next_reminder_at,
+                UserProfile.reminder_failures,
+            )
+            .where(UserProfile.next_reminder_at <= now_utc)
+            .order_by(UserProfile.next_reminder_at)
+        )
 
-        async with self._session_factory() as session:
-            stmt = select(UserProfile).where(UserProfile.reminder_time.is_not(None))
-            result = await session.execute(stmt)
-            profiles = list(result.scalars().all())
+        async def scan(factory: async_sessionmaker[AsyncSession]) -> list[DueReminder]:
+            async with self._read_session(None, factory=factory) as session:
+                result = await session.execute(stmt)
+                return [_due_reminder(*row) for row in result.all()]
 
-        due: list[DueReminder] = []
-        for profile in profiles:
-            if profile.reminder_time is None:
-                continue
+        return await self._merge_shards(scan)
 
-            local_now = now_utc + timedelta(minutes=profile.timezone_offset_min)
-            if (
-                local_now.hour != profile.reminder_time.hour
-                or local_now.minute != profile.reminder_time.minute
-            ):
-                continue
+    async def claim_due_reminders(
+        self,
+        now_utc: datetime,
+        owner_id: str,
+        limit: int,
+        claim_seconds: int = 600,
+    ) -> list[DueReminder]:
+        """Atomically claim up to ``limit`` due reminders for ``owner_id``.
 
-            local_date = local_now.date()
-            if profile.last_reminder_local_date == local_date:
-                continue
+        The claim is taken by a single UPDATE ... RETURNING, so two workers can never hold the
+        same reminder. Claims are released by the ack paths below or expire after
+        ``claim_seconds`` if the owner dies mid-send.
+        """
+        now_utc = as_utc(now_utc)
+        profiles = UserProfile.__table__
+        claimable = (
+            profiles.c.next_reminder_at <= now_utc,
+            or_(profiles.c.reminder_claimed_until.is_(None), profiles.c.reminder_claimed_until < now_utc),
+        )
+        candidates = (
+            select(profiles.c.telegram_id)
+            .where(*claimable)
+            .order_by(profiles.c.next_reminder_at)
+            .limit(limit)
+            .scalar_subquery()
+        )
+        # The outer WHERE repeats the condition so a row claimed concurrently is skipped.
+        stmt = (
+            update(profiles)
+            .where(profiles.c.telegram_id.in_(candidates), *claimable)
+            .values(
+                reminder_claimed_by=owner_id,
+                reminder_claimed_until=now_utc + timedelta(seconds=claim_seconds),
+            )
+            .returning(
+                profiles.c.telegram_id,
+                profiles.c.timezone_offset_min,
+                profiles.c.reminder_time,
+                profiles.c.next_reminder_at,
+                profiles.c.reminder_failures,
+            )
+        )
+
+        async def claim(factory: async_sessionmaker[AsyncSession]) -> list[DueReminder]:
+            async with factory() as session:
+                result = await session.execute(stmt)
+                rows = result.all()
+                await session.commit()
+            return [_due_reminder(*row) for row in rows]
 
-            due.append(DueReminder(telegram_id=profile.telegram_id, local_date=local_date))
+        # Up to ``limit`` per shard; the caller keeps claiming until every shard comes back empty.
+        return await self._merge_shards(claim)
 
-        return due
+    async def _merge_shards(
+        self,
+        scan: Callable[[async_sessionmaker[AsyncSession]], Awaitable[list[DueReminder]]],
+    ) -> list[DueReminder]:
+        results = await asyncio.gather(*(scan(factory) for factory in self._shards.factories.values()))
+        return sorted((due for found in results for due in found), key=lambda due: due.scheduled_at)
 
-    async def mark_reminded(self, telegram_id: int, local_date: date) -> None:
-        async with self._session_factory() as session:
+    async def _execute_by_user(self, stmt: Any, params: list[dict[str, Any]]) -> None:
+        """Run an executemany statement on each user's shard; ``b_telegram_id`` picks the shard."""
+        groups: dict[str, list[dict[str, Any]]] = {}
+        for row in params:
+            groups.setdefault(self._shards.shard_for(row["b_telegram_id"]), []).append(row)
+
+        async def run(shard: str, rows: list[dict[str, Any]]) -> None:
+            async with self._shards.factories[shard]() as session:
+                await session.execute(stmt, rows)
+                await session.commit()
+
+        await asyncio.gather(*(run(shard, rows) for shard, rows in groups.items()))
+
+    async def mark_reminded(
+        self,
+        telegram_id: int,
+        local_date: date,
+        now_utc: datetime | None = None,
+    ) -> None:
+        now = as_utc(now_utc or datetime.now(timezone.utc))
+
+        async with self._session(None, telegram_id) as session:
             profile = await session.get(UserProfile, telegram_id)
             if profile is None:
                 return
 
             profile.last_reminder_local_date = local_date
+            if profile.reminder_time is not None:
+                sent_for = reminder_instant(local_date, profile.reminder_time, profile.timezone_offset_min)
+                profile.next_reminder_at = next_reminder_at(
+                    profile.reminder_time,
+                    profile.timezone_offset_min,
+                    not_before=max(sent_for, now) + timedelta(minutes=1),
+                )
+
+    async def mark_reminded_many(self, items: list[DueReminder], now_utc: datetime | None = None) -> None:
+        if not items:
+            return
+
+        now = as_utc(now_utc or datetime.now(timezone.utc))
+        params = [
+            {
+                "b_telegram_id": item.telegram_id,
+                "b_scheduled_at": item.scheduled_at,
+                "b_local_date": item.local_date,
+                "b_next_reminder_at": next_reminder_at(
+                    item.reminder_time,
+                    item.offset_minutes,
+                    not_before=max(item.scheduled_at, now) + timedelta(minutes=1),
+                ),
+            }
+            for item in items
+        ]
+
+        # One executemany UPDATE per batch. The scheduled_at guard leaves rows alone when
+        # the user changed their reminder while the batch was being sent.
+        profiles = UserProfile.__table__
+        stmt = (
+            update(profiles)
+            .where(
+                profiles.c.telegram_id == bindparam("b_telegram_id"),
+                profiles.c.next_reminder_at == bindparam("b_scheduled_at"),
+            )
+            .values(
+                last_reminder_local_date=bindparam("b_local_date"),
+                next_reminder_at=bindparam("b_next_reminder_at"),
+                reminder_failures=0,
+                reminder_claimed_by=None,
+                reminder_claimed_until=None,
+            )
+        )
+
+        await self._execute_by_user(stmt, params)
+
+    async def record_reminder_failures(
+        self,
+        items: list[DueReminder],
+        max_failures: int,
+        now_utc: datetime | None = None,
+    ) -> None:
+        if not items:
+            return
+
+        now = as_utc(now_utc or datetime.now(timezone.utc))
+        params = []
+        for item in items:
+            failures = item.failures + 1
+            next_at = item.scheduled_at
+            if failures >= max_failures:
+                # Give up on today's reminder and try again at the next scheduled time.
+                failures = 0
+                next_at = next_reminder_at(
+                    item.reminder_time,
+                    item.offset_minutes,
+                    not_before=max(item.scheduled_at, now) + timedelta(minutes=1),
+                )
+            params.append(
+                {
+                    "b_telegram_id": item.telegram_id,
+                    "b_scheduled_at": item.scheduled_at,
+                    "b_failures": failures,
+                    "b_next_reminder_at": next_at,
+                }
+            )
+
+        profiles = UserProfile.__table__
+        stmt = (
+            update(profiles)
+            .where(
+                profiles.c.telegram_id == bindparam("b_telegram_id"),
+                profiles.c.next_reminder_at == bindparam("b_scheduled_at"),
+            )
+            .values(
+                reminder_failures=bindparam("b_failures"),
+                next_reminder_at=bindparam("b_next_reminder_at"),
+                # Keep the row unclaimable until ``now``: a worker claiming with the same
+                # tick time skips it, and the next tick retries it.
+                reminder_claimed_by=None,
+                reminder_claimed_until=now,
+            )
+        )
+
+        await self._execute_by_user(stmt, params)
+
+    async def disable_reminders_many(self, items: list[DueReminder]) -> None:
+        if not items:
+            return
+
+        params = [{"b_telegram_id": item.telegram_id, "b_scheduled_at": item.scheduled_at} for item in items]
+
+        # Same guard as the ack: a user who set a new reminder while the batch was being
+        # sent keeps it.
+        profiles = UserProfile.__table__
+        stmt = (
+            update(profiles)
+            .where(
+                profiles.c.telegram_id == bindparam("b_telegram_id"),
+                profiles.c.next_reminder_at == bindparam("b_scheduled_at"),
+            )
+            .values(
+                reminder_time=None,
+                last_reminder_local_date=None,
+                next_reminder_at=None,
+                reminder_failures=0,
+                reminder_claimed_by=None,
+                reminder_claimed_until=None,
+            )
+        )
+
+        await self._execute_by_user(stmt, params)
+
+    async def backfill_reminder_schedule(self, now_utc: datetime | None = None) -> int:
+        now = as_utc(now_utc or datetime.now(timezone.utc)).replace(second=0, microsecond=0)
+        updated = 0
+        for factory in self._shards.factories.values():
+            updated += await self._backfill_reminder_schedule(factory, now)
+        return updated
+
+    async def _backfill_reminder_schedule(
+        self,
+        factory: async_sessionmaker[AsyncSession],
+        now: datetime,
+    ) -> int:
+        async with factory() as session:
+            stmt = select(UserProfile).where(
+                UserProfile.reminder_time.is_not(None),
+                UserProfile.next_reminder_at.is_(None),
+            )
+            result = await session.execute(stmt)
+            profiles = list(result.scalars().all())
+
+            for profile in profiles:
+                if profile.reminder_time is None:
+                    continue
+
+                not_before = now
+                if profile.last_reminder_local_date is not None:
+                    sent_for = reminder_instant(
+                        profile.last_reminder_local_date,
+                        profile.reminder_time,
+                        profile.timezone_offset_min,
+                    )
+                    not_before = max(sent_for + timedelta(minutes=1), now)
+
+                profile.next_reminder_at = next_reminder_at(
+                    profile.reminder_time,
+                    profile.timezone_offset_min,
+                    not_before=not_before,
+                )
             await session.commit()
+
+        return len(profiles)
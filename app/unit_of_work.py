@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import TelegramObject
+
+from app.services.workout_service import WorkoutService
+
+
+class UnitOfWorkMiddleware(BaseMiddleware):
+    """Inner middleware: one DB session per update, passed to handlers as ``session``.
+
+    The session connects lazily, so handlers that never touch the database pay nothing.
+    Whatever the handler left uncommitted is committed after it returns; an exception
+    rolls the whole update back.
+    """
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        workout_service: WorkoutService | None = data.get("workout_service")
+        if workout_service is None:
+            return await handler(event, data)
+
+        user = data.get("event_from_user")
+        async with workout_service.open_session(None if user is None else user.id) as session:
+            data["session"] = session
+            result = await handler(event, data)
+            await workout_service.commit(session)
+        return result
+
+
+def setup_dispatcher_unit_of_work(dispatcher: Dispatcher) -> None:
+    for event_name in ("message", "callback_query"):
+        dispatcher.observers[event_name].middleware(UnitOfWorkMiddleware())
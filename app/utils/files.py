@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from collections.abc import AsyncGenerator
+from typing import IO
+
+from aiogram.types import InputFile
+
+
+class FileObjectInputFile(InputFile):
+    """Uploads an already open binary file object in chunks instead of loading it into memory."""
+
+    def __init__(self, file: IO[bytes], filename: str, chunk_size: int = 64 * 1024) -> None:
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self.file = file
+
+    async def read(self, *_: object) -> AsyncGenerator[bytes, None]:
+        self.file.seek(0)
+        while chunk := self.file.read(self.chunk_size):
+            yield chunk
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+
+
+def as_utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def reminder_instant(local_date: date, reminder_time: time, offset_minutes: int) -> datetime:
+    local_dt = datetime.combine(local_date, reminder_time.replace(second=0, microsecond=0))
+    return (local_dt - timedelta(minutes=offset_minutes)).replace(tzinfo=timezone.utc)
+
+
+def next_reminder_at(reminder_time: time, offset_minutes: int, not_before: datetime) -> datetime:
+    not_before = as_utc(not_before)
+    local_date = (not_before + timedelta(minutes=offset_minutes)).date()
+
+    candidate = reminder_instant(local_date, reminder_time, offset_minutes)
+    if candidate < not_before:
+        candidate = reminder_instant(local_date + timedelta(days=1), reminder_time, offset_minutes)
+    return candidate
+
+
+def reminder_local_date(scheduled_at: datetime, offset_minutes: int) -> date:
+    return (as_utc(scheduled_at) + timedelta(minutes=offset_minutes)).date()
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+from app.config import Settings
+from app.scheduling import UpdateScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class _ScheduledRequestHandler(SimpleRequestHandler):
+    def __init__(self, *args: object, scheduler: UpdateScheduler | None, **kwargs: object) -> None:
+        super().__init__(*args, **kwargs)  # type: ignore[arg-type]
+        self._scheduler = scheduler
+
+    async def handle(self, request: web.Request) -> web.Response:
+        # While the update queue is full the request is held open, so Telegram slows down
+        # (it keeps a bounded number of webhook connections) instead of updates piling up here.
+        if self._scheduler is not None:
+            await self._scheduler.wait_for_space()
+        return await super().handle(request)
+
+
+def create_webhook_app(
+    bot: Bot,
+    dispatcher: Dispatcher,
+    path: str,
+    secret_token: str,
+) -> web.Application:
+    app = web.Application()
+    # Updates are acknowledged with an empty 200 right away and processed in a background
+    # task, so Telegram (or a load balancer in front of several instances) never waits on handlers.
+    handler = _ScheduledRequestHandler(
+        dispatcher=dispatcher,
+        bot=bot,
+        handle_in_background=True,
+        secret_token=secret_token,
+        scheduler=dispatcher.get("update_scheduler"),
+    )
+    handler.register(app, path=path)
+    setup_application(app, dispatcher, bot=bot)
+    return app
+
+
+async def run_webhook(bot: Bot, dispatcher: Dispatcher, settings: Settings) -> None:
+    app = create_webhook_app(bot, dispatcher, settings.webhook_path, settings.webhook_secret)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=settings.webhook_host, port=settings.webhook_port)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except (NotImplementedError, RuntimeError):
+            continue
+
+    try:
+        await site.start()
+        await bot.set_webhook(
+            url=f"{settings.webhook_url.rstrip('/')}{settings.webhook_path}",
+            secret_token=settings.webhook_secret,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+        )
+        logger.info("Webhook server listening on %s:%s", settings.webhook_host, settings.webhook_port)
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
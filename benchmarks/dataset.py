@@ -0,0 +1,178 @@
+"""Reproducible synthetic dataset for service benchmarks.
+
+Fills ``user_profiles`` and ``workout_entries`` with skewed, realistic data, then builds the
+derived record and rollup tables the way a deployed bot would have them::
+
+    python -m benchmarks.dataset --database-url sqlite+aiosqlite:///./data/bench.db \\
+        --users 100000 --entries 10000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import bisect
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+import itertools
+import random
+from typing import Any, Iterator
+
+from sqlalchemy import func, insert, select
+
+from app.db.bootstrap import init_db
+from app.db.models import UserProfile, WorkoutEntry
+from app.db.session import StorageProfile, create_database
+from app.services.workout_service import WorkoutService
+from app.utils.schedule import next_reminder_at
+
+EXERCISE_NAMES = (
+    "Bench Press", "Squat", "Deadlift", "Overhead Press", "Barbell Row", "Pull Up", "Dip",
+    "Lat Pulldown", "Leg Press", "Romanian Deadlift", "Incline Bench Press", "Lunge",
+    "Bicep Curl", "Tricep Pushdown", "Lateral Raise", "Face Pull", "Hip Thrust", "Calf Raise",
+    "Leg Curl", "Leg Extension", "Chest Fly", "Shrug", "Front Squat", "Hammer Curl",
+    "Cable Row", "Push Up", "Plank", "Chin Up", "Skull Crusher", "Goblet Squat",
+)
+TEMPLATES = ("Push Day", "Pull Day", "Leg Day", "Full Body", None)
+INSERT_CHUNK_ROWS = 10_000
+
+# Every run is anchored to the same instant so timings are comparable across runs.
+DATASET_NOW = datetime(2026, 3, 2, 12, 0, tzinfo=timezone.utc)
+HISTORY_DAYS = 365
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    users: int = 100_000
+    entries: int = 10_000_000
+    seed: int = 7
+    exercise_skew: float = 1.1
+    user_tail: float = 1.2
+    reminder_share: float = 0.3
+
+
+@dataclass(frozen=True)
+class DatasetSummary:
+    users: int
+    entries: int
+    heaviest_user: int
+    heaviest_user_entries: int
+
+
+class _Zipf:
+    def __init__(self, values: tuple[Any, ...], skew: float, rng: random.Random) -> None:
+        self._values = values
+        self._cumulative = list(itertools.accumulate(1 / rank**skew for rank in range(1, len(values) + 1)))
+        self._rng = rng
+
+    def __call__(self) -> Any:
+        point = self._rng.random() * self._cumulative[-1]
+        return self._values[bisect.bisect_left(self._cumulative, point)]
+
+
+def user_entry_counts(spec: DatasetSpec, rng: random.Random) -> list[int]:
+    """Split ``spec.entries`` across users along a Pareto (heavy-tail) distribution."""
+    weights = [rng.paretovariate(spec.user_tail) for _ in range(spec.users)]
+    scale = spec.entries / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in rng.sample(range(spec.users), spec.entries - sum(counts)):
+        counts[index] += 1
+    return counts
+
+
+def _profile_rows(spec: DatasetSpec, rng: random.Random) -> Iterator[dict[str, Any]]:
+    for telegram_id in range(1, spec.users + 1):
+        row: dict[str, Any] = {
+            "telegram_id": telegram_id,
+            "timezone_offset_min": rng.choice((-300, -240, 0, 60, 120, 180, 330, 480)),
+            "created_at": DATASET_NOW - timedelta(days=HISTORY_DAYS),
+            "reminder_time": None,
+            "next_reminder_at": None,
+        }
+        if rng.random() < spec.reminder_share:
+            reminder_time = time(rng.randint(5, 22), rng.choice((0, 15, 30, 45)))
+            row["reminder_time"] = reminder_time
+            row["next_reminder_at"] = next_reminder_at(
+                reminder_time,
+                row["timezone_offset_min"],
+                not_before=DATASET_NOW - timedelta(hours=1),
+            )
+        yield row
+
+
+def _entry_rows(counts: list[int], spec: DatasetSpec, rng: random.Random) -> Iterator[dict[str, Any]]:
+    exercise = _Zipf(EXERCISE_NAMES, spec.exercise_skew, rng)
+    history_seconds = HISTORY_DAYS * 86_400
+    for telegram_id, count in enumerate(counts, start=1):
+        for _ in range(count):
+            sets = rng.randint(1, 6)
+            reps = rng.randint(1, 15)
+            weight_kg = None if rng.random() < 0.1 else round(rng.uniform(10, 180) * 2) / 2
+            yield {
+                "telegram_id": telegram_id,
+                "exercise": exercise(),
+                "sets": sets,
+                "reps": reps,
+                "weight_kg": weight_kg,
+                "volume_kg": round(sets * reps * (weight_kg or 0), 2),
+                "template": rng.choice(TEMPLATES),
+                "notes": None,
+                "performed_at": DATASET_NOW - timedelta(seconds=rng.randrange(history_seconds)),
+            }
+
+
+async def _insert_chunks(engine: Any, table: Any, rows: Iterator[dict[str, Any]]) -> None:
+    while True:
+        chunk = list(itertools.islice(rows, INSERT_CHUNK_ROWS))
+        if not chunk:
+            return
+        async with engine.begin() as conn:
+            await conn.execute(insert(table), chunk)
+
+
+async def generate(database_url: str, spec: DatasetSpec) -> DatasetSummary:
+    database = create_database(database_url, StorageProfile(name="auto"))
+    try:
+        await init_db(database.engine)
+        async with database.session_factory() as session:
+            if await session.scalar(select(func.count()).select_from(UserProfile)):
+                raise RuntimeError(f"{database_url} already has data; use an empty database.")
+
+        rng = random.Random(spec.seed)
+        counts = user_entry_counts(spec, rng)
+        await _insert_chunks(database.engine, UserProfile.__table__, _profile_rows(spec, rng))
+        await _insert_chunks(database.engine, WorkoutEntry.__table__, _entry_rows(counts, spec, rng))
+
+        workout_service = WorkoutService(database.session_factory)
+        await workout_service.backfill_personal_records(force=True)
+        await workout_service.backfill_daily_rollups(force=True)
+    finally:
+        await database.dispose()
+
+    heaviest = max(range(spec.users), key=counts.__getitem__)
+    return DatasetSummary(
+        users=spec.users,
+        entries=spec.entries,
+        heaviest_user=heaviest + 1,
+        heaviest_user_entries=counts[heaviest],
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.dataset", description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--users", type=int, default=DatasetSpec.users)
+    parser.add_argument("--entries", type=int, default=DatasetSpec.entries)
+    parser.add_argument("--seed", type=int, default=DatasetSpec.seed)
+    args = parser.parse_args(argv)
+
+    spec = DatasetSpec(users=args.users, entries=args.entries, seed=args.seed)
+    summary = asyncio.run(generate(args.database_url, spec))
+    print(
+        f"Generated {summary.users} users and {summary.entries} entries; "
+        f"heaviest user {summary.heaviest_user} has {summary.heaviest_user_entries} entries."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+import itertools
+import time
+from typing import Any
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+
+@dataclass(frozen=True)
+class Reply:
+    method: str
+    chat_id: int | None
+    received_at: float
+
+
+class FakeBotApi:
+    """A local stand-in for the Telegram Bot API.
+
+    Serves ``getUpdates`` from an in-memory queue fed by :meth:`push_update` and answers
+    ``sendMessage``, ``editMessageText``, ``sendDocument`` and ``answerCallbackQuery`` with
+    minimal valid objects. Every reply is put on a per-chat queue so a load driver can
+    measure the time from an update to the bot's answer.
+    """
+
+    def __init__(self) -> None:
+        self._updates: list[dict[str, Any]] = []
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Condition()
+        self._replies: defaultdict[int, asyncio.Queue[Reply]] = defaultdict(asyncio.Queue)
+        self.calls: defaultdict[str, int] = defaultdict(int)
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host=host, port=port)
+        await site.start()
+        bound_port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{bound_port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def push_update(self, payload: dict[str, Any]) -> int:
+        update_id = next(self._update_ids)
+        async with self._new_update:
+            self._updates.append({"update_id": update_id, **payload})
+            self._new_update.notify_all()
+        return update_id
+
+    async def wait_reply(self, chat_id: int, method: str, timeout: float = 30.0) -> Reply:
+        queue = self._replies[chat_id]
+        while True:
+            reply = await asyncio.wait_for(queue.get(), timeout=timeout)
+            if reply.method == method:
+                return reply
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = dict(await request.post())
+        self.calls[method] += 1
+
+        if method == "getUpdates":
+            result: Any = await self._get_updates(params)
+        elif method == "getMe":
+            result = BOT_USER
+        elif method in ("sendMessage", "editMessageText", "sendDocument"):
+            result = self._message(method, params)
+        else:
+            result = True
+
+        if method in ("sendMessage", "editMessageText", "sendDocument", "answerCallbackQuery"):
+            chat_id = params.get("chat_id")
+            if method == "answerCallbackQuery":
+                # Callback answers carry no chat id; the load driver encodes it in the query id.
+                chat_id = str(params.get("callback_query_id", "")).split(":", maxsplit=1)[0]
+            if chat_id:
+                self._replies[int(chat_id)].put_nowait(Reply(method, int(chat_id), time.perf_counter()))
+
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, params: dict[str, Any]) -> list[dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+
+        async with self._new_update:
+            # Everything before the offset has been confirmed by the client.
+            self._updates = [update for update in self._updates if update["update_id"] >= offset]
+            if not self._updates and timeout > 0:
+                try:
+                    await asyncio.wait_for(self._new_update.wait(), timeout=timeout)
+                except TimeoutError:
+                    pass
+            return self._updates[:limit]
+
+    def _message(self, method: str, params: dict[str, Any]) -> dict[str, Any]:
+        message: dict[str, Any] = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+            "from": BOT_USER,
+        }
+        if method == "sendDocument":
+            message["document"] = {"file_id": "bench", "file_unique_id": "bench"}
+        else:
+            message["text"] = str(params.get("text", ""))
+        return message
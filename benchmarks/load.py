@@ -0,0 +1,249 @@
+"""End-to-end load harness.
+
+Runs the real dispatcher from ``app.main`` against :class:`FakeBotApi` and replays
+synthetic users through ``/add``, ``/history``, ``/stats``, ``/prs`` and ``/export``::
+
+    python -m benchmarks.load --users 2000 --concurrency 200 --json load.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from collections import defaultdict
+from dataclasses import dataclass
+import itertools
+import json
+import logging
+import math
+from pathlib import Path
+import random
+import tempfile
+import time
+from typing import Any, Sequence
+
+from aiogram import Bot
+from aiogram.client.default import DefaultBotProperties
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.enums import ParseMode
+
+from app.db.bootstrap import init_db
+from app.db.session import StorageProfile, create_database
+from app.main import build_dispatcher
+from app.services.cache import UserCache
+from app.services.reminder_worker import ReminderWorker
+from app.services.workout_service import WorkoutService
+from benchmarks.fake_bot_api import FakeBotApi
+
+EXERCISES = ("Bench Press", "Squat", "Deadlift", "Overhead Press", "Barbell Row", "Pull Up")
+USER_ID_BASE = 1_000_000
+
+
+@dataclass(frozen=True)
+class HandlerReport:
+    handler: str
+    count: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+@dataclass(frozen=True)
+class LoadReport:
+    users: int
+    updates: int
+    elapsed_seconds: float
+    updates_per_second: float
+    handlers: list[HandlerReport]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "users": self.users,
+            "updates": self.updates,
+            "elapsed_seconds": round(self.elapsed_seconds, 3),
+            "updates_per_second": round(self.updates_per_second, 1),
+            "handlers": [handler.__dict__ for handler in self.handlers],
+        }
+
+
+def percentile(samples: Sequence[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    # Nearest-rank percentile.
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+class _User:
+    def __init__(self, api: FakeBotApi, telegram_id: int, latencies: dict[str, list[float]]) -> None:
+        self._api = api
+        self._telegram_id = telegram_id
+        self._latencies = latencies
+        self._sender = {"id": telegram_id, "is_bot": False, "first_name": f"User{telegram_id}"}
+        self._chat = {"id": telegram_id, "type": "private"}
+        self._message_ids = itertools.count(1)
+        self._callback_ids = itertools.count(1)
+
+    async def say(self, handler: str, text: str, expect: str = "sendMessage") -> None:
+        message = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self._chat,
+            "from": self._sender,
+            "text": text,
+        }
+        await self._exchange(handler, {"message": message}, expect)
+
+    async def press(self, handler: str, data: str) -> None:
+        query = {
+            "id": f"{self._telegram_id}:{next(self._callback_ids)}",
+            "from": self._sender,
+            "chat_instance": str(self._telegram_id),
+            "data": data,
+            "message": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": self._chat,
+                "from": {"id": 1, "is_bot": True, "first_name": "Bench"},
+                "text": "Choose a template for today:",
+            },
+        }
+        await self._exchange(handler, {"callback_query": query}, "answerCallbackQuery")
+
+    async def _exchange(self, handler: str, payload: dict[str, Any], expect: str) -> None:
+        started = time.perf_counter()
+        await self._api.push_update(payload)
+        reply = await self._api.wait_reply(self._telegram_id, expect)
+        self._latencies[handler].append(reply.received_at - started)
+
+
+async def _user_session(user: _User, rng: random.Random, workouts: int) -> int:
+    updates = 0
+    for _ in range(workouts):
+        await user.say("add", "/add")
+        await user.press("select_template", "tpl:push")
+        await user.say("process_exercise", rng.choice(EXERCISES))
+        await user.say("process_sets", str(rng.randint(1, 5)))
+        await user.say("process_reps", str(rng.randint(3, 12)))
+        await user.say("process_weight", str(rng.randint(20, 140)))
+        await user.say("process_notes", "-")
+        updates += 7
+
+    await user.say("history", "/history")
+    await user.say("stats", "/stats")
+    await user.say("prs", "/prs")
+    await user.say("export", "/export", expect="sendDocument")
+    return updates + 4
+
+
+async def run_load(
+    users: int = 1000,
+    concurrency: int = 100,
+    workouts_per_user: int = 1,
+    database_url: str | None = None,
+    seed: int = 1,
+    write_batch_ms: int = 0,
+) -> LoadReport:
+    api = FakeBotApi()
+    base_url = await api.start()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = database_url or f"sqlite+aiosqlite:///{Path(tmp_dir) / 'load.db'}"
+        database = create_database(url, StorageProfile(name="auto"))
+        await init_db(database.engine)
+
+        cache = UserCache(max_users=users, ttl_seconds=60)
+        workout_service = WorkoutService(database.session_factory, cache=cache)
+        if write_batch_ms > 0:
+            workout_service.enable_group_commit(max_latency_seconds=write_batch_ms / 1000)
+        session = AiohttpSession(api=TelegramAPIServer.from_base(base_url))
+        bot = Bot("42:LOAD", session=session, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+        reminder_worker = ReminderWorker(bot, workout_service, poll_seconds=3600)
+        dispatcher = build_dispatcher(workout_service, reminder_worker)
+        polling = asyncio.create_task(dispatcher.start_polling(bot, polling_timeout=1, handle_signals=False))
+
+        latencies: dict[str, list[float]] = defaultdict(list)
+        semaphore = asyncio.Semaphore(concurrency)
+        rng = random.Random(seed)
+
+        async def one_user(index: int) -> int:
+            async with semaphore:
+                user = _User(api, USER_ID_BASE + index, latencies)
+                return await _user_session(user, random.Random(rng.random()), workouts_per_user)
+
+        try:
+            started = time.perf_counter()
+            updates = sum(await asyncio.gather(*(one_user(index) for index in range(users))))
+            elapsed = time.perf_counter() - started
+        finally:
+            await dispatcher.stop_polling()
+            await polling
+            await workout_service.close()
+            await dispatcher.storage.close()
+            await bot.session.close()
+            await database.dispose()
+            await api.stop()
+
+    handlers = [
+        HandlerReport(
+            handler=name,
+            count=len(samples),
+            p50_ms=round(percentile(samples, 0.50) * 1000, 2),
+            p95_ms=round(percentile(samples, 0.95) * 1000, 2),
+            p99_ms=round(percentile(samples, 0.99) * 1000, 2),
+        )
+        for name, samples in latencies.items()
+    ]
+    return LoadReport(
+        users=users,
+        updates=updates,
+        elapsed_seconds=elapsed,
+        updates_per_second=updates / elapsed if elapsed else 0.0,
+        handlers=handlers,
+    )
+
+
+def _print_report(report: LoadReport) -> None:
+    print(
+        f"{report.users} users, {report.updates} updates in {report.elapsed_seconds:.2f}s "
+        f"({report.updates_per_second:.1f} updates/s)"
+    )
+    print(f"{'handler':<20}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for handler in report.handlers:
+        print(
+            f"{handler.handler:<20}{handler.count:>8}"
+            f"{handler.p50_ms:>10}{handler.p95_ms:>10}{handler.p99_ms:>10}"
+        )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--workouts-per-user", type=int, default=1)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--write-batch-ms", type=int, default=0, help="group commit window, 0 disables")
+    parser.add_argument("--json", type=Path, default=None, help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+    report = asyncio.run(
+        run_load(
+            users=args.users,
+            concurrency=args.concurrency,
+            workouts_per_user=args.workouts_per_user,
+            database_url=args.database_url,
+            seed=args.seed,
+            write_batch_ms=args.write_batch_ms,
+        )
+    )
+    _print_report(report)
+    if args.json is not None:
+        args.json.write_text(json.dumps(report.as_dict(), indent=2) + "\n", encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
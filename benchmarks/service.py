@@ -0,0 +1,171 @@
+"""WorkoutService micro-benchmarks on a generated dataset.
+
+Times the main read paths on SQLite and, when ``BENCH_POSTGRES_URL`` (or ``--postgres-url``)
+is set, on PostgreSQL. Results are written as JSON and can be compared against a baseline::
+
+    python -m benchmarks.service --users 10000 --entries 1000000 --json bench.json
+    python -m benchmarks.service --json new.json --baseline bench.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+from datetime import datetime, timezone
+import json
+import os
+from pathlib import Path
+import random
+import statistics
+import sys
+import time
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import func, select
+
+from app.db.models import UserProfile, WorkoutEntry
+from app.db.session import StorageProfile, create_database
+from app.services.workout_service import WorkoutService
+from benchmarks.dataset import DATASET_NOW, DatasetSpec, generate
+from benchmarks.load import percentile
+
+Operation = Callable[[WorkoutService, int], Awaitable[Any]]
+
+OPERATIONS: dict[str, Operation] = {
+    "recent_workouts": lambda service, user: service.recent_workouts(user),
+    "weekly_stats": lambda service, user: service.weekly_stats(user, now_utc=DATASET_NOW),
+    "personal_records": lambda service, user: service.personal_records(user),
+    "export_csv_bytes": lambda service, user: service.export_csv_bytes(user),
+}
+HEAVY_USERS = 3
+SAMPLED_USERS = 20
+
+
+def _summary(samples: list[float]) -> dict[str, Any]:
+    return {
+        "runs": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+    }
+
+
+async def _timed(samples: list[float], call: Callable[[], Awaitable[Any]]) -> None:
+    started = time.perf_counter()
+    await call()
+    samples.append(time.perf_counter() - started)
+
+
+async def _pick_users(service_session_factory: Any, rng: random.Random) -> list[int]:
+    async with service_session_factory() as session:
+        heavy = (
+            await session.scalars(
+                select(WorkoutEntry.telegram_id)
+                .group_by(WorkoutEntry.telegram_id)
+                .order_by(func.count().desc())
+                .limit(HEAVY_USERS)
+            )
+        ).all()
+        max_id = await session.scalar(select(func.max(UserProfile.telegram_id))) or 0
+
+    sampled = [rng.randint(1, max_id) for _ in range(SAMPLED_USERS)] if max_id else []
+    return list(heavy) + sampled
+
+
+async def bench_backend(database_url: str, spec: DatasetSpec, repeat: int) -> dict[str, Any]:
+    database = create_database(database_url, StorageProfile(name="auto"))
+    try:
+        async with database.session_factory() as session:
+            has_data = bool(await session.scalar(select(func.count()).select_from(UserProfile)))
+    except Exception:
+        has_data = False
+    finally:
+        await database.dispose()
+
+    if not has_data:
+        await generate(database_url, spec)
+
+    database = create_database(database_url, StorageProfile(name="auto"))
+    try:
+        # No read cache: every call measures the database path.
+        service = WorkoutService(database.session_factory)
+        users = await _pick_users(database.session_factory, random.Random(spec.seed))
+
+        results: dict[str, Any] = {}
+        for name, operation in OPERATIONS.items():
+            samples: list[float] = []
+            for user in users:
+                for _ in range(repeat):
+                    await _timed(samples, lambda: operation(service, user))
+            results[name] = _summary(samples)
+
+        samples = []
+        for _ in range(repeat * len(users)):
+            await _timed(samples, lambda: service.find_due_reminders(DATASET_NOW))
+        results["find_due_reminders"] = _summary(samples)
+        return results
+    finally:
+        await database.dispose()
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], tolerance: float) -> list[str]:
+    """Return a line for every operation whose p50 got slower than ``tolerance`` allows."""
+    regressions = []
+    for backend, operations in current["backends"].items():
+        for name, result in operations.items():
+            before = baseline.get("backends", {}).get(backend, {}).get(name)
+            if before is None or before["p50_ms"] <= 0:
+                continue
+            ratio = result["p50_ms"] / before["p50_ms"]
+            if ratio > 1 + tolerance:
+                regressions.append(
+                    f"{backend}.{name}: p50 {before['p50_ms']}ms -> {result['p50_ms']}ms ({ratio:.2f}x)"
+                )
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    spec = DatasetSpec(users=args.users, entries=args.entries, seed=args.seed)
+    backends = {"sqlite": args.sqlite_url}
+    if args.postgres_url:
+        backends["postgresql"] = args.postgres_url
+
+    report: dict[str, Any] = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "dataset": {"users": spec.users, "entries": spec.entries, "seed": spec.seed},
+        "repeat": args.repeat,
+        "backends": {},
+    }
+    for backend, url in backends.items():
+        report["backends"][backend] = await bench_backend(url, spec, args.repeat)
+    return report
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.service", description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=int, default=DatasetSpec.seed)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sqlite-url", default="sqlite+aiosqlite:///./data/bench.db")
+    parser.add_argument("--postgres-url", default=os.getenv("BENCH_POSTGRES_URL", ""))
+    parser.add_argument("--json", type=Path, default=None, help="write the results to this file")
+    parser.add_argument("--baseline", type=Path, default=None, help="compare against an earlier result")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown, default 20%%")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, indent=2))
+    if args.json is not None:
+        args.json.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    if args.baseline is not None:
+        regressions = compare(report, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
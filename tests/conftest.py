@@ -0,0 +1,13 @@
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+
+import pytest
+
+from app import query_budget
+
+
+@pytest.fixture
+def count_queries() -> Callable[[], AbstractContextManager[query_budget.QueryStats]]:
+    """``with count_queries() as stats:`` counts the SQL issued inside the block."""
+    query_budget.install()
+    return query_budget.track
@@ -0,0 +1,58 @@
+import asyncio
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+from app.db.models import DailyRollup, ExerciseRecord, WorkoutEntry
+from app.db.session import create_database
+from benchmarks.dataset import DatasetSpec, generate
+from benchmarks.load import percentile, run_load
+from benchmarks.service import compare
+
+
+def test_percentile_uses_nearest_rank() -> None:
+    samples = [float(value) for value in range(1, 101)]
+    assert percentile(samples, 0.50) == 50.0
+    assert percentile(samples, 0.99) == 99.0
+    assert percentile([], 0.5) == 0.0
+
+
+def test_load_harness_smoke() -> None:
+    report = asyncio.run(run_load(users=3, concurrency=3, write_batch_ms=5))
+
+    counts = {handler.handler: handler.count for handler in report.handlers}
+    assert counts["process_notes"] == 3
+    assert counts["export"] == 3
+    assert report.updates == 33
+
+
+def test_dataset_is_reproducible_and_skewed(tmp_path: Path) -> None:
+    async def scenario(name: str) -> list[tuple[str, int]]:
+        url = f"sqlite+aiosqlite:///{tmp_path / name}"
+        summary = await generate(url, DatasetSpec(users=50, entries=2000, seed=3))
+        assert summary.heaviest_user_entries > 2000 / 50 * 3
+
+        database = create_database(url)
+        async with database.session_factory() as session:
+            assert await session.scalar(select(func.count()).select_from(WorkoutEntry)) == 2000
+            assert await session.scalar(select(func.count()).select_from(ExerciseRecord))
+            assert await session.scalar(select(func.count()).select_from(DailyRollup))
+            counts = (
+                await session.execute(
+                    select(WorkoutEntry.exercise, func.count())
+                    .group_by(WorkoutEntry.exercise)
+                    .order_by(func.count().desc(), WorkoutEntry.exercise)
+                )
+            ).all()
+        await database.dispose()
+        return [tuple(row) for row in counts]
+
+    first = asyncio.run(scenario("a.db"))
+    assert first == asyncio.run(scenario("b.db"))
+    assert first[0][0] == "Bench Press"
+
+
+def test_compare_flags_slower_p50() -> None:
+    baseline = {"backends": {"sqlite": {"recent_workouts": {"p50_ms": 1.0}, "weekly_stats": {"p50_ms": 2.0}}}}
+    current = {"backends": {"sqlite": {"recent_workouts": {"p50_ms": 1.1}, "weekly_stats": {"p50_ms": 3.0}}}}
+    assert compare(current, baseline, tolerance=0.2) == ["sqlite.weekly_stats: p50 2.0ms -> 3.0ms (1.50x)"]
@@ -0,0 +1,55 @@
+from app.services.cache import UserCache
+
+
+def test_user_cache_ttl_and_lru() -> None:
+    clock = {"now": 0.0}
+    cache = UserCache(max_users=2, ttl_seconds=10, clock=lambda: clock["now"])
+
+    cache.set(1, "recent", [1])
+    cache.set(2, "recent", [2])
+    assert cache.get(1, "recent") == (True, [1])
+
+    cache.set(3, "recent", [3])
+    assert cache.get(2, "recent") == (False, None)
+    assert cache.get(1, "recent") == (True, [1])
+
+    clock["now"] = 11.0
+    assert cache.get(1, "recent") == (False, None)
+
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (2, 2, 1)
+
+
+def test_user_cache_drops_results_read_before_invalidation() -> None:
+    cache = UserCache(max_users=10, ttl_seconds=60)
+    cache.set(1, "prs", ["old"])
+
+    generation = cache.generation(1)
+    cache.invalidate(1)
+    assert cache.get(1, "prs") == (False, None)
+
+    cache.set(1, "prs", ["stale"], generation=generation)
+    assert cache.get(1, "prs") == (False, None)
+
+    cache.set(1, "prs", ["fresh"], generation=cache.generation(1))
+    assert cache.get(1, "prs") == (True, ["fresh"])
+
+
+def test_invalidating_uncached_users_keeps_hot_users_cached() -> None:
+    cache = UserCache(max_users=2, ttl_seconds=60)
+    cache.set(1, "prs", ["one"])
+    cache.set(2, "prs", ["two"])
+
+    # A cold user's read races with their own write: the stale result must not be cached.
+    generation = cache.generation(3)
+    for telegram_id in range(3, 10):
+        cache.invalidate(telegram_id)
+    cache.set(3, "prs", ["stale"], generation=generation)
+
+    assert cache.get(3, "prs") == (False, None)
+    assert cache.get(1, "prs") == (True, ["one"])
+    assert cache.get(2, "prs") == (True, ["two"])
+    assert cache.stats().evictions == 0
+
+    cache.set(3, "prs", ["fresh"], generation=cache.generation(3))
+    assert cache.get(3, "prs") == (True, ["fresh"])
@@ -0,0 +1,171 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.storage.base import StorageKey
+from sqlalchemy import event, select, update
+
+from app.db.bootstrap import init_db
+from app.db.models import FsmRecord
+from app.db.session import create_engine_and_session_factory
+from app.handlers.expired import flow_expired
+from app.services.fsm_storage import ExpiringMemoryStorage, SqlStorage
+from app.states.reminder import ReminderSetup
+from app.states.workout import AddWorkout
+
+
+def test_flow_survives_restart_with_coalesced_writes(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        statements: list[str] = []
+        event.listen(engine.sync_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+        storage = SqlStorage(session_factory, flush_seconds=60)
+        await storage.set_state(key, AddWorkout.template)
+        for field, value in (("template", "push"), ("exercise", "Bench"), ("sets", 3), ("reps", 8)):
+            await storage.update_data(key, {field: value})
+            await storage.get_state(key)
+        await storage.set_state(key, AddWorkout.weight)
+
+        # The row is read once; after that every step is served from the cache.
+        assert [statement.lstrip().split(None, 1)[0].upper() for statement in statements] == ["SELECT"]
+        await storage.close()
+
+        # All the steps are written together, as one row.
+        assert [statement.lstrip().split(None, 1)[0].upper() for statement in statements] == ["SELECT", "INSERT"]
+
+        restarted = SqlStorage(session_factory)
+        assert await restarted.get_state(key) == AddWorkout.weight.state
+        assert await restarted.get_data(key) == {"template": "push", "exercise": "Bench", "sets": 3, "reps": 8}
+
+        # A finished flow removes its row.
+        await restarted.set_state(key, None)
+        await restarted.set_data(key, {})
+        await restarted.close()
+        assert await SqlStorage(session_factory).get_state(key) is None
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_processes_sharing_a_flow_never_overwrite_a_newer_step(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        key = StorageKey(bot_id=1, chat_id=10, user_id=10)
+        first = SqlStorage(session_factory, flush_seconds=60)
+        second = SqlStorage(session_factory, flush_seconds=60)
+
+        await first.set_state(key, AddWorkout.exercise)
+        await first.update_data(key, {"template": "push"})
+        await first.flush()
+
+        # The next update lands on the other process, which moves the flow on.
+        assert await second.get_state(key) == AddWorkout.exercise.state
+        await second.set_state(key, AddWorkout.sets)
+        await second.flush()
+
+        # The first process's change was based on the older step: it loses the race and reads
+        # the newer row on its next access.
+        await first.update_data(key, {"exercise": "Bench"})
+        await first.flush()
+        assert await first.get_state(key) == AddWorkout.sets.state
+        assert await first.get_data(key) == {"template": "push"}
+
+        await first.close()
+        await second.close()
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_abandoned_flows_expire(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        storage = SqlStorage(session_factory, idle_ttl_seconds=3600)
+        stale, fresh = (StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id) for chat_id in (1, 2))
+        await storage.set_state(stale, AddWorkout.exercise)
+        await storage.set_state(fresh, AddWorkout.exercise)
+        await storage.flush()
+
+        async with engine.begin() as conn:
+            await conn.execute(
+                update(FsmRecord)
+                .where(FsmRecord.key.contains(":1:1:"))
+                .values(updated_at=datetime.now(timezone.utc) - timedelta(hours=2))
+            )
+
+        assert await storage.expire_idle() == 1
+        assert await storage.get_state(stale) is None
+        assert await storage.get_state(fresh) == AddWorkout.exercise.state
+
+        # The expired state stays in the row, so whichever process gets the next update tells the
+        # user once; the row is removed after that.
+        other = SqlStorage(session_factory)
+        assert await flow_expired(None, FSMContext(other, stale)) == {"restart_command": "/add"}
+        assert await flow_expired(None, FSMContext(other, stale)) is False
+        await other.close()
+        assert await flow_expired(None, FSMContext(SqlStorage(session_factory), stale)) is False
+        async with engine.connect() as conn:
+            assert len((await conn.execute(select(FsmRecord.key))).all()) == 1
+        await storage.close()
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_background_flush_and_eviction_keep_dirty_keys(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+
+        storage = SqlStorage(session_factory, flush_seconds=0.05, max_cached=2)
+        keys = [StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id) for chat_id in range(5)]
+        for index, key in enumerate(keys):
+            await storage.update_data(key, {"step": index})
+
+        await asyncio.sleep(0.2)
+        reader = SqlStorage(session_factory)
+        assert [await reader.get_value(key, "step") for key in keys] == [0, 1, 2, 3, 4]
+        assert [await storage.get_value(key, "step") for key in keys] == [0, 1, 2, 3, 4]
+        await storage.close()
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_memory_storage_expires_idle_flows_and_caps_entries() -> None:
+    async def scenario() -> None:
+        now = [0.0]
+        storage = ExpiringMemoryStorage(ttl_seconds=60, max_entries=2, clock=lambda: now[0])
+        first, second, third = (StorageKey(bot_id=1, chat_id=chat_id, user_id=chat_id) for chat_id in (1, 2, 3))
+
+        await storage.set_state(first, AddWorkout.exercise)
+        await storage.update_data(first, {"template": "push"})
+        await storage.get_state(second)
+        assert storage.stats().entries == 1
+
+        now[0] = 30
+        await storage.set_state(second, ReminderSetup.time)
+        now[0] = 70
+        storage.sweep()
+        assert await storage.get_data(first) == {}
+        assert await storage.get_state(second) == ReminderSetup.time.state
+        assert await flow_expired(None, FSMContext(storage, first)) == {"restart_command": "/add"}
+        assert await flow_expired(None, FSMContext(storage, first)) is False
+
+        await storage.set_state(first, AddWorkout.sets)
+        await storage.set_state(third, AddWorkout.template)
+        stats = storage.stats()
+        assert (stats.live_conversations, stats.expired, stats.evicted, stats.tombstones) == (2, 1, 1, 1)
+
+        # Starting the flow again clears the tombstone of the evicted reminder flow.
+        await FSMContext(storage, second).clear()
+        assert await flow_expired(None, FSMContext(storage, second)) is False
+        await storage.close()
+
+    asyncio.run(scenario())
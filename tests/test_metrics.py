@@ -0,0 +1,98 @@
+import asyncio
+from pathlib import Path
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message, Update
+from aiohttp.test_utils import TestClient, TestServer
+
+from app import metrics
+from app.db.bootstrap import init_db
+from app.db.session import create_database
+from app.services.workout_service import WorkoutService
+from app.webhook import create_webhook_app
+from benchmarks.fake_bot_api import FakeBotApi
+
+
+def test_registry_renders_prometheus_text() -> None:
+    registry = metrics.Registry()
+    requests = registry.register(metrics.Counter("requests_total", "Requests.", ("path",)))
+    latency = registry.register(metrics.Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    hits = registry.register(metrics.Counter("hits_total", "Hits kept elsewhere."))
+    requests.inc(path='/a"b')
+    hits.set_function(lambda: 3)
+    latency.observe(0.05)
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{path="/a\\"b"} 1' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 2' in lines
+    assert "latency_seconds_count 2" in lines
+    assert "# TYPE hits_total counter" in lines
+    assert "hits_total 3" in lines
+
+
+def test_handler_db_and_bot_api_metrics(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        api = FakeBotApi()
+        base_url = await api.start()
+        database = create_database(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        metrics.instrument_engine(database.engine, "test")
+        await init_db(database.engine)
+
+        bot = Bot("42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+        bot.session.middleware(metrics.BotApiMetricsMiddleware())
+        service = WorkoutService(database.session_factory)
+
+        # The app routers are module singletons, so the test wires a router of its own.
+        router = Router(name="probe")
+
+        @router.message()
+        async def cmd_probe(message: Message) -> None:
+            await service.ensure_profile(message.chat.id)
+            await message.answer("ok")
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        metrics.setup_dispatcher_metrics(dispatcher)
+
+        handler_labels = {"router": "probe", "handler": "cmd_probe", "event": "message"}
+        handled_before = metrics.HANDLER_SECONDS.count(**handler_labels)
+        sent_before = metrics.BOT_API_SECONDS.count(method="sendMessage")
+
+        update = Update.model_validate(
+            {
+                "update_id": 1,
+                "message": {
+                    "message_id": 1,
+                    "date": 1_700_000_000,
+                    "chat": {"id": 7, "type": "private"},
+                    "from": {"id": 7, "is_bot": False, "first_name": "Test"},
+                    "text": "/start",
+                },
+            }
+        )
+        await dispatcher.feed_update(bot, update)
+
+        assert metrics.HANDLER_SECONDS.count(**handler_labels) == handled_before + 1
+        assert metrics.BOT_API_SECONDS.count(method="sendMessage") == sent_before + 1
+        assert metrics.DB_STATEMENT_SECONDS.count(engine="test", operation="INSERT") >= 1
+
+        async with TestClient(TestServer(metrics.create_metrics_app("/metrics"))) as client:
+            response = await client.get("/metrics")
+            assert response.status == 200
+            body = await response.text()
+        assert 'bot_handler_seconds_count{router="probe",handler="cmd_probe",event="message"}' in body
+
+        # The public webhook app does not expose metrics.
+        async with TestClient(TestServer(create_webhook_app(bot, dispatcher, "/hook", "secret"))) as client:
+            assert (await client.get("/metrics")).status == 404
+
+        await bot.session.close()
+        await database.dispose()
+        await api.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import CallbackQuery, Message, Update
+import pytest
+
+from app import metrics
+from app.db.bootstrap import init_db
+from app.db.session import create_database
+from app.handlers.history import callback_history_delete_last, cmd_history
+from app.query_budget import QueryBudget, setup_dispatcher_query_budget
+from app.services.workout_service import WorkoutService
+from benchmarks.fake_bot_api import FakeBotApi
+
+USER = {"id": 7, "is_bot": False, "first_name": "Test"}
+CHAT = {"id": 7, "type": "private"}
+
+
+def _message(text: str) -> dict:
+    return {"message_id": 1, "date": 1_700_000_000, "chat": CHAT, "from": USER, "text": text}
+
+
+async def _setup(tmp_path: Path) -> tuple[FakeBotApi, Bot, WorkoutService, object]:
+    api = FakeBotApi()
+    base_url = await api.start()
+    database = create_database(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    await init_db(database.engine)
+    bot = Bot("42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+    service = WorkoutService(database.session_factory)
+    for index in range(3):
+        await service.create_workout(7, "Squat", 3, 5, 100.0 + index, None, None)
+    return api, bot, service, database
+
+
+def test_history_handlers_stay_within_budget(tmp_path: Path, count_queries) -> None:
+    async def scenario() -> None:
+        api, bot, service, database = await _setup(tmp_path)
+
+        message = Message.model_validate(_message("/history"), context={"bot": bot})
+        with count_queries() as stats:
+            async with service.open_session(7) as session:
+                await cmd_history(message, service, session)
+        assert stats.statements <= 1
+        assert stats.sessions <= 1
+
+        callback = CallbackQuery.model_validate(
+            {
+                "id": "7:1",
+                "from": USER,
+                "chat_instance": "1",
+                "data": "history:delete_last",
+                "message": _message("history"),
+            },
+            context={"bot": bot},
+        )
+        with count_queries() as stats:
+            async with service.open_session(7) as session:
+                await callback_history_delete_last(callback, service, session)
+        assert stats.repeated(1) == []
+        assert stats.statements <= 7
+        assert stats.sessions == 1
+
+        await bot.session.close()
+        await database.dispose()
+        await api.stop()
+
+    asyncio.run(scenario())
+
+
+def test_middleware_reports_repeated_statements(tmp_path: Path, caplog: pytest.LogCaptureFixture) -> None:
+    async def scenario() -> None:
+        api, bot, service, database = await _setup(tmp_path)
+
+        # The app routers are module singletons, so the test wires a router of its own.
+        router = Router(name="n_plus_one")
+
+        @router.message()
+        async def cmd_every_user(message: Message) -> None:
+            for telegram_id in range(10):
+                await service.recent_workouts(telegram_id)
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        setup_dispatcher_query_budget(dispatcher, QueryBudget(statements=5, sessions=20, repeats=3))
+
+        labels = {"handler": "cmd_every_user"}
+        before = {
+            reason: metrics.QUERY_BUDGET_EXCEEDED.value(reason=reason, **labels)
+            for reason in ("statements", "sessions", "repeats")
+        }
+        update = Update.model_validate({"update_id": 1, "message": _message("/all")})
+        with caplog.at_level(logging.WARNING, logger="app.query_budget"):
+            await dispatcher.feed_update(bot, update)
+
+        assert metrics.QUERY_BUDGET_EXCEEDED.value(reason="statements", **labels) == before["statements"] + 1
+        assert metrics.QUERY_BUDGET_EXCEEDED.value(reason="sessions", **labels) == before["sessions"]
+        assert metrics.QUERY_BUDGET_EXCEEDED.value(reason="repeats", **labels) == before["repeats"] + 1
+        assert any("Possible N+1 in handler cmd_every_user: 10×" in record.message for record in caplog.records)
+
+        await bot.session.close()
+        await database.dispose()
+        await api.stop()
+
+    asyncio.run(scenario())
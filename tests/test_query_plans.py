@@ -0,0 +1,229 @@
+"""EXPLAIN every statement WorkoutService issues on its request and reminder paths.
+
+Statements are captured from the engine while the service runs against a seeded database,
+then explained with the captured parameters. A full table scan or a temp B-tree fails the
+test unless the statement is listed in ALLOWED below with a reason. Startup backfills read
+whole tables by design and are not covered. On PostgreSQL each run works in a schema of its own,
+which is dropped afterwards.
+"""
+
+import asyncio
+import os
+import re
+import sqlite3
+import uuid
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+import pytest
+from sqlalchemy import event, insert
+
+from app.db.bootstrap import init_db
+from app.db.models import UserProfile, WorkoutEntry
+from app.db.session import Database, create_database
+from app.services.workout_service import WorkoutService
+
+NOW = datetime(2026, 3, 1, 18, 0, tzinfo=timezone.utc)
+
+# (statement prefix, plan detail prefix) pairs that are accepted, with the reason.
+ALLOWED = [
+    # Top exercise of the week: ordering by an aggregate always needs a sort. The input is
+    # one user's rollup rows for seven days, found through the primary key.
+    ("SELECT daily_exercise_rollups.exercise", "USE TEMP B-TREE FOR GROUP BY"),
+    ("SELECT daily_exercise_rollups.exercise", "USE TEMP B-TREE FOR ORDER BY"),
+]
+
+# Statements (by prefix) that must be served by a specific index.
+EXPECTED_INDEXES = {
+    "SELECT workout_entries.id, workout_entries.telegram_id, workout_entries.exercise": (
+        "ix_workout_entries_user_performed"
+    ),
+    "SELECT workout_entries.performed_at, workout_entries.exercise": "ix_workout_entries_user_performed",
+    "SELECT workout_entries.reps, workout_entries.weight_kg": "ix_workout_entries_user_exercise_performed",
+    "SELECT exercise_records.telegram_id": "ix_exercise_records_user_weight_exercise",
+    "SELECT user_profiles.telegram_id, user_profiles.timezone_offset_min": "ix_user_profiles_next_reminder_at",
+}
+
+# (statement prefix, statement fragment) pairs that match EXPECTED_INDEXES but rightly use another index.
+INDEX_EXEMPTIONS = [
+    # A write loads the one exercise record it updates through the primary key; only the /prs
+    # listing, which reads all of a user's records in order, needs the ordering index.
+    (
+        "SELECT exercise_records.telegram_id",
+        " WHERE exercise_records.telegram_id = ? AND exercise_records.exercise = ?",
+    ),
+]
+
+
+async def _exercise_service(service: WorkoutService) -> None:
+    # Half of each user's seeded entries move to the archive, so the union reads see both tables.
+    await service.archive_workouts(NOW - timedelta(days=10), batch_size=100)
+    await service.ensure_profile(1)
+    await service.create_workout(1, "Bench Press", 3, 5, 100.0, "Push Day", None)
+    await service.recent_workouts(1)
+    await service.weekly_stats(1, now_utc=NOW)
+    await service.personal_records(1)
+    export = await service.export_csv_file(1)
+    assert export is not None
+    export.close()
+    await service.delete_last_workout(1)
+
+    await service.set_reminder(1, offset_minutes=0, reminder_time=time(17, 0), now_utc=NOW - timedelta(hours=2))
+    await service.set_reminder(2, offset_minutes=0, reminder_time=time(17, 0), now_utc=NOW - timedelta(hours=2))
+    await service.set_reminder(3, offset_minutes=0, reminder_time=time(17, 0), now_utc=NOW - timedelta(hours=2))
+    await service.find_due_reminders(NOW)
+    claimed = await service.claim_due_reminders(NOW, "owner", limit=10)
+    await service.mark_reminded_many(claimed[:1], now_utc=NOW)
+    await service.record_reminder_failures(claimed[1:2], max_failures=5, now_utc=NOW)
+    await service.disable_reminders_many(claimed[2:])
+    await service.disable_reminder(1)
+
+
+async def _seed(engine: Any) -> None:
+    async with engine.begin() as conn:
+        await conn.execute(insert(UserProfile), [{"telegram_id": user} for user in range(1, 51)])
+        await conn.execute(
+            insert(WorkoutEntry),
+            [
+                {
+                    "telegram_id": user,
+                    "exercise": f"Exercise {index % 7}",
+                    "sets": 3,
+                    "reps": 5,
+                    "weight_kg": 50.0 + index,
+                    "volume_kg": 750.0 + index * 15,
+                    "performed_at": NOW - timedelta(days=index),
+                }
+                for user in range(1, 51)
+                for index in range(20)
+            ],
+        )
+
+
+def _open_database(database_url: str, schema: str | None = None) -> Database:
+    database = create_database(database_url)
+    if schema is not None:
+
+        @event.listens_for(database.engine.sync_engine, "connect")
+        def _use_schema(dbapi_connection: Any, _: Any) -> None:
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f'SET search_path TO "{schema}"')
+            cursor.close()
+
+    return database
+
+
+async def _capture(database_url: str, schema: str | None = None) -> list[tuple[str, Any]]:
+    database = _open_database(database_url, schema)
+    await init_db(database.engine)
+    await _seed(database.engine)
+
+    captured: list[tuple[str, Any]] = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+        if executemany:
+            parameters = parameters[0]
+        captured.append((statement, parameters))
+
+    event.listen(database.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        await _exercise_service(WorkoutService(database.session_factory))
+    finally:
+        event.remove(database.engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+        await database.dispose()
+
+    return [(statement, parameters) for statement, parameters in captured if _is_data_statement(statement)]
+
+
+def _is_data_statement(statement: str) -> bool:
+    keyword = statement.lstrip().split(None, 1)[0].upper()
+    # Plain INSERT ... VALUES never scans; upserts conflict on a unique index by definition.
+    return keyword in ("SELECT", "UPDATE", "DELETE", "WITH")
+
+
+def _allowed(statement: str, detail: str) -> bool:
+    flat = " ".join(statement.split())
+    return any(flat.startswith(prefix) and detail.startswith(plan) for prefix, plan in ALLOWED)
+
+
+def _expected_index(statement: str) -> str | None:
+    flat = " ".join(statement.split())
+    if any(flat.startswith(prefix) and fragment in flat for prefix, fragment in INDEX_EXEMPTIONS):
+        return None
+    for prefix, index_name in EXPECTED_INDEXES.items():
+        if flat.startswith(prefix):
+            return index_name
+    return None
+
+
+def _sqlite_problems(db_path: Path, captured: list[tuple[str, Any]]) -> list[str]:
+    problems = []
+    matched: set[str] = set()
+    connection = sqlite3.connect(db_path)
+    try:
+        for statement, parameters in captured:
+            flat = " ".join(statement.split())
+            plan = [row[-1] for row in connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+            for detail in plan:
+                full_scan = re.match(r"SCAN \w+$", detail) is not None
+                if (full_scan or "TEMP B-TREE" in detail) and not _allowed(statement, detail):
+                    problems.append(f"{detail}\n    in: {flat}")
+
+            expected = _expected_index(statement)
+            if expected is not None:
+                matched.add(expected)
+                if not any(f"INDEX {expected} " in f"{detail} " for detail in plan):
+                    problems.append(f"expected {expected}, got {plan}\n    in: {flat}")
+    finally:
+        connection.close()
+
+    missing = set(EXPECTED_INDEXES.values()) - matched
+    problems.extend(f"no captured statement for {name}" for name in sorted(missing))
+    return problems
+
+
+def test_sqlite_statements_use_indexes(tmp_path: Path) -> None:
+    db_path = tmp_path / "plans.db"
+    captured = asyncio.run(_capture(f"sqlite+aiosqlite:///{db_path}"))
+
+    assert len(captured) >= 15
+    problems = _sqlite_problems(db_path, captured)
+    assert not problems, "\n".join(problems)
+
+
+POSTGRES_URL = os.getenv("TEST_POSTGRES_URL", "")
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="set TEST_POSTGRES_URL to explain on PostgreSQL")
+def test_postgres_statements_use_indexes() -> None:
+    async def scenario() -> list[str]:
+        # Seeded rows use fixed primary keys, so every run gets an empty schema of its own.
+        schema = f"query_plans_{uuid.uuid4().hex[:12]}"
+        admin = create_database(POSTGRES_URL)
+        async with admin.engine.begin() as conn:
+            await conn.exec_driver_sql(f'CREATE SCHEMA "{schema}"')
+
+        database = _open_database(POSTGRES_URL, schema)
+        problems = []
+        try:
+            captured = await _capture(POSTGRES_URL, schema)
+            async with database.engine.connect() as conn:
+                # With sequential scans priced out, a Seq Scan in the plan means no index fits.
+                await conn.exec_driver_sql("SET enable_seqscan = off")
+                for statement, parameters in captured:
+                    result = await conn.exec_driver_sql(f"EXPLAIN {statement}", tuple(parameters))
+                    for (line,) in result:
+                        detail = line.strip().lstrip("-> ").strip()
+                        if detail.startswith("Seq Scan") and not _allowed(statement, detail):
+                            problems.append(f"{detail}\n    in: {' '.join(statement.split())}")
+                await conn.rollback()
+        finally:
+            await database.dispose()
+            async with admin.engine.begin() as conn:
+                await conn.exec_driver_sql(f'DROP SCHEMA "{schema}" CASCADE')
+            await admin.dispose()
+        return problems
+
+    problems = asyncio.run(scenario())
+    assert not problems, "\n".join(problems)
@@ -0,0 +1,211 @@
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from app.db.bootstrap import init_db
+from app.db.session import create_engine_and_session_factory
+from app.services.leader import LeaderLease
+from app.services.rate_limiter import RateLimiter
+from app.services.reminder_worker import ReminderWorker
+from app.services.workout_service import WorkoutService
+
+
+class FakeBot:
+    def __init__(
+        self,
+        flood_once: set[int] | None = None,
+        fail: set[int] | None = None,
+        blocked: set[int] | None = None,
+    ) -> None:
+        self.sent: list[int] = []
+        self._flood_once = set(flood_once or ())
+        self._fail = set(fail or ())
+        self._blocked = set(blocked or ())
+
+    async def send_message(self, chat_id: int, text: str, **_: object) -> None:
+        if chat_id in self._flood_once:
+            self._flood_once.discard(chat_id)
+            raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Too Many Requests", retry_after=0)
+        if chat_id in self._fail:
+            raise RuntimeError("network down")
+        if chat_id in self._blocked:
+            raise TelegramForbiddenError(SendMessage(chat_id=chat_id, text=text), "Forbidden: bot was blocked by the user")
+        self.sent.append(chat_id)
+
+
+def test_fan_out_sends_concurrently_and_acks_in_bulk(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        service = WorkoutService(session_factory)
+
+        now = datetime(2026, 3, 1, 17, 0, tzinfo=timezone.utc)
+        for telegram_id in range(1, 6):
+            await service.set_reminder(telegram_id, offset_minutes=0, reminder_time=time(18, 0), now_utc=now)
+
+        bot = FakeBot(flood_once={2}, fail={5})
+        worker = ReminderWorker(bot, service, send_rate=1000, send_concurrency=3, batch_size=2)
+
+        fire_at = datetime(2026, 3, 1, 18, 0, tzinfo=timezone.utc)
+        assert (await worker.run_once(fire_at)).sent == 4
+        assert sorted(bot.sent) == [1, 2, 3, 4]
+
+        # Only the failed user is still due; everyone else moved to tomorrow.
+        remaining = await service.find_due_reminders(fire_at)
+        assert [item.telegram_id for item in remaining] == [5]
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_unreachable_users_are_disabled_and_transient_failures_give_up(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        service = WorkoutService(session_factory)
+
+        now = datetime(2026, 3, 1, 17, 0, tzinfo=timezone.utc)
+        for telegram_id in (1, 2, 3):
+            await service.set_reminder(telegram_id, offset_minutes=0, reminder_time=time(18, 0), now_utc=now)
+
+        bot = FakeBot(fail={2}, blocked={3})
+        worker = ReminderWorker(bot, service, send_rate=1000, max_failures=2)
+        fire_at = datetime(2026, 3, 1, 18, 0, tzinfo=timezone.utc)
+
+        stats = await worker.run_once(fire_at)
+        assert (stats.sent, stats.transient_failures, stats.permanent_failures) == (1, 1, 1)
+        assert not await service.disable_reminder(3)
+
+        # The transient failure is retried on the next tick, then deferred to tomorrow.
+        assert [item.telegram_id for item in await service.find_due_reminders(fire_at)] == [2]
+        next_tick = fire_at + timedelta(seconds=30)
+        await worker.run_once(next_tick)
+        assert await service.find_due_reminders(next_tick) == []
+        assert worker.stats.transient_failures == 2
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_disabling_unreachable_users_keeps_a_reminder_set_mid_batch(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        service = WorkoutService(session_factory)
+
+        now = datetime(2026, 3, 1, 17, 0, tzinfo=timezone.utc)
+        for telegram_id in (1, 2):
+            await service.set_reminder(telegram_id, offset_minutes=0, reminder_time=time(18, 0), now_utc=now)
+        fire_at = datetime(2026, 3, 1, 18, 0, tzinfo=timezone.utc)
+        claimed = await service.claim_due_reminders(fire_at, "worker", limit=10)
+
+        # User 2 unblocks the bot and sets a new reminder before the batch is acknowledged.
+        await service.set_reminder(2, offset_minutes=0, reminder_time=time(20, 0), now_utc=fire_at)
+        await service.disable_reminders_many(claimed)
+
+        assert not await service.disable_reminder(1)
+        assert await service.disable_reminder(2)
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_rate_limiter_spaces_calls_per_key() -> None:
+    async def scenario() -> tuple[float, float]:
+        limiter = RateLimiter(rate_per_second=1000, per_key_interval=0.2)
+        loop = asyncio.get_running_loop()
+
+        started = loop.time()
+        await asyncio.gather(limiter.acquire(1), limiter.acquire(2))
+        different_keys = loop.time() - started
+
+        started = loop.time()
+        await limiter.acquire(1)
+        same_key = loop.time() - started
+        return different_keys, same_key
+
+    different_keys, same_key = asyncio.run(scenario())
+    assert different_keys < 0.1
+    assert same_key >= 0.15
+
+
+def test_rate_limiter_pause_shifts_pending_calls() -> None:
+    async def scenario() -> list[float]:
+        limiter = RateLimiter(rate_per_second=50, per_key_interval=0.0)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        fired: list[float] = []
+
+        async def send(key: int) -> None:
+            await limiter.acquire(key)
+            fired.append(loop.time() - started)
+
+        tasks = [asyncio.create_task(send(key)) for key in range(5)]
+        await asyncio.sleep(0)
+        # Two sends hit the same flood limit: the pauses overlap instead of adding up.
+        limiter.pause(0.1)
+        limiter.pause(0.1)
+        await asyncio.gather(*tasks)
+        return fired
+
+    fired = asyncio.run(scenario())
+    # The first send went out before the 429; the rest resume after the pause, still one
+    # slot per 20 ms rather than in a burst.
+    assert fired[0] < 0.05
+    assert 0.1 <= fired[1] < 0.15
+    assert all(later - earlier >= 0.015 for earlier, later in zip(fired[1:], fired[2:]))
+
+
+def test_lease_has_a_single_owner_until_it_expires(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        first = LeaderLease(session_factory, "reminder-worker", owner_id="a", ttl_seconds=30)
+        second = LeaderLease(session_factory, "reminder-worker", owner_id="b", ttl_seconds=30)
+
+        now = datetime.now(timezone.utc)
+        assert await first.try_acquire(now)
+        assert not await second.try_acquire(now + timedelta(seconds=10))
+        assert await first.try_acquire(now + timedelta(seconds=10))
+
+        # The leader stops renewing: the standby takes over once the lease runs out.
+        assert await second.try_acquire(now + timedelta(seconds=41))
+        assert not await first.try_acquire(now + timedelta(seconds=42))
+
+        await second.release()
+        assert await first.try_acquire(datetime.now(timezone.utc))
+        await engine.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_due_reminders_are_claimed_once(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        service = WorkoutService(session_factory)
+
+        now = datetime(2026, 3, 1, 17, 0, tzinfo=timezone.utc)
+        for telegram_id in range(1, 6):
+            await service.set_reminder(telegram_id, offset_minutes=0, reminder_time=time(18, 0), now_utc=now)
+
+        fire_at = datetime(2026, 3, 1, 18, 0, tzinfo=timezone.utc)
+        first, second = await asyncio.gather(
+            service.claim_due_reminders(fire_at, "a", limit=3),
+            service.claim_due_reminders(fire_at, "b", limit=3),
+        )
+        claimed = [item.telegram_id for item in first + second]
+        assert sorted(claimed) == [1, 2, 3, 4, 5]
+
+        # A worker that died mid-send leaves its claims to expire, then they are sent again.
+        assert await service.claim_due_reminders(fire_at + timedelta(minutes=5), "c", limit=10) == []
+        bot = FakeBot()
+        worker = ReminderWorker(bot, service, send_rate=1000, claim_seconds=60)
+        assert (await worker.run_once(fire_at + timedelta(minutes=11))).sent == 5
+        assert await service.find_due_reminders(fire_at + timedelta(minutes=11)) == []
+        await engine.dispose()
+
+    asyncio.run(scenario())
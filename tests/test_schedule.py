@@ -0,0 +1,22 @@
+from datetime import date, datetime, time, timezone
+
+from app.utils.schedule import next_reminder_at, reminder_instant, reminder_local_date
+
+
+def test_reminder_instant() -> None:
+    assert reminder_instant(date(2026, 3, 1), time(18, 30), 180) == datetime(2026, 3, 1, 15, 30, tzinfo=timezone.utc)
+    assert reminder_instant(date(2026, 3, 1), time(1, 0), -300) == datetime(2026, 3, 1, 6, 0, tzinfo=timezone.utc)
+
+
+def test_next_reminder_at() -> None:
+    now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    assert next_reminder_at(time(18, 30), 180, now) == datetime(2026, 3, 1, 15, 30, tzinfo=timezone.utc)
+    assert next_reminder_at(time(14, 0), 180, now) == datetime(2026, 3, 2, 11, 0, tzinfo=timezone.utc)
+    assert next_reminder_at(time(15, 0), 180, now) == now
+    assert next_reminder_at(time(1, 0), 720, now) == datetime(2026, 3, 1, 13, 0, tzinfo=timezone.utc)
+
+
+def test_reminder_local_date() -> None:
+    scheduled = datetime(2026, 3, 1, 22, 30, tzinfo=timezone.utc)
+    assert reminder_local_date(scheduled, 180) == date(2026, 3, 2)
+    assert reminder_local_date(scheduled.replace(tzinfo=None), -60) == date(2026, 3, 1)
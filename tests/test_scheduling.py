@@ -0,0 +1,177 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import Message, Update
+
+from app import metrics
+from app.scheduling import UpdateScheduler, setup_dispatcher_scheduling
+from app.states.workout import AddWorkout
+from benchmarks.fake_bot_api import FakeBotApi
+
+
+def _update(update_id: int, chat_id: int, text: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": 1_700_000_000,
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+                "text": text,
+            },
+        }
+    )
+
+
+def test_chats_run_in_order_within_the_global_limit() -> None:
+    async def scenario() -> None:
+        finished: dict[int, list[str]] = {}
+        running = 0
+        peak = 0
+
+        router = Router(name="scheduling-probe")
+
+        @router.message()
+        async def slow(message: Message) -> None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            # Earlier updates take longer, so without ordering they would finish last.
+            await asyncio.sleep(0.03 if message.text == "first" else 0.005)
+            running -= 1
+            finished.setdefault(message.chat.id, []).append(message.text or "")
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        setup_dispatcher_scheduling(dispatcher, UpdateScheduler(concurrency=2, max_pending=100))
+        bot = Bot(token="42:TEST")
+
+        updates = [
+            _update(index * 3 + step, chat_id, text)
+            for index, chat_id in enumerate((1, 2, 3))
+            for step, text in enumerate(("first", "second", "third"))
+        ]
+        wait_before = metrics.UPDATE_WAIT_SECONDS.count()
+        await asyncio.gather(*(dispatcher.feed_update(bot, update) for update in updates))
+        await bot.session.close()
+
+        assert finished == {chat_id: ["first", "second", "third"] for chat_id in (1, 2, 3)}
+        assert peak == 2
+        assert metrics.UPDATE_WAIT_SECONDS.count() - wait_before == len(updates)
+        assert metrics.UPDATE_QUEUE_DEPTH.value() == 0
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_holds_new_updates_back() -> None:
+    async def scenario() -> None:
+        scheduler = UpdateScheduler(concurrency=1, max_pending=2)
+        release = asyncio.Event()
+
+        async def hold(chat_id: int) -> None:
+            async with scheduler.turn(chat_id):
+                await release.wait()
+
+        held = [asyncio.create_task(hold(chat_id)) for chat_id in (1, 2)]
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 1
+
+        # One running and one waiting fill the queue: a third update has to wait for room.
+        admitted = asyncio.create_task(scheduler.wait_for_space())
+        await asyncio.sleep(0.01)
+        assert not admitted.done()
+        third = asyncio.create_task(hold(3))
+        await asyncio.sleep(0)
+        assert scheduler.waiting == 2
+
+        release.set()
+        await asyncio.wait_for(asyncio.gather(admitted, *held, third), timeout=1)
+        assert scheduler.waiting == 0
+
+    asyncio.run(scenario())
+
+
+def test_flooding_chat_cannot_stall_other_chats() -> None:
+    async def scenario() -> None:
+        release = asyncio.Event()
+        handled: dict[int, list[str]] = {}
+
+        router = Router(name="flood-probe")
+
+        @router.message()
+        async def handle(message: Message) -> None:
+            if message.chat.id == 1:
+                await release.wait()
+            handled.setdefault(message.chat.id, []).append(message.text or "")
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        scheduler = UpdateScheduler(concurrency=2, max_pending=10, max_per_chat=3, overflow_wait_seconds=5)
+        setup_dispatcher_scheduling(dispatcher, scheduler)
+        bot = Bot(token="42:TEST")
+
+        dropped_before = metrics.UPDATES_DROPPED.value()
+        flood = [
+            asyncio.create_task(dispatcher.feed_update(bot, _update(index, 1, str(index)))) for index in range(20)
+        ]
+        await asyncio.sleep(0)
+
+        # Chat 1 holds only three admissions, so chat 2 is admitted and answered right away.
+        await asyncio.wait_for(dispatcher.feed_update(bot, _update(100, 2, "hello")), timeout=1)
+        assert handled == {2: ["hello"]}
+
+        # The rest of the flood waited for room instead of being dropped, and kept its order.
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*flood), timeout=1)
+        await bot.session.close()
+
+        assert handled == {1: [str(index) for index in range(20)], 2: ["hello"]}
+        assert metrics.UPDATES_DROPPED.value() == dropped_before
+
+    asyncio.run(scenario())
+
+
+def test_overflow_is_dropped_with_one_notice_but_never_inside_a_flow() -> None:
+    async def scenario() -> None:
+        api = FakeBotApi()
+        base_url = await api.start()
+        bot = Bot("42:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(base_url)))
+        release = asyncio.Event()
+        handled: dict[int, int] = {}
+
+        router = Router(name="overflow-probe")
+
+        @router.message()
+        async def handle(message: Message) -> None:
+            await release.wait()
+            handled[message.chat.id] = handled.get(message.chat.id, 0) + 1
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        scheduler = UpdateScheduler(concurrency=4, max_pending=100, max_per_chat=1, overflow_wait_seconds=0.02)
+        setup_dispatcher_scheduling(dispatcher, scheduler)
+        await dispatcher.fsm.storage.set_state(StorageKey(bot_id=42, chat_id=3, user_id=3), AddWorkout.sets)
+
+        dropped_before = metrics.UPDATES_DROPPED.value()
+        updates = [_update(index, 1, "spam") for index in range(5)]
+        updates += [_update(10 + index, 3, str(index)) for index in range(4)]
+        tasks = [asyncio.create_task(dispatcher.feed_update(bot, update)) for update in updates]
+        await asyncio.sleep(0.2)
+
+        # Chat 1 is not in a flow: its overflow is dropped and it is told once to slow down.
+        assert metrics.UPDATES_DROPPED.value() - dropped_before == 4
+        assert api.calls["sendMessage"] == 1
+
+        # Chat 3 is in the middle of /add, so every answer waits its turn.
+        release.set()
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+        assert handled == {1: 1, 3: 4}
+
+        await bot.session.close()
+        await api.stop()
+
+    asyncio.run(scenario())
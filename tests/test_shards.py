@@ -0,0 +1,159 @@
+import asyncio
+from datetime import datetime, time, timezone
+from pathlib import Path
+
+from sqlalchemy import func, select
+
+from app.db.bootstrap import init_db
+from app.db.models import UserProfile, WorkoutEntry
+from app.db.session import create_database
+from app.db.shards import DEFAULT_SHARD, ShardRouter, load_overrides, parse_shard_urls, save_override
+from app.services.sharding import move_user, rebalance
+from app.services.workout_service import WorkoutService
+
+
+def test_parse_shard_urls() -> None:
+    assert parse_shard_urls("") == {}
+    assert parse_shard_urls("a=sqlite+aiosqlite:///a.db, postgresql://u:p@h/db?sslmode=require") == {
+        "a": "sqlite+aiosqlite:///a.db",
+        "shard2": "postgresql://u:p@h/db?sslmode=require",
+    }
+
+
+def test_rendezvous_placement_moves_only_users_of_the_new_shard() -> None:
+    factories = {name: None for name in (DEFAULT_SHARD, "b", "c")}
+    router = ShardRouter(factories)  # type: ignore[arg-type]
+    grown = ShardRouter({**factories, "d": None})  # type: ignore[dict-item]
+
+    users = range(10_000)
+    before = {user: router.shard_for(user) for user in users}
+    after = {user: grown.shard_for(user) for user in users}
+    moved = [user for user in users if before[user] != after[user]]
+
+    assert all(after[user] == "d" for user in moved)
+    assert 2_000 < len(moved) < 3_000
+    assert 3_000 < sum(1 for shard in before.values() if shard == "b") < 3_700
+
+    user = moved[0]
+    grown.set_override(user, before[user])
+    assert grown.shard_for(user) == before[user]
+    grown.set_override(user, "d")
+    assert grown.shard_for(user) == "d"
+
+
+def test_sharded_service_moves_and_rebalances_users(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        databases = {
+            name: create_database(f"sqlite+aiosqlite:///{tmp_path / f'{name}.db'}")
+            for name in (DEFAULT_SHARD, "b", "c")
+        }
+        for database in databases.values():
+            await init_db(database.engine)
+        directory = databases[DEFAULT_SHARD].session_factory
+
+        async def users_on(name: str) -> set[int]:
+            async with databases[name].session_factory() as session:
+                return set(await session.scalars(select(UserProfile.telegram_id)))
+
+        async def entries_on(name: str, telegram_id: int) -> int:
+            async with databases[name].session_factory() as session:
+                stmt = select(func.count()).select_from(WorkoutEntry).where(WorkoutEntry.telegram_id == telegram_id)
+                return await session.scalar(stmt)
+
+        router = ShardRouter({name: databases[name].session_factory for name in (DEFAULT_SHARD, "b")})
+        service = WorkoutService(router)
+        now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+        users = list(range(1, 21))
+        for user in users:
+            await service.create_workout(user, "Squat", 3, 5, 100.0 + user, None, None)
+            await service.set_reminder(user, offset_minutes=0, reminder_time=time(13, 0), now_utc=now)
+
+        assert await users_on(DEFAULT_SHARD) | await users_on("b") == set(users)
+        assert await users_on(DEFAULT_SHARD) and await users_on("b")
+        assert (await service.personal_records(7))[0].best_weight_kg == 107.0
+
+        fire_at = datetime(2026, 3, 1, 13, 0, tzinfo=timezone.utc)
+        due = await service.claim_due_reminders(fire_at, "worker", limit=100)
+        assert sorted(item.telegram_id for item in due) == users
+        await service.mark_reminded_many(due, now_utc=fire_at)
+        assert await service.find_due_reminders(fire_at) == []
+
+        user = next(iter(await users_on(DEFAULT_SHARD)))
+        result = await move_user(router, directory, user, "b")
+        assert (result.source, result.target, result.rows) == (DEFAULT_SHARD, "b", 5)
+        assert user not in await users_on(DEFAULT_SHARD)
+        assert await entries_on("b", user) == 1
+        assert await load_overrides(directory) == {user: "b"}
+        assert len(await service.recent_workouts(user)) == 1
+
+        # Adding a shard: only users that now hash to it move, and pinned users stay put.
+        grown = ShardRouter(
+            {name: database.session_factory for name, database in databases.items()},
+            await load_overrides(directory),
+        )
+        planned = await rebalance(grown, directory, dry_run=True)
+        assert planned and all(move.target == "c" for move in planned)
+        assert user not in {move.telegram_id for move in planned}
+
+        moves = await rebalance(grown, directory)
+        assert [move.telegram_id for move in moves] == [move.telegram_id for move in planned]
+        assert await users_on("c") == {move.telegram_id for move in moves}
+        assert await rebalance(grown, directory, dry_run=True) == []
+
+        grown_service = WorkoutService(grown)
+        for user in users:
+            assert len(await grown_service.recent_workouts(user)) == 1
+
+        for database in databases.values():
+            await database.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_interrupted_moves_never_copy_stale_rows_over_live_ones(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        databases = {
+            name: create_database(f"sqlite+aiosqlite:///{tmp_path / f'{name}.db'}")
+            for name in (DEFAULT_SHARD, "b")
+        }
+        for database in databases.values():
+            await init_db(database.engine)
+        directory = databases[DEFAULT_SHARD].session_factory
+        router = ShardRouter({name: database.session_factory for name, database in databases.items()})
+        user = next(user for user in range(1, 100) if router.placement(user) == DEFAULT_SHARD)
+
+        async def entries_on(name: str) -> int:
+            async with databases[name].session_factory() as session:
+                stmt = select(func.count()).select_from(WorkoutEntry).where(WorkoutEntry.telegram_id == user)
+                return await session.scalar(stmt)
+
+        async def write_on(name: str, workouts: int) -> None:
+            service = WorkoutService(ShardRouter({name: databases[name].session_factory}))
+            for _ in range(workouts):
+                await service.create_workout(user, "Squat", 3, 5, 100.0, None, None)
+
+        # A move to b stopped after the directory was updated: main still holds an older copy.
+        await write_on(DEFAULT_SHARD, 1)
+        await write_on("b", 2)
+        await save_override(directory, router, user, "b")
+
+        assert await rebalance(router, directory, dry_run=True) == []
+        assert await rebalance(router, directory) == []
+        assert (await entries_on(DEFAULT_SHARD), await entries_on("b")) == (0, 2)
+
+        # Re-running the move itself also clears the leftover instead of returning early.
+        await write_on(DEFAULT_SHARD, 1)
+        result = await move_user(router, directory, user, "b")
+        assert (result.source, result.target, result.rows) == ("b", "b", 0)
+        assert (await entries_on(DEFAULT_SHARD), await entries_on("b")) == (0, 2)
+
+        # A move back to main stopped before the directory was updated: b stays the live copy.
+        await write_on(DEFAULT_SHARD, 1)
+        assert await rebalance(router, directory) == []
+        assert (await entries_on(DEFAULT_SHARD), await entries_on("b")) == (0, 2)
+        assert await load_overrides(directory) == {user: "b"}
+
+        for database in databases.values():
+            await database.dispose()
+
+    asyncio.run(scenario())
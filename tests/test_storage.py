@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+import sqlite3
+
+from sqlalchemy import event, select, text
+
+from app.db.bootstrap import init_db
+from app.db.models import UserProfile
+from app.db.session import StorageProfile, create_database, resolve_profile_name
+from app.services.workout_service import WorkoutService
+
+
+def test_resolve_profile_name() -> None:
+    assert resolve_profile_name("auto", "sqlite+aiosqlite:///./data/bot.db") == "sqlite"
+    assert resolve_profile_name("auto", "sqlite+aiosqlite:///:memory:") == "default"
+    assert resolve_profile_name("auto", "postgresql+asyncpg://u:p@localhost/db") == "postgres"
+    assert resolve_profile_name("postgres", "sqlite+aiosqlite:///./data/bot.db") == "default"
+    assert resolve_profile_name("default", "postgresql+asyncpg://u:p@localhost/db") == "default"
+
+
+def test_sqlite_profile_routes_writes_to_a_single_writer(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        database = create_database(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", StorageProfile(name="auto"))
+        assert database.read_engine is not database.engine
+        await init_db(database.engine)
+
+        async with database.read_engine.connect() as conn:
+            assert (await conn.execute(text("PRAGMA journal_mode"))).scalar() == "wal"
+            assert (await conn.execute(text("PRAGMA synchronous"))).scalar() == 1
+            assert (await conn.execute(text("PRAGMA query_only"))).scalar() == 1
+
+        async with database.session_factory() as session:
+            await session.execute(select(UserProfile))
+            assert session.sync_session.get_bind(clause=select(UserProfile)) is database.read_engine.sync_engine
+
+            session.add(UserProfile(telegram_id=1))
+            await session.flush()
+            # After a write the session sticks to the writer and reads its own rows.
+            assert await session.get(UserProfile, 1) is not None
+            assert session.sync_session.get_bind(clause=select(UserProfile)) is database.engine.sync_engine
+            await session.commit()
+
+        service = WorkoutService(database.session_factory)
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        assert len(await service.recent_workouts(1)) == 1
+        assert (await service.weekly_stats(1)).workouts == 1
+        assert await service.delete_last_workout(1)
+        assert await service.export_csv_bytes(1) is None
+        await database.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_read_modify_write_paths_stay_on_the_writer(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        database = create_database(f"sqlite+aiosqlite:///{tmp_path / 'bot.db'}", StorageProfile(name="auto"))
+        await init_db(database.engine)
+        service = WorkoutService(database.session_factory)
+        now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+        await service.set_reminder(1, offset_minutes=0, reminder_time=time(18, 0), now_utc=now)
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+
+        reads: list[str] = []
+        event.listen(
+            database.read_engine.sync_engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *_: reads.append(statement),
+        )
+        # Each of these reads a row and then updates it; the read must not see another snapshot.
+        await service.mark_reminded(1, now.date(), now_utc=now)
+        assert await service.delete_last_workout(1)
+        assert await service.disable_reminder(1)
+        assert reads == []
+
+        assert await service.recent_workouts(1) == []
+        assert reads
+        await database.dispose()
+
+    asyncio.run(scenario())
+
+
+def test_replica_serves_reads_outside_the_read_your_writes_window(tmp_path: Path) -> None:
+    primary_path, replica_path = tmp_path / "primary.db", tmp_path / "replica.db"
+
+    def replicate() -> None:
+        source, target = sqlite3.connect(primary_path), sqlite3.connect(replica_path)
+        source.backup(target)
+        source.close()
+        target.close()
+
+    async def scenario() -> None:
+        database = create_database(
+            f"sqlite+aiosqlite:///{primary_path}",
+            StorageProfile(name="auto"),
+            replica_url=f"sqlite+aiosqlite:///{replica_path}",
+        )
+        await init_db(database.engine)
+        replicate()
+
+        now = [0.0]
+        service = WorkoutService(database.session_factory, read_your_writes_seconds=10, clock=lambda: now[0])
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        await service.set_reminder(1, offset_minutes=0, reminder_time=time(9, 0))
+
+        # Inside the window the writer serves the user's reads; the replica has not caught up yet.
+        assert len(await service.recent_workouts(1)) == 1
+        assert (await service.weekly_stats(1)).workouts == 1
+
+        now[0] = 11.0
+        assert await service.recent_workouts(1) == []
+        assert (await service.personal_records(1)) == []
+        assert await service.export_csv_bytes(1) is None
+        assert await service.find_due_reminders(datetime.now(timezone.utc) + timedelta(days=2)) == []
+
+        replicate()
+        assert len(await service.recent_workouts(1)) == 1
+        assert (await service.personal_records(1))[0].best_weight_kg == 80.0
+        assert len(await service.find_due_reminders(datetime.now(timezone.utc) + timedelta(days=2))) == 1
+
+        # A session that has written reads its own writes from the primary.
+        async with service.open_session(1) as session:
+            assert await service.delete_last_workout(1, session=session)
+            assert await service.recent_workouts(1, session=session) == []
+            await service.commit(session)
+        assert await service.recent_workouts(1) == []
+
+        # Another instance has no local record of that write, but the primary carries the deadline.
+        other = WorkoutService(database.session_factory, read_your_writes_seconds=10, clock=lambda: now[0])
+        replicate()
+        await service.create_workout(1, "Squat", 3, 5, 100.0, None, None)
+        assert len(await other.recent_workouts(1)) == 1
+        now[0] = 22.0
+        assert await other.recent_workouts(1) == []
+        await database.dispose()
+
+    asyncio.run(scenario())
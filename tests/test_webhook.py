@@ -0,0 +1,65 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.webhook import create_webhook_app
+
+SECRET = "test-secret"
+
+
+def _update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 1_700_000_000,
+            "chat": {"id": 42, "type": "private"},
+            "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }
+
+
+def test_webhook_verifies_secret_and_feeds_dispatcher() -> None:
+    async def scenario() -> None:
+        received: list[str] = []
+        router = Router()
+
+        @router.message()
+        async def record(message: Message) -> None:
+            received.append(message.text or "")
+
+        dispatcher = Dispatcher()
+        dispatcher.include_router(router)
+        bot = Bot(token="42:TEST")
+        app = create_webhook_app(bot, dispatcher, path="/telegram/webhook", secret_token=SECRET)
+
+        async with TestClient(TestServer(app)) as client:
+            response = await client.post("/telegram/webhook", json=_update(1, "ignored"))
+            assert response.status == 401
+
+            response = await client.post(
+                "/telegram/webhook",
+                json=_update(2, "hello"),
+                headers={"X-Telegram-Bot-Api-Secret-Token": "wrong"},
+            )
+            assert response.status == 401
+
+            response = await client.post(
+                "/telegram/webhook",
+                json=_update(3, "hello"),
+                headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+            )
+            assert response.status == 200
+
+            for _ in range(50):
+                if received:
+                    break
+                await asyncio.sleep(0.01)
+
+        assert received == ["hello"]
+        await bot.session.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,385 @@
+import asyncio
+import gzip
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import event, insert
+from sqlalchemy.exc import IntegrityError
+
+from app import metrics
+
+from app.db.bootstrap import init_db
+from app.db.models import UserProfile, WorkoutEntry
+from app.db.session import create_engine_and_session_factory
+from app.services.cache import UserCache
+from app.services.workout_service import WorkoutService
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+async def _service(tmp_path: Path) -> tuple[WorkoutService, object]:
+    engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+    await init_db(engine)
+    return WorkoutService(session_factory), engine
+
+
+def test_due_reminders_follow_next_fire_time(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        service, engine = await _service(tmp_path)
+        now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+        await service.set_reminder(1, offset_minutes=180, reminder_time=time(18, 30), now_utc=now)
+        await service.set_reminder(2, offset_minutes=0, reminder_time=time(9, 0), now_utc=now)
+
+        assert await service.find_due_reminders(now) == []
+
+        fire_at = datetime(2026, 3, 1, 15, 30, tzinfo=timezone.utc)
+        due = await service.find_due_reminders(fire_at)
+        assert [item.telegram_id for item in due] == [1]
+        assert due[0].local_date == fire_at.date()
+
+        await service.mark_reminded(1, due[0].local_date, now_utc=fire_at)
+        assert await service.find_due_reminders(fire_at + timedelta(hours=1)) == []
+
+        assert await service.disable_reminder(2)
+        due = await service.find_due_reminders(now + timedelta(days=3))
+        assert [item.telegram_id for item in due] == [1]
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_missed_reminders_are_caught_up(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        service, engine = await _service(tmp_path)
+        now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+        await service.set_reminder(1, offset_minutes=0, reminder_time=time(12, 30), now_utc=now)
+
+        # Worker was down across the reminder minute: the next poll still sees it.
+        later = datetime(2026, 3, 1, 13, 5, tzinfo=timezone.utc)
+        due = await service.find_due_reminders(later)
+        assert [item.telegram_id for item in due] == [1]
+
+        await service.mark_reminded(1, due[0].local_date, now_utc=later)
+        assert await service.find_due_reminders(datetime(2026, 3, 2, 12, 29, tzinfo=timezone.utc)) == []
+        assert len(await service.find_due_reminders(datetime(2026, 3, 2, 12, 30, tzinfo=timezone.utc))) == 1
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_streaming_export_matches_plain_and_gzip(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        service, engine = await _service(tmp_path)
+        assert await service.export_csv_file(1) is None
+
+        await service.create_workout(2, "Squat", 5, 5, None, None, "other user")
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        async with engine.begin() as conn:
+            await conn.execute(insert(UserProfile), [{"telegram_id": 1, "created_at": start}])
+            await conn.execute(
+                insert(WorkoutEntry),
+                [
+                    {
+                        "telegram_id": 1,
+                        "exercise": f"Lift {index % 3}",
+                        "sets": 3,
+                        "reps": 5,
+                        "weight_kg": 60.0 + index,
+                        "volume_kg": 15 * (60.0 + index),
+                        "template": "Push Day",
+                        "performed_at": start + timedelta(minutes=index),
+                    }
+                    for index in range(1203)
+                ],
+            )
+
+        plain = await service.export_csv_file(1)
+        assert plain is not None and plain.rows == 1203
+        with plain:
+            lines = plain.file.read().decode("utf-8").splitlines()
+
+        assert lines[0].startswith("performed_at_utc,exercise")
+        assert len(lines) == 1204
+        assert ",Lift 2,3,5,1262.0,18930.0,Push Day," in lines[1]
+
+        compressed = await service.export_csv_file(1, compress=True)
+        assert compressed is not None and compressed.compressed
+        with compressed:
+            assert gzip.decompress(compressed.file.read()).decode("utf-8").splitlines() == lines
+
+        assert (await service.export_csv_bytes(1)).decode("utf-8").splitlines() == lines
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_personal_records_follow_inserts_and_deletes(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        service, engine = await _service(tmp_path)
+
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        await service.create_workout(1, "Bench", 3, 8, 80.0, None, None)
+        await service.create_workout(1, "Squat", 5, 5, 120.0, None, None)
+        await service.create_workout(1, "Pull Up", 3, 12, None, None, None)
+        await service.create_workout(1, "Bench", 3, 3, 90.0, None, None)
+
+        records = await service.personal_records(1)
+        assert [(item.exercise, item.best_weight_kg, item.best_weight_reps) for item in records] == [
+            ("Squat", 120.0, 5),
+            ("Bench", 90.0, 3),
+        ]
+        assert records[1].best_set_volume_kg == 640.0
+        assert records[1].best_reps == 8
+
+        # Removing the record-holding set falls back to the previous best.
+        assert await service.delete_last_workout(1)
+        records = await service.personal_records(1)
+        assert [(item.exercise, item.best_weight_kg, item.best_weight_reps) for item in records] == [
+            ("Squat", 120.0, 5),
+            ("Bench", 80.0, 8),
+        ]
+
+        await service.create_workout(2, "Deadlift", 1, 1, 200.0, None, None)
+        assert await service.backfill_personal_records() == 0
+        assert await service.backfill_personal_records(force=True) == 4
+        assert await service.personal_records(1) == records
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_weekly_stats_come_from_daily_rollups(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        service, engine = await _service(tmp_path)
+
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        await service.create_workout(1, "Squat", 5, 5, 100.0, None, None)
+        await service.create_workout(1, "Squat", 5, 3, 110.0, None, None)
+        await service.create_workout(1, "Pull Up", 3, 10, None, None, None)
+        old = datetime.now(timezone.utc) - timedelta(days=10)
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(WorkoutEntry),
+                [{"telegram_id": 1, "exercise": "Row", "sets": 1, "reps": 1, "volume_kg": 1.0, "performed_at": old}],
+            )
+
+        stats = await service.weekly_stats(1)
+        assert (stats.workouts, stats.total_reps, stats.total_volume_kg) == (4, 85, 5350.0)
+        assert stats.top_exercise == "Squat"
+
+        assert await service.delete_last_workout(1)
+        assert await service.delete_last_workout(1)
+        stats = await service.weekly_stats(1)
+        assert (stats.workouts, stats.total_reps, stats.total_volume_kg) == (2, 40, 3700.0)
+        assert stats.top_exercise == "Bench"
+
+        # A rebuild from workout_entries matches the incrementally maintained rows.
+        assert await service.backfill_daily_rollups() == 0
+        assert await service.backfill_daily_rollups(force=True) == 2
+        assert await service.weekly_stats(1, now_utc=stats.window_end) == stats
+        assert (await service.weekly_stats(2)).workouts == 0
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_archived_entries_keep_counting_outside_recent_history(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        service, engine = await _service(tmp_path)
+
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        old = datetime.now(timezone.utc) - timedelta(days=400)
+        async with engine.begin() as conn:
+            await conn.execute(
+                insert(WorkoutEntry),
+                [
+                    {"telegram_id": 1, "exercise": "Bench", "sets": 3, "reps": 3, "weight_kg": 100.0,
+                     "volume_kg": 900.0, "performed_at": old},
+                    {"telegram_id": 1, "exercise": "Squat", "sets": 5, "reps": 5, "weight_kg": 120.0,
+                     "volume_kg": 3000.0, "performed_at": old + timedelta(days=1)},
+                ],
+            )
+        await service.backfill_personal_records(force=True)
+        await service.backfill_daily_rollups(force=True)
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=365)
+        assert await service.archive_workouts(cutoff, batch_size=1) == 2
+        assert await service.archive_workouts(cutoff) == 0
+
+        # Only the hot table backs the recent list; exports still cover everything.
+        assert [item.exercise for item in await service.recent_workouts(1)] == ["Bench"]
+        export = await service.export_csv_bytes(1)
+        assert export is not None
+        exercises = [line.split(",")[1] for line in export.decode().splitlines()[1:]]
+        assert exercises == ["Bench", "Squat", "Bench"]
+
+        # Deleting the hot set that held the Bench volume record recomputes from the archive.
+        assert await service.delete_last_workout(1)
+        assert not await service.delete_last_workout(1)
+        records = await service.personal_records(1)
+        assert [(item.exercise, item.best_weight_kg, item.best_set_volume_kg) for item in records] == [
+            ("Squat", 120.0, 600.0),
+            ("Bench", 100.0, 300.0),
+        ]
+        assert await service.backfill_personal_records(force=True) == 2
+        assert await service.personal_records(1) == records
+        assert await service.backfill_daily_rollups(force=True) == 2
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_read_cache_is_invalidated_by_writes(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        service = WorkoutService(session_factory, cache=UserCache(max_users=100, ttl_seconds=60))
+
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        assert len(await service.recent_workouts(1)) == 1
+        assert len(await service.recent_workouts(1)) == 1
+        assert (await service.personal_records(1))[0].best_weight_kg == 80.0
+        assert (await service.weekly_stats(1)).workouts == 1
+        assert (await service.weekly_stats(1)).workouts == 1
+
+        stats = service.cache_stats()
+        assert (stats.hits, stats.misses) == (2, 3)
+
+        await service.create_workout(1, "Bench", 3, 5, 85.0, None, None)
+        assert len(await service.recent_workouts(1)) == 2
+        assert (await service.personal_records(1))[0].best_weight_kg == 85.0
+
+        assert await service.delete_last_workout(1)
+        assert (await service.weekly_stats(1)).workouts == 1
+        assert (await service.personal_records(1))[0].best_weight_kg == 80.0
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_shared_session_is_one_unit_of_work(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        service = WorkoutService(session_factory, cache=UserCache(max_users=100, ttl_seconds=60))
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        assert len(await service.recent_workouts(1)) == 1
+
+        # Uncommitted writes are visible inside the session, bypassing the cache, and vanish on rollback.
+        async with service.open_session(1) as session:
+            await service.create_workout(1, "Bench", 3, 5, 90.0, None, None, session=session)
+            assert len(await service.recent_workouts(1, session=session)) == 2
+            assert (await service.personal_records(1, session=session))[0].best_weight_kg == 90.0
+        assert len(await service.recent_workouts(1)) == 1
+        assert (await service.personal_records(1))[0].best_weight_kg == 80.0
+
+        async with service.open_session(1) as session:
+            await service.create_workout(1, "Squat", 3, 5, 100.0, None, None, session=session)
+            assert await service.delete_last_workout(1, session=session)
+            await service.create_workout(1, "Deadlift", 1, 5, 140.0, None, None, session=session)
+            await service.commit(session)
+        assert [row.exercise for row in await service.recent_workouts(1)] == ["Deadlift", "Bench"]
+        assert (await service.weekly_stats(1)).workouts == 2
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_group_commit_batches_concurrent_inserts(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        engine, session_factory = create_engine_and_session_factory(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await init_db(engine)
+        service = WorkoutService(session_factory, cache=UserCache(max_users=100, ttl_seconds=60))
+        service.enable_group_commit(max_batch=8, max_latency_seconds=0.05)
+        assert await service.recent_workouts(1) == []
+
+        batches_before = metrics.DB_WRITE_BATCH_SIZE.count()
+        results = await asyncio.gather(
+            *(service.create_workout(1 + index % 3, f"Lift {index}", 3, 5, 50.0 + index, None, None) for index in range(20)),
+            # NOT NULL violation: fails on its own without taking the rest of its batch down.
+            service.create_workout(1, None, 3, 5, 50.0, None, None),  # type: ignore[arg-type]
+            return_exceptions=True,
+        )
+        *saved, failed = results
+        assert isinstance(failed, IntegrityError)
+        assert [row.exercise for row in saved] == [f"Lift {index}" for index in range(20)]
+        assert len({row.id for row in saved}) == 20
+        assert metrics.DB_WRITE_BATCH_SIZE.count() - batches_before < 21
+
+        assert len(await service.recent_workouts(1, limit=50)) == 7
+        assert (await service.weekly_stats(2)).workouts == 7
+        assert (await service.personal_records(3))[0].best_weight_kg == 50.0 + 17
+
+        pending = [asyncio.create_task(service.create_workout(4, "Squat", 1, 1, 100.0, None, None)) for _ in range(3)]
+        await asyncio.sleep(0)
+        await service.close()
+        assert all(task.done() for task in pending)
+        assert len(await service.recent_workouts(4)) == 3
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_write_paths_issue_a_fixed_number_of_statements(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        service, engine = await _service(tmp_path)
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany) -> None:
+            statements.append(statement.split()[0].upper())
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+
+        workout = await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        assert workout.id is not None and workout.volume_kg == 1200.0
+        # Profile upsert, entry INSERT ... RETURNING, record upsert, two rollup upserts.
+        assert statements == ["INSERT"] * 5
+
+        statements.clear()
+        await service.create_workout(1, "Bench", 3, 5, 70.0, None, None)
+        # The profile is known now, so its upsert is skipped.
+        assert statements == ["INSERT"] * 4
+
+        statements.clear()
+        assert await service.delete_last_workout(1)
+        # DELETE ... RETURNING, two rollup decrements, record lookup; no recompute needed.
+        assert statements == ["DELETE", "UPDATE", "UPDATE", "SELECT"]
+
+        statements.clear()
+        assert not await service.delete_last_workout(2)
+        assert statements == ["DELETE"]
+        await engine.dispose()
+
+    _run(scenario())
+
+
+def test_known_profiles_skip_the_existence_check(tmp_path: Path) -> None:
+    async def scenario() -> None:
+        service, engine = await _service(tmp_path)
+        statements: list[str] = []
+
+        def record(conn, cursor, statement, parameters, context, executemany) -> None:
+            statements.append(statement.split()[0].upper())
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+
+        await service.ensure_profile(1)
+        await service.ensure_profile(1)
+        assert statements == ["INSERT"]
+
+        statements.clear()
+        await service.create_workout(1, "Bench", 3, 5, 80.0, None, None)
+        assert statements == ["INSERT"] * 4
+
+        statements.clear()
+        await service.set_reminder(2, offset_minutes=0, reminder_time=time(7, 0))
+        await service.set_reminder(2, offset_minutes=60, reminder_time=time(8, 0))
+        assert statements == ["INSERT", "INSERT"]
+        assert await service.disable_reminder(2)
+        assert not await service.disable_reminder(2)
+        await engine.dispose()
+
+    _run(scenario())